@@ -5,8 +5,15 @@ import os
 from dotenv import load_dotenv
 try:
     from .utils import *
+    from .rate_limit import AdaptiveConcurrencyLimiter, TokenBucket, retry_delay
+    from .streaming_body import StreamingJsonBody, image_placeholder
 except ImportError:
     from utils import *
+    from rate_limit import AdaptiveConcurrencyLimiter, TokenBucket, retry_delay
+    from streaming_body import StreamingJsonBody, image_placeholder
+
+# Statuses that mean "slow down": they trigger a concurrency decrease and a retry.
+THROTTLE_STATUS_CODES = {429, 503}
 
 
 class LLMClient:
@@ -17,18 +24,51 @@ class LLMClient:
     - generic prompt + image queries
     - closed-set image classification using a fixed descriptor list
     - open-ended structured image description with a JSON schema
+    - client-side flow control: an optional token-bucket rate limit, AIMD
+      adaptive concurrency and jittered retries on 429/503 and transport errors
 
     Parameters:
         endpoint (str): Full URL to the chat completions endpoint.
         api_key (str): Bearer token used for authentication.
         model (str): Model identifier sent in the request body.
         timeout (float, optional): HTTP timeout in seconds. Defaults to 30.0.
+        http2 (bool, optional): Use HTTP/2 so concurrent requests share one connection.
+            Requires the `h2` package (`pip install httpx[http2]`). Defaults to False.
+        max_connections (int, optional): Upper bound on open connections in the pool.
+            Defaults to httpx's default.
+        rate_limit_per_second (float, optional): Sustained request rate. Defaults to None (no limit).
+        rate_limit_burst (int, optional): Token-bucket size. Defaults to the rate.
+        initial_concurrency (int, optional): Starting concurrent-request limit. Defaults to 8.
+        min_concurrency (int, optional): Lower bound for the adaptive limit. Defaults to 1.
+        max_concurrency (int, optional): Upper bound for the adaptive limit. Defaults to 32.
+        max_retries (int, optional): Retries per request on 429/503 or transport errors. Defaults to 3.
+        retry_backoff_seconds (float, optional): Base for exponential backoff. Defaults to 0.5.
+        max_retry_backoff_seconds (float, optional): Backoff cap. Defaults to 20.0.
+        streaming_upload (bool, optional): Stream request bodies with image data sent in
+            chunks instead of building the whole JSON document in memory. Defaults to False.
 
     Raises:
         ValueError: If endpoint, api_key, or model is missing.
     """
 
-    def __init__(self, endpoint, api_key, model, timeout=30.0):
+    def __init__(
+        self,
+        endpoint,
+        api_key,
+        model,
+        timeout=30.0,
+        http2=False,
+        max_connections=None,
+        rate_limit_per_second=None,
+        rate_limit_burst=None,
+        initial_concurrency=8,
+        min_concurrency=1,
+        max_concurrency=32,
+        max_retries=3,
+        retry_backoff_seconds=0.5,
+        max_retry_backoff_seconds=20.0,
+        streaming_upload=False,
+    ):
         """
         Initialize the asynchronous LLM client.
 
@@ -37,6 +77,17 @@ class LLMClient:
             api_key (str): Authentication token.
             model (str): Model name to use for inference.
             timeout (float, optional): Request timeout in seconds.
+            http2 (bool, optional): Enable HTTP/2 on the connection pool.
+            max_connections (int, optional): Maximum number of pooled connections.
+            rate_limit_per_second (float, optional): Token-bucket rate, or None to disable.
+            rate_limit_burst (int, optional): Token-bucket size.
+            initial_concurrency (int, optional): Starting adaptive concurrency limit.
+            min_concurrency (int, optional): Lowest adaptive concurrency limit.
+            max_concurrency (int, optional): Highest adaptive concurrency limit.
+            max_retries (int, optional): Retries per request.
+            retry_backoff_seconds (float, optional): Base backoff in seconds.
+            max_retry_backoff_seconds (float, optional): Maximum backoff in seconds.
+            streaming_upload (bool, optional): Stream image data instead of embedding it.
 
         Raises:
             ValueError: If any required constructor argument is empty or missing.
@@ -51,14 +102,138 @@ class LLMClient:
         self.endpoint = endpoint
         self.model = model
 
+        pool_options = {}
+        if max_connections is not None:
+            pool_options["limits"] = httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
         self.client = httpx.AsyncClient(
             timeout=timeout,
+            http2=http2,
+            **pool_options,
             headers={
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
             },
         )
 
+        self.rate_limiter = None
+        if rate_limit_per_second:
+            self.rate_limiter = TokenBucket(rate_limit_per_second, rate_limit_burst)
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=initial_concurrency,
+            min_limit=min_concurrency,
+            max_limit=max_concurrency,
+        )
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.streaming_upload = streaming_upload
+        self._metrics = {
+            "requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "throttled": 0,
+            "concurrency_decreases": 0,
+        }
+
+    def stats(self):
+        """
+        Return flow-control metrics.
+
+        Returns:
+            dict: Attempt counters (`requests`, `succeeded`, `failed`, `retries`,
+            `throttled`, `concurrency_decreases`), plus `in_flight`,
+            `concurrency_limit` and `rate_limit_waits`.
+        """
+        return {
+            **self._metrics,
+            "in_flight": self.concurrency.in_flight,
+            "concurrency_limit": self.concurrency.limit,
+            "rate_limit_waits": self.rate_limiter.waits if self.rate_limiter is not None else 0,
+        }
+
+    def _image_url(self, image, image_mime, streamed_images):
+        """
+        Build the `image_url` value for one image.
+
+        With `streaming_upload` the image is appended to `streamed_images` and a
+        placeholder is returned; `_request_body` later streams the data in.
+        Images may be base64 strings or raw encoded bytes.
+        """
+        if self.streaming_upload:
+            streamed_images.append(image)
+            data = image_placeholder(len(streamed_images) - 1)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            data = encode_bytes_to_base64(image)
+        else:
+            data = image
+        return {"url": f"data:{image_mime};base64,{data}"}
+
+    @staticmethod
+    def _request_body(body, streamed_images):
+        return StreamingJsonBody(body, streamed_images) if streamed_images else body
+
+    async def _post(self, body):
+        """
+        POST `body` (a dict, or a `StreamingJsonBody`) to the endpoint with rate
+        limiting, adaptive concurrency and retries.
+
+        429/503 responses lower the concurrency limit and are retried after a
+        jittered backoff (or the server's Retry-After). Transport errors are
+        retried without lowering the limit. Other error statuses fail immediately.
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            httpx.HTTPStatusError: On a non-retryable status or when retries are exhausted.
+            httpx.RequestError: When retries are exhausted on transport errors.
+        """
+        if isinstance(body, StreamingJsonBody):
+            request_kwargs = {"content": body, "headers": {"Content-Length": str(body.content_length)}}
+        else:
+            request_kwargs = {"json": body}
+
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+
+            self._metrics["requests"] += 1
+            retry_after = None
+            try:
+                async with self.concurrency:
+                    response = await self.client.post(self.endpoint, **request_kwargs)
+            except httpx.RequestError:
+                if attempt >= self.max_retries:
+                    self._metrics["failed"] += 1
+                    raise
+            else:
+                if response.status_code not in THROTTLE_STATUS_CODES:
+                    if response.is_error:
+                        self._metrics["failed"] += 1
+                        response.raise_for_status()
+                    self.concurrency.on_success()
+                    self._metrics["succeeded"] += 1
+                    return response
+
+                self._metrics["throttled"] += 1
+                if self.concurrency.on_throttle():
+                    self._metrics["concurrency_decreases"] += 1
+                if attempt >= self.max_retries:
+                    self._metrics["failed"] += 1
+                    response.raise_for_status()
+                retry_after = response.headers.get("Retry-After")
+
+            self._metrics["retries"] += 1
+            await asyncio.sleep(
+                retry_delay(attempt, self.retry_backoff_seconds, self.max_retry_backoff_seconds, retry_after)
+            )
+            attempt += 1
+
     async def query_description_closed(self, base64image, descriptors, image_mime="image/jpeg"):
         print("sending")
         """
@@ -75,7 +250,7 @@ class LLMClient:
         - avoid any additional fields
 
         Args:
-            base64image (str): Base64-encoded image content.
+            base64image (str | bytes): Base64-encoded image content, or raw encoded bytes.
             descriptors (list[str]): Allowed descriptor labels.
             image_mime (str, optional): MIME type of the encoded image.
                 Defaults to "image/jpeg".
@@ -87,6 +262,7 @@ class LLMClient:
             RuntimeError: If the HTTP request fails or the endpoint returns an error status.
             ValueError: If the endpoint returns invalid JSON.
         """
+        streamed_images = []
         body = {
             "model": self.model,
             "messages": [
@@ -107,7 +283,7 @@ class LLMClient:
                         },
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:{image_mime};base64,{base64image}"},
+                            "image_url": self._image_url(base64image, image_mime, streamed_images),
                         },
                     ],
                 }
@@ -137,8 +313,7 @@ class LLMClient:
         }
 
         try:
-            response = await self.client.post(self.endpoint, json=body)
-            response.raise_for_status()
+            response = await self._post(self._request_body(body, streamed_images))
         except httpx.HTTPStatusError as exc:
             raise RuntimeError(
                 f"HTTP error {exc.response.status_code} from LLM endpoint"
@@ -168,7 +343,8 @@ class LLMClient:
         - avoid any additional fields
 
         Args:
-            base64images (list[str]): List of base64-encoded image contents.
+            base64images (list[str | bytes]): List of base64-encoded image contents
+                (raw encoded bytes are accepted too).
             image_mime (str, optional): MIME type of the encoded images.
                 Defaults to "image/jpeg".
         Returns:
@@ -207,10 +383,11 @@ class LLMClient:
             ]
 
         # Add all images to the content
+        streamed_images = []
         for base64_image in base64images:
             content.append({
                 "type": "image_url",
-                "image_url": {"url": f"data:{image_mime};base64,{base64_image}"},
+                "image_url": self._image_url(base64_image, image_mime, streamed_images),
             })
 
         body = {
@@ -238,8 +415,7 @@ class LLMClient:
         }
 
         try:
-            response = await self.client.post(self.endpoint, json=body)
-            response.raise_for_status()
+            response = await self._post(self._request_body(body, streamed_images))
         except httpx.HTTPStatusError as exc:
             error_body = exc.response.text
             print(f"Error body: {error_body}")
@@ -255,6 +431,144 @@ class LLMClient:
         except json.JSONDecodeError as exc:
             raise ValueError("LLM endpoint returned invalid JSON") from exc
 
+    @staticmethod
+    def build_description_bundle_body(model, groups, image_mime="image/jpeg", image_url=None):
+        """
+        Build one chat-completions body that asks for a description per image group.
+
+        Images that appear in several groups (for example the full frame used as
+        fallback for a selection, or frames picked by both selections) are sent
+        once. Each unique image is preceded by a short "Image N" label, and the
+        instructions list which image numbers belong to each group.
+
+        Args:
+            model (str): Model identifier.
+            groups (dict[str, list[str]]): Group name -> base64 images, in order.
+            image_mime (str, optional): MIME type of the encoded images.
+            image_url (callable, optional): Builds the `image_url` value for an image.
+                Defaults to an inline base64 data URL.
+
+        Returns:
+            tuple[dict, int]: The request body and the number of unique images in it.
+        """
+        index_of = {}
+        unique_images = []
+        group_indices = {}
+        for name, images in groups.items():
+            if not images:
+                raise ValueError(f"image group '{name}' cannot be empty")
+            indices = []
+            for image in images:
+                if image not in index_of:
+                    index_of[image] = len(unique_images) + 1
+                    unique_images.append(image)
+                indices.append(index_of[image])
+            group_indices[name] = indices
+
+        group_lines = []
+        for name, indices in group_indices.items():
+            kind = "a single image" if len(indices) == 1 else "a sequence"
+            numbers = ", ".join(str(i) for i in indices)
+            group_lines.append(f"- {name}: {kind}, images {numbers}")
+
+        content = [
+            {
+                "type": "text",
+                "text": (
+                    "The following images are numbered. Produce one concise natural-language description per group below. "
+                    "For a single image describe what happens in the image; for a sequence describe what happens across "
+                    "the sequence in the listed order. Describe each group independently.\n\n"
+                    "Groups:\n" + "\n".join(group_lines) + "\n\n"
+                    "Return ONLY JSON that matches the schema.\n"
+                    "Do not include extra fields."
+                ),
+            }
+        ]
+        for number, image in enumerate(unique_images, start=1):
+            content.append({"type": "text", "text": f"Image {number}"})
+            content.append({
+                "type": "image_url",
+                "image_url": image_url(image) if image_url else {"url": f"data:{image_mime};base64,{image}"},
+            })
+
+        body = {
+            "model": model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content,
+                }
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": "grouped_descriptions",
+                    "schema": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            name: {"type": "string", "minLength": 1} for name in group_indices
+                        },
+                        "required": list(group_indices),
+                    },
+                },
+            },
+        }
+        return body, len(unique_images)
+
+    async def query_description_bundle(self, groups, image_mime="image/jpeg"):
+        """
+        Describe several image groups with a single request.
+
+        This is the one-request alternative to calling `query_description_open`
+        once per group. Shared images are deduplicated (see
+        `build_description_bundle_body`) and the response has one string field
+        per group.
+
+        Args:
+            groups (dict[str, list[str]]): Group name -> base64 images.
+            image_mime (str, optional): MIME type of the encoded images.
+
+        Returns:
+            dict[str, dict]: Group name -> {"description": ...}, the same shape
+            `query_description_open` returns for each group.
+
+        Raises:
+            RuntimeError: If the HTTP request fails or the endpoint returns an error status.
+            ValueError: If the endpoint returns invalid JSON, a group is missing
+                from the response, or a group has no images.
+        """
+        streamed_images = []
+        body, unique_count = self.build_description_bundle_body(
+            self.model,
+            groups,
+            image_mime,
+            image_url=lambda image: self._image_url(image, image_mime, streamed_images),
+        )
+        print(f"sending {unique_count} images in {len(groups)} groups")
+
+        try:
+            response = await self._post(self._request_body(body, streamed_images))
+        except httpx.HTTPStatusError as exc:
+            error_body = exc.response.text
+            print(f"Error body: {error_body}")
+            raise RuntimeError(
+                f"HTTP error {exc.response.status_code} from LLM endpoint: {error_body}"
+            ) from exc
+        except httpx.RequestError as exc:
+            raise RuntimeError(f"Request to LLM endpoint failed: {exc}") from exc
+
+        try:
+            parsed = parse_llm_response(response.json())
+        except json.JSONDecodeError as exc:
+            raise ValueError("LLM endpoint returned invalid JSON") from exc
+
+        missing = [name for name in groups if not isinstance(parsed.get(name), str)]
+        if missing:
+            raise ValueError(f"LLM response is missing descriptions for: {', '.join(missing)}")
+        print(f"sent {unique_count} images in {len(groups)} groups")
+        return {name: {"description": parsed[name]} for name in groups}
+
     async def close(self):
         """
         Close the underlying async HTTP client.
@@ -0,0 +1,208 @@
+import base64
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+
+
+@dataclass(frozen=True)
+class ImageBudget:
+    """
+    Size limits for the images in one LLM request.
+
+    Parameters:
+        max_pixels (int, optional): Max width * height per image. Larger images are
+            downscaled (aspect ratio kept). Defaults to 640 * 360.
+        quality (int, optional): Encoder quality for re-encoded images. Defaults to 70.
+        max_total_bytes (int, optional): Max encoded bytes for all images in the
+            request, or None for no limit. Defaults to None.
+        min_quality (int, optional): Lowest quality used when shrinking to fit
+            `max_total_bytes`. Defaults to 40.
+        image_format (str, optional): "jpeg" or "webp". Defaults to "jpeg".
+    """
+
+    max_pixels: int = 640 * 360
+    quality: int = 70
+    max_total_bytes: int = None
+    min_quality: int = 40
+    image_format: str = "jpeg"
+
+    def __post_init__(self):
+        if self.image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_format must be one of: {', '.join(IMAGE_FORMATS)}")
+        if self.max_pixels is not None and self.max_pixels <= 0:
+            raise ValueError("max_pixels must be positive")
+        if not 1 <= self.min_quality <= self.quality <= 100:
+            raise ValueError("require 1 <= min_quality <= quality <= 100")
+
+    @property
+    def mime_type(self):
+        return IMAGE_FORMATS[self.image_format][1]
+
+
+def fit_image(image_bytes, max_pixels, quality, image_format="jpeg"):
+    """
+    Downscale an encoded image to at most `max_pixels` and re-encode it.
+
+    A JPEG that needs no resizing keeps its original bytes if re-encoding
+    would not make it smaller.
+
+    Args:
+        image_bytes (bytes): Encoded image.
+        max_pixels (int | None): Pixel limit, or None to keep the size.
+        quality (int): Encoder quality (1-100).
+        image_format (str, optional): "jpeg" or "webp".
+
+    Returns:
+        bytes | None: The image encoded as `image_format`, or None if it cannot
+            be decoded or encoded.
+    """
+    extension, _, quality_flag = IMAGE_FORMATS[image_format]
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    height, width = image.shape[:2]
+    resized = False
+    if max_pixels is not None and width * height > max_pixels:
+        scale = math.sqrt(max_pixels / float(width * height))
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        resized = True
+
+    ok, encoded = cv2.imencode(extension, image, [quality_flag, int(quality)])
+    if not ok:
+        return None
+    encoded = encoded.tobytes()
+    if (
+        image_format == "jpeg"
+        and not resized
+        and bytes(image_bytes[:3]) == JPEG_MAGIC
+        and len(encoded) >= len(image_bytes)
+    ):
+        return bytes(image_bytes)
+    return encoded
+
+
+class ImageBudgetEncoder:
+    """
+    Apply an `ImageBudget` to the images of one request, using a worker pool.
+
+    Every image is downscaled and re-encoded in parallel. OpenCV releases the
+    GIL while resizing and encoding, so threads are enough. If the result is
+    over `max_total_bytes`, the encoder first lowers the quality step by step
+    down to `min_quality`, then halves the pixel limit, and as a last resort
+    drops images evenly from the middle of the sequence (first and last are kept).
+    If any image cannot be decoded or encoded, the budget is skipped for that
+    request and the original images are kept.
+
+    Parameters:
+        budget (ImageBudget): Limits to apply.
+        workers (int, optional): Encoder threads. Defaults to 2.
+    """
+
+    QUALITY_STEP = 15
+    MAX_PIXEL_HALVINGS = 3
+
+    def __init__(self, budget, workers=2):
+        self.budget = budget
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image-budget")
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "images_in": 0, "images_out": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def encode(self, images_b64, source_mime="image/jpeg"):
+        """
+        Fit base64 images to the budget.
+
+        Args:
+            images_b64 (list[str]): Base64-encoded images, in order.
+            source_mime (str, optional): MIME type of the input images, returned
+                when the budget had to be skipped. Defaults to "image/jpeg".
+
+        Returns:
+            tuple[list[str], str]: Base64-encoded images and their MIME type.
+        """
+        originals = [base64.b64decode(image) for image in images_b64]
+        fitted = self._fit(originals)
+        if fitted is None:
+            return list(images_b64), source_mime
+        return [base64.b64encode(image).decode("utf-8") for image in fitted], self.budget.mime_type
+
+    def fit(self, images):
+        """
+        Fit encoded images to the budget.
+
+        Args:
+            images (list[bytes]): Encoded images, in order.
+
+        Returns:
+            list[bytes]: Encoded images within the budget where possible, or
+                the original images if any of them could not be re-encoded.
+        """
+        fitted = self._fit(images)
+        return list(images) if fitted is None else fitted
+
+    def _fit(self, images):
+        # None when an image could not be re-encoded in the budget format.
+        budget = self.budget
+        quality = budget.quality
+        max_pixels = budget.max_pixels
+        halvings = 0
+        keep = list(range(len(images)))
+
+        while True:
+            fitted = list(self._pool.map(
+                lambda image: fit_image(image, max_pixels, quality, budget.image_format),
+                [images[i] for i in keep],
+            ))
+            if any(image is None for image in fitted):
+                print(f"[image-budget] could not re-encode an image as {budget.image_format}, keeping originals")
+                fitted = None
+                break
+            total = sum(len(image) for image in fitted)
+            if budget.max_total_bytes is None or total <= budget.max_total_bytes:
+                break
+            if quality > budget.min_quality:
+                quality = max(budget.min_quality, quality - self.QUALITY_STEP)
+            elif halvings < self.MAX_PIXEL_HALVINGS and max_pixels is not None:
+                max_pixels = max(1, max_pixels // 2)
+                halvings += 1
+            elif len(keep) > 1:
+                keep = _evenly_spaced(keep, max(1, int(len(keep) * budget.max_total_bytes / total)))
+            else:
+                break
+
+        out = images if fitted is None else fitted
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["images_in"] += len(images)
+            self._stats["images_out"] += len(out)
+            self._stats["bytes_in"] += sum(len(image) for image in images)
+            self._stats["bytes_out"] += sum(len(image) for image in out)
+        return fitted
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def _evenly_spaced(indices, count):
+    # Always drop at least one so the fitting loop makes progress.
+    count = max(1, min(count, len(indices) - 1))
+    if count == 1:
+        return indices[:1]
+    step = (len(indices) - 1) / (count - 1)
+    return [indices[round(i * step)] for i in range(count)]
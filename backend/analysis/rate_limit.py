@@ -0,0 +1,137 @@
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+    """
+    Asynchronous token-bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` per second up to `burst`. Each
+    `acquire()` takes one token and sleeps until one is available.
+
+    Parameters:
+        rate (float): Sustained requests per second.
+        burst (int, optional): Bucket size. Defaults to max(1, rate).
+        monotonic_fn (callable, optional): Clock, replaceable in tests.
+    """
+
+    def __init__(self, rate, burst=None, monotonic_fn=time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._monotonic = monotonic_fn
+        self._tokens = self.burst
+        self._updated_at = monotonic_fn()
+        self._lock = asyncio.Lock()
+        self.waits = 0
+
+    def _refill(self):
+        now = self._monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """
+        Take one token, waiting if the bucket is empty.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        # The lock keeps waiters in FIFO order so a burst of callers cannot starve each other.
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                delay = (1.0 - self._tokens) / self.rate
+                self.waits += 1
+                await asyncio.sleep(delay)
+                waited = delay
+                self._refill()
+            self._tokens = max(0.0, self._tokens - 1.0)
+        return waited
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on concurrent requests.
+
+    Every `limit` successful requests raise the limit by one, up to `max_limit`.
+    A throttle signal (429/503) multiplies it by `decrease_factor`, down to
+    `min_limit`. At most one decrease happens per `cooldown_seconds`, so a burst
+    of 429s from requests that were already in flight only counts once.
+
+    Use as an async context manager around each request.
+    """
+
+    def __init__(
+        self,
+        initial_limit=8,
+        min_limit=1,
+        max_limit=64,
+        decrease_factor=0.5,
+        cooldown_seconds=1.0,
+        monotonic_fn=time.monotonic,
+    ):
+        if min_limit < 1 or max_limit < min_limit:
+            raise ValueError("require 1 <= min_limit <= max_limit")
+        if not 0.0 < decrease_factor < 1.0:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        self.min_limit = int(min_limit)
+        self.max_limit = int(max_limit)
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self._monotonic = monotonic_fn
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._last_decrease_at = None
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    async def __aenter__(self):
+        async with self._cond:
+            while self._in_flight >= int(self._limit):
+                await self._cond.wait()
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+        return False
+
+    def on_success(self):
+        if self._limit < self.max_limit:
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+
+    def on_throttle(self):
+        now = self._monotonic()
+        if self._last_decrease_at is not None and now - self._last_decrease_at < self.cooldown_seconds:
+            return False
+        self._last_decrease_at = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        return True
+
+
+def retry_delay(attempt, base_seconds, max_seconds, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt` (0-based).
+
+    Uses the server's Retry-After value when present, otherwise "full jitter"
+    exponential backoff: uniform(0, min(max_seconds, base_seconds * 2**attempt)).
+    """
+    if retry_after is not None:
+        try:
+            return min(max_seconds, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    return random.uniform(0.0, min(max_seconds, base_seconds * (2 ** attempt)))
@@ -0,0 +1,240 @@
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def dhash(image_bytes, hash_size=8):
+    """
+    Compute a difference hash (dHash) of an encoded image.
+
+    The image is converted to grayscale, shrunk to (hash_size + 1) x hash_size
+    and each bit records whether a pixel is brighter than its right neighbour.
+    Visually similar images get hashes with a small Hamming distance.
+
+    Args:
+        image_bytes (bytes): Encoded image (JPEG, WebP, ...).
+        hash_size (int, optional): Hash side length; the hash has hash_size**2 bits.
+
+    Returns:
+        int | None: The hash, or None if the image cannot be decoded.
+    """
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class PerceptualResponseCache:
+    """
+    Cache of LLM responses keyed by perceptual hashes of the request images.
+
+    A lookup hits when a stored entry has the same kind, the same number of
+    images, and every image hash is within `threshold` bits of the query's.
+    Entries expire after `ttl_seconds`. The oldest entries are evicted beyond
+    `max_entries`.
+
+    If `path` is given, the cache is loaded from that JSON file on start and
+    written back (atomically) every `persist_every` inserts and on `save()`.
+
+    Parameters:
+        threshold (int, optional): Max Hamming distance per image. Defaults to 6 (of 64 bits).
+        ttl_seconds (float, optional): Entry lifetime. Defaults to 300.
+        max_entries (int, optional): Max cached responses. Defaults to 1000.
+        path (str, optional): JSON file for persistence. Defaults to None.
+        persist_every (int, optional): Inserts between automatic saves. Defaults to 20.
+    """
+
+    def __init__(
+        self,
+        threshold=6,
+        ttl_seconds=300.0,
+        max_entries=1000,
+        path=None,
+        persist_every=20,
+        time_fn=time.time,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+        self.persist_every = persist_every
+        self._time = time_fn
+        self._lock = threading.Lock()
+        # Saves may run on executor threads; only one writes the file at a time.
+        self._save_lock = threading.Lock()
+        # Insertion order == age, so eviction pops from the front.
+        self._entries = []
+        self._unsaved = 0
+        self._stats = {"hits": 0, "misses": 0, "expired": 0}
+        if path is not None and os.path.exists(path):
+            self._load()
+
+    def get(self, kind, hashes):
+        """
+        Return a cached response for similar images, or None.
+
+        Args:
+            kind (str): Query type, so different prompts never share entries.
+            hashes (list[int]): Image hashes in request order.
+        """
+        now = self._time()
+        with self._lock:
+            self._expire_locked(now)
+            for entry in reversed(self._entries):
+                if entry["kind"] != kind or len(entry["hashes"]) != len(hashes):
+                    continue
+                if all((a ^ b).bit_count() <= self.threshold for a, b in zip(entry["hashes"], hashes)):
+                    self._stats["hits"] += 1
+                    return entry["response"]
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, kind, hashes, response, save=True):
+        """
+        Store a response for `hashes`.
+
+        Args:
+            kind (str): Query type.
+            hashes (list[int]): Image hashes in request order.
+            response: The response to cache.
+            save (bool, optional): Write the file here when `persist_every` is
+                reached. Pass False to do the save elsewhere (e.g. in an executor).
+
+        Returns:
+            bool: True if a save is due and was not done because `save` is False.
+        """
+        now = self._time()
+        with self._lock:
+            self._entries.append({"kind": kind, "hashes": list(hashes), "response": response, "created_at": now})
+            if len(self._entries) > self.max_entries:
+                del self._entries[: len(self._entries) - self.max_entries]
+            self._unsaved += 1
+            should_save = self.path is not None and self._unsaved >= self.persist_every
+        if should_save and save:
+            self.save()
+            return False
+        return should_save
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+    def save(self):
+        """Write the cache to `path` (no-op without a path)."""
+        if self.path is None:
+            return
+        with self._lock:
+            self._expire_locked(self._time())
+            data = {"version": 1, "entries": list(self._entries)}
+            self._unsaved = 0
+        tmp_path = f"{self.path}.tmp"
+        with self._save_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries = [e for e in data.get("entries", []) if isinstance(e, dict) and "hashes" in e]
+        except (OSError, ValueError) as exc:
+            print(f"[response-cache] could not load {self.path}: {exc}")
+            return
+        with self._lock:
+            self._entries = entries[-self.max_entries:]
+            self._expire_locked(self._time())
+
+    def _expire_locked(self, now):
+        cutoff = now - self.ttl_seconds
+        expired = 0
+        while expired < len(self._entries) and self._entries[expired]["created_at"] < cutoff:
+            expired += 1
+        if expired:
+            del self._entries[:expired]
+            self._stats["expired"] += expired
+
+
+class CachedLLMClient:
+    """
+    Wrap an LLM client so `query_description_open` and
+    `query_description_bundle` are served from a `PerceptualResponseCache`
+    when the images look like a recent request.
+
+    Hashing decodes the images and saving writes the cache file, so both run
+    in the default executor instead of on the event loop. Images that cannot
+    be decoded bypass the cache. A bundle is keyed by its group names, the
+    number of images per group and every image hash in order. Every other
+    attribute (other queries, `stats`, `close`) is delegated to the wrapped
+    client.
+
+    Parameters:
+        client: The wrapped client, e.g. `LLMClient`.
+        cache (PerceptualResponseCache): Cache to use.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def query_description_open(self, base64images, image_mime="image/jpeg"):
+        return await self._cached(
+            "description_open",
+            base64images,
+            lambda: self.client.query_description_open(base64images, image_mime=image_mime),
+        )
+
+    async def query_description_bundle(self, groups, image_mime="image/jpeg"):
+        # Same images in other groups, or split differently, must not share an entry.
+        kind = "description_bundle:" + ",".join(f"{name}={len(images)}" for name, images in groups.items())
+        images = [image for group in groups.values() for image in group]
+        return await self._cached(
+            kind,
+            images,
+            lambda: self.client.query_description_bundle(groups, image_mime=image_mime),
+        )
+
+    async def _cached(self, kind, base64images, query):
+        loop = asyncio.get_running_loop()
+        hashes = await loop.run_in_executor(None, self._hash_images, base64images)
+        if hashes is None:
+            return await query()
+
+        cached = self.cache.get(kind, hashes)
+        if cached is not None:
+            return cached
+        response = await query()
+        if self.cache.put(kind, hashes, response, save=False):
+            await loop.run_in_executor(None, self.cache.save)
+        return response
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.cache.save)
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            await close()
+
+    @staticmethod
+    def _hash_images(base64images):
+        # Bundles repeat shared images across groups; decode each one once.
+        by_image = {}
+        hashes = []
+        for image in base64images:
+            if image not in by_image:
+                by_image[image] = dhash(base64.b64decode(image))
+            value = by_image[image]
+            if value is None:
+                return None
+            hashes.append(value)
+        return hashes
@@ -0,0 +1,80 @@
+import base64
+import json
+
+# Raw bytes are encoded 48 KiB at a time (a multiple of 3, so chunks concatenate
+# into valid base64) which yields 64 KiB of base64 per chunk.
+RAW_CHUNK_BYTES = 48 * 1024
+B64_CHUNK_BYTES = 64 * 1024
+
+
+def image_placeholder(index):
+    """Marker put in the JSON body where image `index`'s base64 data is streamed in."""
+    return f"__gr8_streamed_image_{index}__"
+
+
+def base64_length(image):
+    """Length in bytes of `image` as base64 (already-encoded strings are used as is)."""
+    if isinstance(image, str):
+        return len(image)
+    return 4 * ((len(image) + 2) // 3)
+
+
+class StreamingJsonBody:
+    """
+    A JSON request body whose image data is streamed instead of embedded.
+
+    The body dict is serialized once with small placeholders (see
+    `image_placeholder`) in place of the base64 data. `iter_chunks()` yields the
+    JSON text between placeholders and the images in 64 KiB chunks. Raw bytes
+    are base64-encoded chunk by chunk, so neither the full base64 string nor
+    the full JSON document is ever built.
+
+    The object is an async iterable (pass it as httpx `content=`) and can be
+    iterated more than once, which lets `LLMClient` retry a request. It is
+    deliberately not a sync iterable, since httpx would then refuse it on an
+    AsyncClient. `content_length` is exact, so the caller can send a
+    Content-Length header instead of chunked transfer encoding.
+
+    Parameters:
+        body (dict): Request body containing one placeholder per image.
+        images (list[str | bytes]): Images in placeholder order, as base64
+            strings or raw encoded bytes.
+    """
+
+    def __init__(self, body, images):
+        text = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
+        self._segments = []
+        for index in range(len(images)):
+            before, marker, text = text.partition(image_placeholder(index))
+            if not marker:
+                raise ValueError(f"body has no placeholder for image {index}")
+            self._segments.append(before.encode("utf-8"))
+        self._segments.append(text.encode("utf-8"))
+        self._images = list(images)
+        self.content_length = sum(len(segment) for segment in self._segments) + sum(
+            base64_length(image) for image in self._images
+        )
+
+    def iter_chunks(self):
+        for index, image in enumerate(self._images):
+            yield self._segments[index]
+            yield from _image_chunks(image)
+        yield self._segments[-1]
+
+    async def __aiter__(self):
+        for chunk in self.iter_chunks():
+            yield chunk
+
+    def to_bytes(self):
+        """Return the whole body as bytes (used for tests and comparisons)."""
+        return b"".join(self.iter_chunks())
+
+
+def _image_chunks(image):
+    if isinstance(image, str):
+        for start in range(0, len(image), B64_CHUNK_BYTES):
+            yield image[start:start + B64_CHUNK_BYTES].encode("ascii")
+        return
+    view = memoryview(image)
+    for start in range(0, len(view), RAW_CHUNK_BYTES):
+        yield base64.b64encode(view[start:start + RAW_CHUNK_BYTES])
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+# Lasttest av hela analysvägen: Camera._process_message (frame selection,
+# base64, bildbudget, LLMClient över riktig HTTP, sparande) mot den lokala
+# mock-servern i benchmarks/mock_llm_server.py.
+#
+# Kameran byggs med den vanliga konstruktorn men utan ffmpeg, MQTT och
+# RTSP-läsare; hot buffern fylls med syntetiska JPEG-frames. Databasen ersätts
+# med en räknare. Events skickas in via _dispatch_message (samma väg som
+# analyskön använder), antingen alla direkt eller i en jämn takt (--rate).
+# Latens per event räknas från att eventet erbjuds tills analysen är klar,
+# inklusive väntan på en ledig plats i AnalysisService.
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.analysis_load_benchmark --events 200 --concurrency 32 --latency-ms 500
+# PYTHONPATH=. python3 -m benchmarks.analysis_load_benchmark --mode combined --rate-limit-rps 20 --error-rate 0.05
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import threading
+import time
+import types
+from datetime import datetime, timedelta, timezone
+
+import cv2
+import numpy as np
+
+# Databasen (Postgres + embedding-modell) ska inte ingå i mätningen. camera.py
+# importerar save_description_bundle direkt, så ersättningen måste finnas innan
+# camera importeras; _run byter sedan in en räknare.
+_database_stand_in = types.ModuleType("database.database")
+_database_stand_in.save_description_bundle = lambda *args, **kwargs: None
+sys.modules["database.database"] = _database_stand_in
+
+import ingestion.camera as camera_module  # noqa: E402
+from analysis.async_prisma import LLMClient  # noqa: E402
+from analysis.image_budget import ImageBudget  # noqa: E402
+from benchmarks.mock_llm_server import MockLLMServer, add_server_arguments, config_from_args  # noqa: E402
+from ingestion.analysis_service import AnalysisService  # noqa: E402
+from ingestion.buffers.rtsp_hot_buffer import BufferedFrame, FrameRingBuffer  # noqa: E402
+from ingestion.camera import ANALYSIS_MODES, Camera  # noqa: E402
+
+
+class _BenchmarkCamera(Camera):
+    # Ingen inspelning, ingen MQTT och ingen RTSP-läsare: bara analysvägen.
+    def init_recording(self, ffmpeg: str, segment_seconds: int) -> None:
+        self.recording_process = None
+
+    def init_mqtt(self, broker_host: str, broker_port: int) -> None:
+        return None
+
+    def init_buffer(self) -> None:
+        self.frame_buffer = FrameRingBuffer(
+            max_frames=self.hot_buffer_seconds * self.hot_buffer_fps,
+            max_bytes=self.hot_buffer_max_bytes,
+        )
+
+
+def _fill_hot_buffer(camera: Camera, args: argparse.Namespace, end_time: datetime) -> None:
+    # En ljus fyrkant som rör sig över en gradient med lätt brus ger JPEG-storlekar i
+    # samma storleksordning som kamerabilder och lagom mycket förändring för frame_selection_2.
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(40, 200, args.width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0.0, 6.0, size=(args.height, args.width, 3))
+    background = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    count = args.buffer_seconds * args.fps
+    for i in range(count):
+        image = background.copy()
+        x = int((args.width - 80) * i / max(1, count - 1))
+        image[args.height // 3 : args.height // 3 + 80, x : x + 80] = 255
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        if not ok:
+            raise RuntimeError("JPEG encoding failed")
+        timestamp = end_time - timedelta(seconds=(count - 1 - i) / args.fps)
+        camera.frame_buffer.append(
+            BufferedFrame(timestamp=timestamp, jpeg_bytes=encoded.tobytes(), width=args.width, height=args.height)
+        )
+
+
+def _event_payload(received_at: datetime, duration: float, snapshot_b64: str) -> dict:
+    # _process_message flyttar eventfönstret så att end_time hamnar på received_at.
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return {
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(seconds=duration)).isoformat(),
+        "image": {"data": snapshot_b64},
+    }
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def _run(args: argparse.Namespace, endpoint: str) -> dict:
+    saved = []
+    saved_lock = threading.Lock()
+
+    def _count_save(*save_args, **save_kwargs) -> None:
+        with saved_lock:
+            saved.append(save_args[0])
+
+    camera_module.save_description_bundle = _count_save
+
+    llm = LLMClient(
+        endpoint,
+        "benchmark",
+        "benchmark-model",
+        initial_concurrency=args.llm_concurrency,
+        max_concurrency=max(args.llm_concurrency, 4 * args.concurrency),
+        streaming_upload=args.streaming_upload,
+    )
+    service = AnalysisService(llm, concurrency=args.concurrency, cpu_workers=args.cpu_workers, name="load-benchmark")
+    budget = ImageBudget(max_pixels=args.budget_pixels) if args.budget_pixels else None
+    camera = _BenchmarkCamera(
+        "bench",
+        "rtsp://unused",
+        "ffmpeg",
+        "127.0.0.1",
+        1883,
+        analysis_service=service,
+        analysis_mode=args.mode,
+        analysis_image_budget=budget,
+        analysis_timeout_seconds=args.timeout,
+        hot_buffer_seconds=args.buffer_seconds,
+        hot_buffer_fps=args.fps,
+        hot_buffer_max_bytes=512 * 1024 * 1024,
+    )
+
+    received_at = datetime.now(timezone.utc)
+    _fill_hot_buffer(camera, args, received_at)
+    snapshot_b64 = camera.frame_selection_1(received_at - timedelta(seconds=1), received_at)[0][0]
+    payload = _event_payload(received_at, args.event_seconds, snapshot_b64)
+
+    latencies = []
+    latency_lock = threading.Lock()
+    done = threading.Semaphore(0)
+
+    def _on_done(offered_at: float, _future) -> None:
+        with latency_lock:
+            latencies.append(time.perf_counter() - offered_at)
+        done.release()
+
+    interval = 1.0 / args.rate if args.rate else 0.0
+    output = io.StringIO()
+    # _process_message skriver ut varje svar; det dränker tabellen om det inte fångas.
+    with contextlib.redirect_stdout(output) if not args.verbose else contextlib.nullcontext():
+        start = time.perf_counter()
+        for i in range(args.events):
+            if interval:
+                delay = start + i * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            offered_at = time.perf_counter()
+            future = camera._dispatch_message(received_at, payload)
+            future.add_done_callback(lambda f, t=offered_at: _on_done(t, f))
+        for _ in range(args.events):
+            done.acquire()
+        wall = time.perf_counter() - start
+
+        camera._analysis_queue.shutdown()
+        service.unregister(camera.camera_id)
+        # Stänger även LLMClient på tjänstens loop.
+        service.close()
+
+    latencies.sort()
+    return {
+        "wall": wall,
+        "ok": len(saved),
+        "latencies": latencies,
+        "llm": llm.stats(),
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load-test Camera._process_message against a local mock LLM server.")
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=0.0, help="Offered events per second (0 = all at once).")
+    parser.add_argument("--mode", choices=ANALYSIS_MODES, default="separate")
+    parser.add_argument("--concurrency", type=int, default=16, help="AnalysisService: concurrent events.")
+    parser.add_argument("--cpu-workers", type=int, default=4, help="AnalysisService: CPU pool size.")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="LLMClient: initial AIMD limit.")
+    parser.add_argument("--streaming-upload", action="store_true", help="Stream request bodies (LLMClient).")
+    parser.add_argument("--budget-pixels", type=int, help="Apply an ImageBudget with this pixel limit.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Analysis timeout per event.")
+    parser.add_argument("--event-seconds", type=float, default=6.0, help="Event duration (sets frames per selection).")
+    parser.add_argument("--buffer-seconds", type=int, default=30)
+    parser.add_argument("--fps", type=int, default=5)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=540)
+    parser.add_argument("--endpoint", help="Use an already running server instead of starting one.")
+    parser.add_argument("--verbose", action="store_true", help="Show the camera's per-event output.")
+    add_server_arguments(parser)
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    if args.events <= 0 or args.concurrency <= 0:
+        raise SystemExit("--events and --concurrency must be positive")
+
+    server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        server = MockLLMServer(config_from_args(args))
+        endpoint = server.start()
+    try:
+        result = _run(args, endpoint)
+    finally:
+        if server is not None:
+            server.stop()
+
+    latencies = result["latencies"]
+    llm = result["llm"]
+    print(
+        f"[analysis-load-bench] events={args.events} mode={args.mode} concurrency={args.concurrency} "
+        f"rate={'max' if not args.rate else f'{args.rate:g}/s'} latency={args.latency_ms:.0f}ms "
+        f"({args.latency_distribution}) error_rate={args.error_rate:g}"
+    )
+    print(f"{'ok':>6}{'failed':>8}{'wall s':>9}{'events/s':>10}{'llm req/s':>11}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    print(
+        f"{result['ok']:>6}{args.events - result['ok']:>8}{result['wall']:>9.2f}"
+        f"{result['ok'] / result['wall']:>10.2f}{llm['requests'] / result['wall']:>11.2f}"
+        f"{_percentile(latencies, 0.50) * 1000:>9.0f}{_percentile(latencies, 0.90) * 1000:>9.0f}"
+        f"{_percentile(latencies, 0.99) * 1000:>9.0f}{(latencies[-1] if latencies else 0.0) * 1000:>9.0f}"
+    )
+    print(f"llm client: {llm}")
+    if server is not None:
+        print(f"mock server: {server.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Mäter CPU-kostnaden för GStreamerHotBuffer i olika avkodningslägen mot en
+# riktig RTSP-ström (t.ex. den simulerade kameran via MediaMTX).
+#
+# Varje läge körs i tur och ordning: pipelinen startas, får --warmup sekunder
+# på sig att ansluta, och sedan mäts processens CPU-tid (user + sys, alla
+# GStreamer- och kodartrådar) under --seconds sekunder. 100 % = en kärna.
+#
+# Kräver GStreamer med PyGObject (gi) samt plugins good + libav.
+#
+# Kör från GR8/backend (med simulerad kamera igång):
+# PYTHONPATH=. python3 -m benchmarks.gstreamer_decode_benchmark --rtsp-url rtsp://127.0.0.1:8554/1 --seconds 20
+
+from __future__ import annotations
+
+import argparse
+import resource
+import time
+
+from ingestion.gstreamer_hot_buffer import GStreamerHotBuffer
+
+MODES = {
+    "baseline": {},
+    "scale_first": {"scale_before_convert": True},
+    "encode_pool": {"encode_workers": 2},
+    "keyframes": {"keyframes_only": True},
+    "all": {"keyframes_only": True, "scale_before_convert": True, "encode_workers": 2},
+}
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _run_mode(name: str, args: argparse.Namespace) -> dict[str, float]:
+    hot_buffer = GStreamerHotBuffer(
+        args.rtsp_url,
+        f"bench-{name}",
+        fps=args.fps,
+        max_width=args.max_width,
+        decoder_threads=args.decoder_threads,
+        **MODES[name],
+    )
+    hot_buffer.start()
+    try:
+        time.sleep(args.warmup)
+        stats_before = hot_buffer.stats()
+        cpu_before = _cpu_seconds()
+        wall_before = time.perf_counter()
+
+        time.sleep(args.seconds)
+
+        cpu = _cpu_seconds() - cpu_before
+        wall = time.perf_counter() - wall_before
+        stats_after = hot_buffer.stats()
+    finally:
+        hot_buffer.stop()
+
+    encoded = stats_after["encoded"] - stats_before["encoded"]
+    return {
+        "cpu_pct": cpu / wall * 100.0,
+        "fps": encoded / wall,
+        "cpu_ms_per_frame": cpu * 1000.0 / encoded if encoded else 0.0,
+        "dropped_busy": stats_after["dropped_busy"] - stats_before["dropped_busy"],
+        "skipped": stats_after["skipped_delta_frames"] - stats_before["skipped_delta_frames"],
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Measure GStreamerHotBuffer CPU usage per decode mode.")
+    parser.add_argument("--rtsp-url", required=True)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--seconds", type=float, default=20.0, help="Measured time per mode.")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Time to connect before measuring.")
+    parser.add_argument("--fps", type=int, default=5)
+    parser.add_argument("--max-width", type=int, default=960)
+    parser.add_argument("--decoder-threads", type=int, default=0, help="avdec_h264 max-threads (0 = auto).")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    if args.seconds <= 0:
+        raise SystemExit("--seconds must be positive")
+
+    print(f"[gst-decode-bench] rtsp={args.rtsp_url} fps={args.fps} max_width={args.max_width} seconds={args.seconds:g}")
+    print(f"{'mode':<13}{'cpu %':>8}{'frames/s':>10}{'cpu ms/frame':>14}{'dropped':>9}{'skipped':>9}")
+    for name in args.modes:
+        result = _run_mode(name, args)
+        print(
+            f"{name:<13}{result['cpu_pct']:>8.1f}{result['fps']:>10.2f}{result['cpu_ms_per_frame']:>14.1f}"
+            f"{result['dropped_busy']:>9}{result['skipped']:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# Jämför FrameRingBuffer (deque/slots av BufferedFrame) mot ArenaFrameRingBuffer
+# (förallokerad bytearray + NumPy slot-tabell).
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.hot_buffer_benchmark --cameras 16 --frames 3000
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from ingestion.buffers.arena_hot_buffer import ArenaFrameRingBuffer
+from ingestion.buffers.rtsp_hot_buffer import BufferedFrame, FrameRingBuffer
+
+IMPLEMENTATIONS = {
+    "FrameRingBuffer": FrameRingBuffer,
+    "ArenaFrameRingBuffer": ArenaFrameRingBuffer,
+}
+
+
+def _make_payloads(count: int, frame_bytes: int) -> list[bytes]:
+    # Varierande storlek som riktiga JPEG-frames (±25 %).
+    payloads = []
+    for i in range(count):
+        size = int(frame_bytes * (0.75 + 0.5 * ((i * 7919) % 100) / 100.0))
+        payloads.append(os.urandom(size))
+    return payloads
+
+
+def _run_one(name: str, args: argparse.Namespace, payloads: list[bytes]) -> dict[str, float]:
+    buffer_class = IMPLEMENTATIONS[name]
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    frame_step = timedelta(seconds=1.0 / args.fps)
+
+    gc.collect()
+    gc_before = sum(stat["collections"] for stat in gc.get_stats())
+    tracemalloc.start()
+
+    buffers = [buffer_class(max_frames=args.max_frames, max_bytes=args.max_bytes) for _ in range(args.cameras)]
+
+    append_start = time.perf_counter()
+    for i in range(args.frames):
+        timestamp = t0 + frame_step * i
+        payload = memoryview(payloads[i % len(payloads)])
+        for buf in buffers:
+            if isinstance(buf, ArenaFrameRingBuffer):
+                # Arenan kopierar direkt från encoderns buffer, ingen bytes per frame.
+                buf.append_bytes(timestamp, payload, 960, 540)
+            else:
+                # tobytes() ger ett nytt objekt per frame, precis som cv2.imencode(...).tobytes() i Camera.
+                buf.append(BufferedFrame(timestamp=timestamp, jpeg_bytes=payload.tobytes(), width=960, height=540))
+    append_seconds = time.perf_counter() - append_start
+
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc_after = sum(stat["collections"] for stat in gc.get_stats())
+
+    last_ts = t0 + frame_step * (args.frames - 1)
+    window_start = last_ts - timedelta(seconds=args.max_frames / args.fps)
+
+    search_start = time.perf_counter()
+    for i in range(args.lookups):
+        target = window_start + timedelta(seconds=(i % 1000) / 1000.0 * args.max_frames / args.fps)
+        buffers[i % len(buffers)].search_frame(target)
+    search_seconds = time.perf_counter() - search_start
+
+    range_start = time.perf_counter()
+    for i in range(args.lookups // 10):
+        start = window_start + timedelta(seconds=(i % 10))
+        buffers[i % len(buffers)].range(start, start + timedelta(seconds=5))
+    range_seconds = time.perf_counter() - range_start
+
+    total_appends = args.frames * args.cameras
+    return {
+        "append_per_s": total_appends / append_seconds,
+        "search_per_s": args.lookups / search_seconds,
+        "range_per_s": (args.lookups // 10) / range_seconds,
+        "resident_mb": current_bytes / (1024 * 1024),
+        "peak_mb": peak_bytes / (1024 * 1024),
+        "gc_collections": gc_after - gc_before,
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark hot buffer implementations.")
+    parser.add_argument("--cameras", type=int, default=8, help="Number of simulated cameras (one buffer each).")
+    parser.add_argument("--frames", type=int, default=2000, help="Frames appended per camera.")
+    parser.add_argument("--fps", type=int, default=5, help="Simulated hot buffer fps.")
+    parser.add_argument("--max-frames", type=int, default=150, help="Buffer max_frames.")
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        default=16 * 1024 * 1024,
+        help="Buffer max_bytes. The arena preallocates all of it up front.",
+    )
+    parser.add_argument("--frame-bytes", type=int, default=60_000, help="Average JPEG size in bytes.")
+    parser.add_argument("--lookups", type=int, default=50_000, help="search_frame calls per implementation.")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    # Återanvänd en pool payloads: mäter buffrarnas egna kostnader, inte os.urandom.
+    payloads = _make_payloads(min(args.frames, 256), args.frame_bytes)
+
+    print(
+        f"[hot-buffer-bench] cameras={args.cameras} frames={args.frames} "
+        f"max_frames={args.max_frames} frame_bytes~{args.frame_bytes}"
+    )
+    header = f"{'implementation':<22}{'append/s':>12}{'search/s':>12}{'range/s':>10}{'resident MB':>13}{'peak MB':>10}{'gc':>6}"
+    print(header)
+    for name in IMPLEMENTATIONS:
+        result = _run_one(name, args, payloads)
+        print(
+            f"{name:<22}{result['append_per_s']:>12.0f}{result['search_per_s']:>12.0f}"
+            f"{result['range_per_s']:>10.0f}{result['resident_mb']:>13.1f}{result['peak_mb']:>10.1f}"
+            f"{result['gc_collections']:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
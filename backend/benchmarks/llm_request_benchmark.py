@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# Jämför analyslägena i Camera: fyra query_description_open-anrop per event
+# ("separate") mot ett query_description_bundle-anrop ("combined").
+#
+# Anropen går mot en simulerad endpoint (httpx.MockTransport) vars latens är
+# uppladdningstid (delad uplink) + overhead per request + tid per bild. Kostnaden uppskattas
+# som input-tokens: ~4 tecken text per token och ett fast antal tokens per bild.
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.llm_request_benchmark --events 20 --selection-frames 8
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+
+import httpx
+
+from analysis.async_prisma import LLMClient
+
+MODES = ("separate", "combined")
+
+
+def _make_event(args: argparse.Namespace) -> dict[str, list[str]]:
+    def image() -> str:
+        return base64.b64encode(os.urandom(args.image_bytes)).decode("ascii")
+
+    full_frame = image()
+    frames = [full_frame] + [image() for _ in range(args.selection_frames - 1)]
+    # Selection 2 (förändringsbaserad) plockar ungefär varannan frame ur samma fönster som selection 1.
+    return {
+        "snapshot": [image()],
+        "full_frame": [full_frame],
+        "selection_1": frames,
+        "selection_2": frames[::2],
+    }
+
+
+class _SimulatedEndpoint:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.requests = 0
+        self.body_bytes = 0
+        self.images = 0
+        self.input_tokens = 0
+        # Parallella requests delar på samma uplink.
+        self._uplink = asyncio.Lock()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        content = body["messages"][0]["content"]
+        images = sum(1 for part in content if part["type"] == "image_url")
+        text_chars = sum(len(part["text"]) for part in content if part["type"] == "text")
+        text_chars += len(json.dumps(body["response_format"]))
+
+        self.requests += 1
+        self.body_bytes += len(request.content)
+        self.images += images
+        self.input_tokens += images * self.args.tokens_per_image + text_chars // 4
+
+        async with self._uplink:
+            await asyncio.sleep(len(request.content) * 8 / (self.args.uplink_mbps * 1_000_000))
+        await asyncio.sleep(self.args.overhead_ms / 1000.0 + images * self.args.per_image_ms / 1000.0)
+
+        properties = body["response_format"]["json_schema"]["schema"]["properties"]
+        answer = {name: "simulated description" for name in properties}
+        return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(answer)}}]})
+
+
+async def _run_mode(mode: str, args: argparse.Namespace, events: list[dict[str, list[str]]]) -> dict[str, float]:
+    endpoint = _SimulatedEndpoint(args)
+    llm = LLMClient("http://llm.benchmark/v1/chat/completions", "benchmark", "benchmark-model", max_concurrency=64)
+    llm.client = httpx.AsyncClient(transport=httpx.MockTransport(endpoint))
+
+    latencies = []
+    for groups in events:
+        start = time.perf_counter()
+        if mode == "combined":
+            await llm.query_description_bundle(groups)
+        else:
+            await asyncio.gather(*(llm.query_description_open(images) for images in groups.values()))
+        latencies.append(time.perf_counter() - start)
+    await llm.close()
+
+    latencies.sort()
+    count = len(events)
+    return {
+        "requests": endpoint.requests / count,
+        "images": endpoint.images / count,
+        "kb": endpoint.body_bytes / count / 1024.0,
+        "tokens": endpoint.input_tokens / count,
+        "p50_ms": latencies[count // 2] * 1000.0,
+        "p95_ms": latencies[min(count - 1, int(count * 0.95))] * 1000.0,
+    }
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Compare four-request vs one-request LLM analysis per event.")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--selection-frames", type=int, default=8, help="Frames in selection 1 (selection 2 takes every other).")
+    parser.add_argument("--image-bytes", type=int, default=60_000, help="Approximate JPEG size per image.")
+    parser.add_argument("--tokens-per-image", type=int, default=258, help="Input tokens billed per image.")
+    parser.add_argument("--overhead-ms", type=float, default=800.0, help="Fixed server time per request.")
+    parser.add_argument("--per-image-ms", type=float, default=40.0, help="Server time per image.")
+    parser.add_argument("--uplink-mbps", type=float, default=50.0, help="Upload bandwidth.")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    if args.events <= 0 or args.selection_frames <= 0:
+        raise SystemExit("--events and --selection-frames must be positive")
+    events = [_make_event(args) for _ in range(args.events)]
+
+    print(
+        f"[llm-request-bench] events={args.events} selection_frames={args.selection_frames} "
+        f"image_bytes~{args.image_bytes} overhead={args.overhead_ms:.0f}ms per_image={args.per_image_ms:.0f}ms"
+    )
+    print(f"{'mode':<10}{'req/event':>11}{'images/event':>14}{'KB/event':>10}{'tokens/event':>14}{'p50 ms':>9}{'p95 ms':>9}")
+    for mode in MODES:
+        result = asyncio.run(_run_mode(mode, args, events))
+        print(
+            f"{mode:<10}{result['requests']:>11.1f}{result['images']:>14.1f}{result['kb']:>10.0f}"
+            f"{result['tokens']:>14.0f}{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
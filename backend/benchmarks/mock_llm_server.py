@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+# Lokal mock av ett chat-completions-API för lasttester av analysvägen.
+#
+# Servern pratar riktig HTTP/1.1 (keep-alive), så LLMClient mäts med
+# request-bygge, connection pool och flödeskontroll precis som mot Prisma.
+# Latens, felfrekvens och rate limits är konfigurerbara:
+#
+# - latens: bas + tid per bild, fördelad "fixed", "uniform" eller "lognormal"
+# - --error-rate: andel requests som svarar 500
+# - --rate-limit-rps/--rate-limit-burst: token bucket, 429 med Retry-After när den är tom
+# - --max-concurrent: fler samtidiga requests än så ger 503
+#
+# Svaret följer request-bodyns json_schema: strängfält får en text, listor med
+# enum får första tillåtna värdet.
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.mock_llm_server --port 8089 --latency-ms 800 --error-rate 0.02
+# och peka runnern dit:
+# python run_ingestion.py ... --endpoint http://127.0.0.1:8089/v1/chat/completions --api-key mock
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+@dataclass(frozen=True)
+class MockLLMConfig:
+    """Beteende för MockLLMServer.
+
+    `latency_spread` betyder halva bredden (andel av medianen) för "uniform"
+    och sigma för "lognormal"; "fixed" ignorerar den.
+    """
+
+    latency_ms: float = 800.0
+    per_image_ms: float = 40.0
+    latency_distribution: str = "lognormal"
+    latency_spread: float = 0.3
+    error_rate: float = 0.0
+    rate_limit_rps: float | None = None
+    rate_limit_burst: int | None = None
+    max_concurrent: int | None = None
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency_distribution must be one of: {', '.join(LATENCY_DISTRIBUTIONS)}")
+        if not 0.0 <= self.error_rate <= 1.0:
+            raise ValueError("error_rate must be between 0 and 1")
+        if self.rate_limit_rps is not None and self.rate_limit_rps <= 0:
+            raise ValueError("rate_limit_rps must be positive")
+
+
+class MockLLMServer:
+    """Chat-completions-kompatibel testserver i en bakgrundstråd.
+
+    Används som context manager eller med `start()`/`stop()`. `endpoint` är
+    URL:en att ge LLMClient och `stats()` räknar requests per utfall.
+    """
+
+    def __init__(self, config: MockLLMConfig | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or MockLLMConfig()
+        self._host = host
+        self._port = port
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        burst = self.config.rate_limit_burst
+        if burst is None and self.config.rate_limit_rps is not None:
+            burst = max(1, int(self.config.rate_limit_rps))
+        self._bucket_size = float(burst or 0)
+        self._tokens = self._bucket_size
+        self._tokens_updated_at = time.monotonic()
+        self._stats = {
+            "requests": 0,
+            "ok": 0,
+            "rate_limited": 0,
+            "overloaded": 0,
+            "errors": 0,
+            "bad_requests": 0,
+            "images": 0,
+            "bytes_in": 0,
+            "max_in_flight": 0,
+        }
+
+    @property
+    def endpoint(self) -> str:
+        if self._server is None:
+            raise RuntimeError("server is not started")
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self) -> str:
+        if self._server is not None:
+            return self.endpoint
+        self._server = _MockHTTPServer((self._host, self._port), _MockRequestHandler)
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        return self.endpoint
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        self._server = None
+        self._thread = None
+
+    def __enter__(self) -> MockLLMServer:
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight}
+
+    def handle(self, path: str, raw_body: bytes) -> tuple[int, dict[str, str], dict]:
+        """Svara på en request: (status, extra headers, JSON-body)."""
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return 404, {}, {"error": {"message": f"unknown path {path}"}}
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes_in"] += len(raw_body)
+            retry_after = self._take_token_locked()
+            if retry_after is not None:
+                self._stats["rate_limited"] += 1
+                return 429, {"Retry-After": f"{retry_after:.2f}"}, {"error": {"message": "rate limit exceeded"}}
+            if self.config.max_concurrent is not None and self._in_flight >= self.config.max_concurrent:
+                self._stats["overloaded"] += 1
+                return 503, {}, {"error": {"message": "server overloaded"}}
+            self._in_flight += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+
+        try:
+            try:
+                body = json.loads(raw_body)
+                content = body["messages"][0]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                with self._lock:
+                    self._stats["bad_requests"] += 1
+                return 400, {}, {"error": {"message": "invalid chat-completions body"}}
+
+            images = sum(1 for part in content if isinstance(part, dict) and part.get("type") == "image_url")
+            with self._lock:
+                self._stats["images"] += images
+                delay = self._latency_seconds_locked(images)
+                failed = self._random.random() < self.config.error_rate
+            time.sleep(delay)
+
+            if failed:
+                with self._lock:
+                    self._stats["errors"] += 1
+                return 500, {}, {"error": {"message": "simulated server error"}}
+
+            with self._lock:
+                self._stats["ok"] += 1
+                request_number = self._stats["ok"]
+            answer = _answer_for(body.get("response_format"))
+            return 200, {}, {
+                "id": f"mock-{request_number}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": json.dumps(answer)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": len(raw_body) // 4, "completion_tokens": 20, "total_tokens": len(raw_body) // 4 + 20},
+            }
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _take_token_locked(self) -> float | None:
+        # Returnerar None om en token togs, annars sekunder tills nästa finns.
+        rate = self.config.rate_limit_rps
+        if rate is None:
+            return None
+        now = time.monotonic()
+        self._tokens = min(self._bucket_size, self._tokens + (now - self._tokens_updated_at) * rate)
+        self._tokens_updated_at = now
+        if self._tokens < 1.0:
+            return (1.0 - self._tokens) / rate
+        self._tokens -= 1.0
+        return None
+
+    def _latency_seconds_locked(self, images: int) -> float:
+        config = self.config
+        median_ms = config.latency_ms + images * config.per_image_ms
+        if config.latency_distribution == "uniform":
+            median_ms *= self._random.uniform(1.0 - config.latency_spread, 1.0 + config.latency_spread)
+        elif config.latency_distribution == "lognormal":
+            median_ms *= math.exp(self._random.gauss(0.0, config.latency_spread))
+        return max(0.0, median_ms) / 1000.0
+
+
+def _answer_for(response_format) -> dict:
+    schema = {}
+    if isinstance(response_format, dict):
+        schema = response_format.get("json_schema", {}).get("schema", {})
+    properties = schema.get("properties") or {"description": {"type": "string"}}
+    answer = {}
+    for name, prop in properties.items():
+        if prop.get("type") == "array":
+            answer[name] = list(prop.get("items", {}).get("enum", []))[:1]
+        else:
+            answer[name] = f"mock {name}"
+    return answer
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Många samtidiga anslutningar från connection poolen vid lasttest.
+    request_queue_size = 256
+    mock: MockLLMServer
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        status, headers, payload = self.server.mock.handle(self.path, self._read_body())
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def log_message(self, format, *args) -> None:
+        return None
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median server time per request.")
+    parser.add_argument("--per-image-ms", type=float, default=40.0, help="Extra server time per image.")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-spread", type=float, default=0.3, help="Uniform half-width (fraction) or lognormal sigma.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500.")
+    parser.add_argument("--rate-limit-rps", type=float, help="Server-side request rate limit (429 when exceeded).")
+    parser.add_argument("--rate-limit-burst", type=int, help="Token bucket size for --rate-limit-rps.")
+    parser.add_argument("--max-concurrent", type=int, help="Concurrent requests before the server answers 503.")
+    parser.add_argument("--seed", type=int, help="Seed for latency and error sampling.")
+
+
+def config_from_args(args: argparse.Namespace) -> MockLLMConfig:
+    return MockLLMConfig(
+        latency_ms=args.latency_ms,
+        per_image_ms=args.per_image_ms,
+        latency_distribution=args.latency_distribution,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        rate_limit_rps=args.rate_limit_rps,
+        rate_limit_burst=args.rate_limit_burst,
+        max_concurrent=args.max_concurrent,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run a local mock chat-completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(config_from_args(args), host=args.host, port=args.port)
+    print(f"[mock-llm] listening on {server.start()}")
+    try:
+        while True:
+            time.sleep(10.0)
+            print(f"[mock-llm] stats={server.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"[mock-llm] final stats={server.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
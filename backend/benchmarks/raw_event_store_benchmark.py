@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Mäter events/s för RawEventStore: tidigare beteende (öppna, skriv en rad,
+# stäng per event) mot den buffrade skrivaren, med och utan rotation/gzip.
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.raw_event_store_benchmark --events 100000
+
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ingestion.source.replay_reader import RawEvent
+from ingestion.storage.raw_event_store import RawEventStore
+
+
+def _make_events(count: int) -> list[RawEvent]:
+    received_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        RawEvent(
+            raw={
+                "id": f"track-{i}",
+                "channel_id": 1,
+                "start_time": "2026-01-01T00:00:00.000000Z",
+                "classes": [{"type": "Human", "score": 0.9}],
+                "path": [{"timestamp": "2026-01-01T00:00:00.000000Z", "left": 0.1, "top": 0.2}] * 4,
+            },
+            received_at=received_at,
+            source="live",
+        )
+        for i in range(count)
+    ]
+
+
+def _run_open_per_event(folder: Path, events: list[RawEvent]) -> float:
+    # Samma som den gamla append: open/write/close per event.
+    path = folder / "raw_events.jsonl"
+    start = time.perf_counter()
+    for raw_event in events:
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(_row(raw_event), ensure_ascii=False) + "\n")
+    return time.perf_counter() - start
+
+
+def _row(raw_event: RawEvent) -> dict:
+    return {
+        "received_at": raw_event.received_at.isoformat(),
+        "source": raw_event.source,
+        "replay_seq": raw_event.replay_seq,
+        "replay_file": raw_event.replay_file,
+        "raw": raw_event.raw,
+    }
+
+
+def _run_open_per_line(folder: Path, lines: list[str]) -> float:
+    path = folder / "raw_events.jsonl"
+    start = time.perf_counter()
+    for line in lines:
+        with path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return time.perf_counter() - start
+
+
+def _run_store_lines(folder: Path, lines: list[str], **options) -> float:
+    start = time.perf_counter()
+    store = RawEventStore(str(folder), **options)
+    for line in lines:
+        store.append_lines([line])
+    store.close()
+    return time.perf_counter() - start
+
+
+def _run_store(folder: Path, events: list[RawEvent], **options) -> float:
+    start = time.perf_counter()
+    store = RawEventStore(str(folder), **options)
+    for raw_event in events:
+        store.append(raw_event)
+    store.close()
+    return time.perf_counter() - start
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark för RawEventStore.")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--flush-kb", type=int, default=256)
+    parser.add_argument("--rotate-mb", type=int, default=16, help="max_file_bytes för rotationsfallen")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    events = _make_events(args.events)
+    lines = [RawEventStore.to_line(raw_event) for raw_event in events]
+    flush_bytes = args.flush_kb * 1024
+    rotate_bytes = args.rotate_mb * 1024 * 1024
+    print(f"[raw-store-bench] {args.events} events, flush {args.flush_kb} KiB, rotate {args.rotate_mb} MiB")
+
+    cases = [
+        ("open/close per event", lambda folder: _run_open_per_event(folder, events)),
+        ("buffered", lambda folder: _run_store(folder, events, flush_bytes=flush_bytes, max_file_bytes=None)),
+        ("buffered + rotate", lambda folder: _run_store(folder, events, flush_bytes=flush_bytes, max_file_bytes=rotate_bytes)),
+        (
+            "buffered + rotate gzip",
+            lambda folder: _run_store(folder, events, flush_bytes=flush_bytes, max_file_bytes=rotate_bytes, compress="gzip"),
+        ),
+        # Bara skrivvägen, med färdigserialiserade rader.
+        ("write only: open/close", lambda folder: _run_open_per_line(folder, lines)),
+        ("write only: buffered", lambda folder: _run_store_lines(folder, lines, flush_bytes=flush_bytes, max_file_bytes=None)),
+    ]
+    rows = []
+    for name, run in cases:
+        with tempfile.TemporaryDirectory() as tmp:
+            seconds = run(Path(tmp))
+            disk_mb = sum(p.stat().st_size for p in Path(tmp).iterdir()) / 1e6
+        rows.append((name, seconds, disk_mb))
+
+    # Speedup mot open/close-raden i samma grupp (med resp. utan serialisering).
+    baselines = {name.startswith("write only"): seconds for name, seconds, _ in reversed(rows)}
+    print(f"{'mode':<26} {'seconds':>9} {'events/s':>10} {'speedup':>8} {'disk MB':>8}")
+    for name, seconds, disk_mb in rows:
+        baseline = baselines[name.startswith("write only")]
+        print(f"{name:<26} {seconds:>9.2f} {args.events / seconds:>10.0f} {baseline / seconds:>7.1f}x {disk_mb:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
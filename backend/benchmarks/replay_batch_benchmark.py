@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Jämför IngestionService.run_replay (en händelse i taget) mot
+# run_replay_batches (batcher över en processpool) på en syntetisk
+# MQTT-inspelning i JSONL med Axis object tracks.
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.replay_batch_benchmark --events 50000 --workers 0 2 4
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ingestion.ingestion_service import IngestionService
+
+
+def _write_capture(path: Path, events: int, image_bytes: int) -> None:
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    image_data = base64.b64encode(os.urandom(image_bytes)).decode("ascii") if image_bytes else None
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(events):
+            ts = (t0 + timedelta(milliseconds=200 * i)).isoformat().replace("+00:00", "Z")
+            payload = {
+                "id": f"track-{i}",
+                "channel_id": 1 + i % 4,
+                "start_time": ts,
+                "end_time": ts,
+                "duration": 0.4,
+                "classes": [{"type": "Human", "score": 0.9, "upper_clothing_colors": [{"name": "blue", "score": 0.4}]}],
+                "path": [{"timestamp": ts, "bounding_box": {"left": 0.1, "top": 0.2, "right": 0.3, "bottom": 0.6}}] * 8,
+                "parts": [{"object_track_id": f"track-{i}"}],
+            }
+            if image_data is not None:
+                payload["image"] = {"id": i, "type": "jpeg", "timestamp": ts, "data": image_data}
+            f.write(json.dumps(payload) + "\n")
+
+
+def _run(path: Path, workers: int | None, batch_size: int) -> tuple[int, float]:
+    service = IngestionService(enable_raw_store=False, on_internal_batch=lambda events: None)
+    start = time.perf_counter()
+    if workers is None:
+        count = service.run_replay(str(path))
+    else:
+        count = service.run_replay_batches(str(path), batch_size=batch_size, workers=workers)
+    return count, time.perf_counter() - start
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark för sekventiell och batchad replay.")
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--image-bytes", type=int, default=0, help="Storlek på base64-snapshot per händelse (0 = ingen)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, os.cpu_count() or 1])
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "capture.jsonl"
+        _write_capture(path, args.events, args.image_bytes)
+        size_mb = path.stat().st_size / 1e6
+        print(f"[replay-bench] {args.events} events, {size_mb:.1f} MB, cpu_count={os.cpu_count()}")
+
+        # Tomma callbacks: printar för ogiltiga händelser tar annars över mätningen.
+        rows = [("run_replay", *_run(path, None, args.batch_size))]
+        for workers in args.workers:
+            rows.append((f"batches workers={workers}", *_run(path, workers, args.batch_size)))
+
+    baseline = rows[0][2]
+    print(f"{'mode':<22} {'events':>8} {'seconds':>9} {'events/s':>10} {'speedup':>8}")
+    for name, count, seconds in rows:
+        print(f"{name:<22} {count:>8} {seconds:>9.2f} {count / seconds:>10.0f} {baseline / seconds:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
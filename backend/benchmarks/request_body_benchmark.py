@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# Mikrobenchmark för hur LLM-requestens body byggs: hela JSON-dokumentet via
+# json.dumps(...).encode() (som httpx gör med json=) mot StreamingJsonBody som
+# strömmar bilddatan i bitar.
+#
+# Mäter tid per body och högsta minnesanvändning (tracemalloc) för att bygga och
+# iterera igenom en body. Indata är antingen base64-strängar (som i Camera idag)
+# eller råa JPEG-bytes som base64-kodas bit för bit.
+#
+# Kör från GR8/backend:
+# PYTHONPATH=. python3 -m benchmarks.request_body_benchmark --images 12 --image-bytes 200000
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable
+
+from analysis.streaming_body import StreamingJsonBody, image_placeholder
+
+
+def _body(urls: list[str]) -> dict:
+    content = [{"type": "text", "text": "Describe what happens across the sequence."}]
+    content += [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{url}"}} for url in urls]
+    return {"model": "benchmark-model", "messages": [{"role": "user", "content": content}]}
+
+
+def _full_json(images_b64: list[str]) -> int:
+    data = json.dumps(_body(images_b64)).encode("utf-8")
+    return len(data)
+
+
+def _full_json_from_bytes(images: list[bytes]) -> int:
+    return _full_json([base64.b64encode(image).decode("ascii") for image in images])
+
+
+def _streamed(images: list) -> int:
+    body = StreamingJsonBody(_body([image_placeholder(i) for i in range(len(images))]), images)
+    return sum(len(chunk) for chunk in body.iter_chunks())
+
+
+def _measure(build: Callable[[list], int], images: list, rounds: int) -> dict[str, float]:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        size = build(images)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    build(images)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": elapsed * 1000.0, "peak_kb": peak / 1024.0, "size_kb": size / 1024.0}
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Compare full JSON request bodies with streamed bodies.")
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--image-bytes", type=int, default=200_000, help="Approximate JPEG size per image.")
+    parser.add_argument("--rounds", type=int, default=20)
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    if args.images <= 0 or args.rounds <= 0:
+        raise SystemExit("--images and --rounds must be positive")
+    raw = [os.urandom(args.image_bytes) for _ in range(args.images)]
+    b64 = [base64.b64encode(image).decode("ascii") for image in raw]
+
+    cases = (
+        ("json / base64 in", _full_json, b64),
+        ("stream / base64 in", _streamed, b64),
+        ("json / bytes in", _full_json_from_bytes, raw),
+        ("stream / bytes in", _streamed, raw),
+    )
+    print(f"[request-body-bench] images={args.images} image_bytes~{args.image_bytes} rounds={args.rounds}")
+    print(f"{'case':<20}{'body KB':>10}{'ms/body':>10}{'peak KB':>10}")
+    for name, build, images in cases:
+        result = _measure(build, images, args.rounds)
+        print(f"{name:<20}{result['size_kb']:>10.0f}{result['ms']:>10.2f}{result['peak_kb']:>10.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,7 +4,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import base64
 import json
-import os
+import sys
+import threading
 
 from pathlib import Path
 from sentence_transformers import SentenceTransformer
@@ -15,8 +16,18 @@ import cv2
 import uvicorn
 from zoneinfo import ZoneInfo
 
+try:
+    from ingestion.storage.frame_table import read_frame_at
+    from ingestion.storage.segment_index import SegmentIndex
+except ImportError:
+    # uvicorn startad inifrån database/ (utan backend på sys.path).
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from ingestion.storage.frame_table import read_frame_at
+    from ingestion.storage.segment_index import SegmentIndex
+
 DB_PATH = Path(__file__).with_name("analysis.sqlite")
-RECORDINGS_DIR = str(Path(__file__).resolve().parent.parent / "recordings/1")
+RECORDINGS_CAMERA_ID = "1"
+RECORDINGS_DIR = str(Path(__file__).resolve().parent.parent / "recordings" / RECORDINGS_CAMERA_ID)
 
 RECORDINGS_TZ = ZoneInfo("Europe/Stockholm")
 MODEL_PATH = "./models/all-MiniLM-L6-v2"
@@ -560,44 +571,49 @@ def save_description_bundle(
     }
 
 
-def image_from_timestamp(t, clip=10):
-    # Söker igenom alla videofiler och kollar på filnamnen. Om filens namn visar att den innehåller det timestamps som söks, så öppna den filen, 
-    # ta ut den framen som söks efter och konvertera den till bas64. 
+_segment_index = None
+_segment_index_lock = threading.Lock()
+
+
+def _get_segment_index():
+    global _segment_index
+    with _segment_index_lock:
+        if _segment_index is None:
+            _segment_index = SegmentIndex()
+        return _segment_index
+
+
+def image_from_timestamp(t, clip=10, camera_id=RECORDINGS_CAMERA_ID):
+    # Slår upp segmentet (fil + offset) i segmentindexet. Ligger tidpunkten efter
+    # senaste indexerade segmentet läggs ffmpeg-segment som ännu inte finns i
+    # indexet till från katalogen (högst en skanning per klipplängd och kamera)
+    # och uppslagningen görs om. Missar i äldre tider läser inte katalogen. Naiva tider tolkas som Stockholmstid, som tidigare.
+    # Framen hämtas via segmentets FrameTable: sökning till närmaste nyckelbild
+    # och avkodning fram till exakt PTS (tabellen byggs och sparas första gången).
     local_t = t.astimezone(RECORDINGS_TZ) if t.tzinfo is not None else t.replace(tzinfo=RECORDINGS_TZ)
+    index = _get_segment_index()
+    recordings_dir = str(Path(RECORDINGS_DIR).parent / str(camera_id))
+
+    location = index.locate(camera_id, local_t)
+    if location is None:
+        if index.sync_after_miss(camera_id, local_t, recordings_dir, clip_seconds=clip, tz=RECORDINGS_TZ):
+            location = index.locate(camera_id, local_t)
 
-    if not os.path.isdir(RECORDINGS_DIR):
+    if location is None:
         message = (
-            f"Ingen matchande video: recordings directory does not exist "
-            f"(dir={RECORDINGS_DIR}, timestamp={local_t.isoformat()})"
+            f"Ingen matchande video for timestamp {local_t.isoformat()} "
+            f"(camera={camera_id}, dir={recordings_dir}, index={index.path})"
         )
         print(f"[database] {message}")
         raise FileNotFoundError(message)
 
-    filenames = sorted(os.listdir(RECORDINGS_DIR))
-    for f in filenames:
-        try:
-            s = datetime.strptime(f, "D%Y-%m-%d-T%H-%M-%S.mp4").replace(tzinfo=RECORDINGS_TZ)
-            if s <= local_t < s + timedelta(seconds=clip):
-                p = os.path.join(RECORDINGS_DIR, f)
-                cap = cv2.VideoCapture(p)
-                cap.set(cv2.CAP_PROP_POS_FRAMES, int((local_t - s).total_seconds() * cap.get(cv2.CAP_PROP_FPS)))
-                ok, frame = cap.read()
-                cap.release()
-                if not ok:
-                    raise RuntimeError("Kunde inte läsa frame")
-
-                _, buffer = cv2.imencode(".jpg", frame)
-                return base64.b64encode(buffer).decode("utf-8")
-        except ValueError:
-            continue
-
-    sample_files = ", ".join(filenames[:5]) if filenames else "no files found"
-    message = (
-        f"Ingen matchande video for timestamp {local_t.isoformat()} in {RECORDINGS_DIR}. "
-        f"Checked {len(filenames)} file(s). Sample: {sample_files}"
-    )
-    print(f"[database] {message}")
-    raise FileNotFoundError(message)
+    frame_table = index.frame_table(camera_id, location.path)
+    frame = read_frame_at(location.path, location.offset_seconds, frame_table)
+    if frame is None:
+        raise RuntimeError("Kunde inte läsa frame")
+
+    _, buffer = cv2.imencode(".jpg", frame)
+    return base64.b64encode(buffer).decode("utf-8")
 
 def embed(text: str):
     return model.encode(text, normalize_embeddings=True).tolist()
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import concurrent.futures
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+OverflowPolicy = Literal["drop_oldest", "drop_shortest_track", "coalesce_by_track_id"]
+OVERFLOW_POLICIES = ("drop_oldest", "drop_shortest_track", "coalesce_by_track_id")
+
+
+@dataclass
+class _QueuedItem:
+    args: tuple
+    track_id: Optional[str]
+    duration: float
+    enqueued_at: float
+
+
+class AnalysisQueue:
+    """Begränsad arbetskö för analys av MQTT-event.
+
+    Ersätter en ThreadPoolExecutor med obegränsad kö. När kön är full avgör
+    `policy` vad som släpps:
+
+    - `drop_oldest`: äldsta väntande event släpps.
+    - `drop_shortest_track`: eventet med kortast track-duration släpps (kan vara det nya).
+    - `coalesce_by_track_id`: ett väntande event med samma track-id ersätts av det nya
+      (även när kön inte är full); annars som `drop_oldest`.
+
+    Med `drop_shortest_track` är kön en prioritetskö: längsta tracken plockas ut
+    först (lika långa i ankomstordning). Övriga policyer plockar ut i ankomstordning.
+
+    `shutdown()` släpper väntande event (räknas som `dropped`) och väntar bara in
+    det som workers redan har plockat ut.
+
+    Event som väntat längre än `max_age_seconds` släpps när de plockas ut, så
+    latensen hålls begränsad även när analysen inte hinner med.
+
+    Om handler returnerar en `concurrent.futures.Future` räknas eventet som
+    pågående tills futuren är klar. Då kan en enda worker agera dispatcher åt
+    en asynkron pipeline utan att statistiken blir fel.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        *,
+        max_size: int = 100,
+        workers: int = 10,
+        policy: OverflowPolicy = "drop_oldest",
+        max_age_seconds: Optional[float] = None,
+        name: str = "analysis",
+        monotonic_fn: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"policy must be one of: {', '.join(OVERFLOW_POLICIES)}")
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+
+        self._handler = handler
+        self._max_size = max_size
+        self._policy = policy
+        self._max_age_seconds = max_age_seconds
+        self._monotonic = monotonic_fn
+
+        self._items: "OrderedDict[int, _QueuedItem]" = OrderedDict()
+        self._by_track: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._submitted = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._expired = 0
+        self._processed = 0
+        self._failed = 0
+        self._in_flight = 0
+
+        self._workers: List[threading.Thread] = []
+        for i in range(max(0, workers)):
+            thread = threading.Thread(target=self._worker_main, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def submit(self, *args: Any, track_id: Optional[str] = None, duration: float = 0.0) -> bool:
+        """Köa ett anrop till handler(*args). Returnerar False om eventet släpptes direkt."""
+        item = _QueuedItem(args=args, track_id=track_id, duration=duration, enqueued_at=self._monotonic())
+        with self._cond:
+            if self._closed:
+                return False
+            self._submitted += 1
+
+            if self._policy == "coalesce_by_track_id" and track_id is not None and track_id in self._by_track:
+                # Behåll köplatsen men analysera den senaste versionen av tracken.
+                self._items[self._by_track[track_id]] = item
+                self._coalesced += 1
+                return True
+
+            if len(self._items) >= self._max_size:
+                victim = self._pick_victim_locked(item)
+                if victim is None:
+                    self._dropped += 1
+                    return False
+                self._remove_locked(victim)
+                self._dropped += 1
+
+            key = next(self._seq)
+            self._items[key] = item
+            if track_id is not None:
+                self._by_track[track_id] = key
+            self._cond.notify()
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "queued": len(self._items),
+                "in_flight": self._in_flight,
+                "submitted": self._submitted,
+                "dropped": self._dropped,
+                "coalesced": self._coalesced,
+                "expired": self._expired,
+                "processed": self._processed,
+                "failed": self._failed,
+                "max_size": self._max_size,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._cond:
+            self._closed = True
+            # Kön kan vara full av event bakom en långsam analys; de ska inte hålla upp stoppet.
+            self._dropped += len(self._items)
+            self._items.clear()
+            self._by_track.clear()
+            self._cond.notify_all()
+        if wait:
+            for thread in self._workers:
+                thread.join()
+
+    def _pick_victim_locked(self, incoming: _QueuedItem) -> Optional[int]:
+        if self._policy == "drop_shortest_track":
+            key, shortest = min(self._items.items(), key=lambda kv: kv[1].duration)
+            if incoming.duration <= shortest.duration:
+                return None
+            return key
+        return next(iter(self._items))
+
+    def _next_key_locked(self) -> int:
+        if self._policy == "drop_shortest_track":
+            # max() ger första av lika långa, dvs. äldsta.
+            return max(self._items.items(), key=lambda kv: kv[1].duration)[0]
+        return next(iter(self._items))
+
+    def _remove_locked(self, key: int) -> _QueuedItem:
+        item = self._items.pop(key)
+        if item.track_id is not None and self._by_track.get(item.track_id) == key:
+            del self._by_track[item.track_id]
+        return item
+
+    def _next_item(self) -> Optional[_QueuedItem]:
+        with self._cond:
+            while True:
+                while not self._items and not self._closed:
+                    self._cond.wait()
+                if not self._items:
+                    return None
+                item = self._remove_locked(self._next_key_locked())
+                age = self._monotonic() - item.enqueued_at
+                if self._max_age_seconds is not None and age > self._max_age_seconds:
+                    self._expired += 1
+                    self._dropped += 1
+                    continue
+                self._in_flight += 1
+                return item
+
+    def _worker_main(self) -> None:
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            try:
+                result = self._handler(*item.args)
+            except Exception as exc:
+                self._finish(exc)
+                continue
+            if isinstance(result, concurrent.futures.Future):
+                result.add_done_callback(self._on_future_done)
+            else:
+                self._finish(None)
+
+    def _on_future_done(self, future: concurrent.futures.Future) -> None:
+        if future.cancelled():
+            self._finish(concurrent.futures.CancelledError())
+        else:
+            self._finish(future.exception())
+
+    def _finish(self, exc: Optional[BaseException]) -> None:
+        if exc is not None:
+            print(f"[analysis-queue] handler failed: {exc!r}")
+        with self._cond:
+            self._in_flight -= 1
+            if exc is None:
+                self._processed += 1
+            else:
+                self._failed += 1
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+
+class AnalysisService:
+    """Processgemensam analystjänst som flera Camera-instanser registrerar sig hos.
+
+    Tjänsten äger en event loop-tråd, en liten CPU-pool och en global gräns för
+    hur många analyser som får pågå samtidigt. Kameror som delar tjänsten delar
+    också analysclienten (och därmed dess HTTP-connection pool), så antalet
+    trådar och sockets växer inte med antalet kameror.
+
+    `submit` blockerar tills en global plats är ledig. Anropet görs från
+    kamerans analyskö, så överlast hamnar i den kön och hanteras av dess policy.
+    """
+
+    def __init__(
+        self,
+        analysis_client: Any = None,
+        *,
+        concurrency: int = 32,
+        cpu_workers: int = 4,
+        name: str = "analysis-service",
+    ) -> None:
+        self.analysis_client = analysis_client
+        self.name = name
+        self._concurrency = max(1, concurrency)
+        self._slots = threading.BoundedSemaphore(self._concurrency)
+        self._cpu_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, cpu_workers),
+            thread_name_prefix=f"{name}-cpu",
+        )
+
+        self._lock = threading.Lock()
+        self._cameras: Dict[str, int] = {}
+        self._pending: Dict[concurrent.futures.Future, str] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._closed = False
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+
+        self._loop = asyncio.new_event_loop()
+        self._loop_ready = threading.Event()
+        self._loop_thread = threading.Thread(target=self._loop_main, name=f"{name}-loop", daemon=True)
+        self._loop_thread.start()
+        if not self._loop_ready.wait(timeout=5.0):
+            raise RuntimeError(f"[{name}] async loop failed to start")
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def register(self, camera_id: str) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"[{self.name}] service is closed")
+            self._cameras[camera_id] = self._cameras.get(camera_id, 0) + 1
+
+    def unregister(self, camera_id: str) -> None:
+        with self._lock:
+            count = self._cameras.get(camera_id, 0) - 1
+            if count > 0:
+                self._cameras[camera_id] = count
+            else:
+                self._cameras.pop(camera_id, None)
+
+    def submit(self, camera_id: str, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Schemalägg `coro` på tjänstens loop när en global plats är ledig."""
+        self._slots.acquire()
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                coro.close()
+                raise RuntimeError(f"[{self.name}] service is closed")
+            try:
+                future = asyncio.run_coroutine_threadsafe(self._run(camera_id, coro), self._loop)
+            except Exception:
+                self._slots.release()
+                raise
+            self._submitted += 1
+            self._in_flight[camera_id] = self._in_flight.get(camera_id, 0) + 1
+            self._pending[future] = camera_id
+        # Bokföringen i _run sker innan futuren blir klar, så den som väntar på futuren
+        # ser uppdaterade räknare. Den här callbacken plockar bara bort futuren ur _pending.
+        future.add_done_callback(self._forget)
+        return future
+
+    async def run_blocking(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Kör CPU-bundet arbete i tjänstens trådpool utan att blockera loopen."""
+        return await asyncio.get_running_loop().run_in_executor(self._cpu_pool, fn, *args)
+
+    def pending(self, camera_id: Optional[str] = None) -> List[concurrent.futures.Future]:
+        with self._lock:
+            return [f for f, owner in self._pending.items() if camera_id is None or owner == camera_id]
+
+    def wait_idle(self, camera_id: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """Vänta tills pågående analyser (för en kamera eller alla) är klara."""
+        _, not_done = concurrent.futures.wait(self.pending(camera_id), timeout=timeout)
+        return not not_done
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cameras": len(self._cameras),
+                "concurrency": self._concurrency,
+                "in_flight": sum(self._in_flight.values()),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "in_flight_by_camera": dict(self._in_flight),
+            }
+
+    def close(self, timeout: Optional[float] = None, close_client: bool = True) -> None:
+        """Vänta in pågående analyser, stäng analysclienten (om den är async) och stoppa loopen."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self.wait_idle(timeout=timeout)
+
+        client_close = getattr(self.analysis_client, "close", None)
+        if close_client and client_close is not None and asyncio.iscoroutinefunction(client_close):
+            # httpx.AsyncClient är bunden till loopen den använts på, så den måste stängas här.
+            try:
+                asyncio.run_coroutine_threadsafe(client_close(), self._loop).result(timeout=5.0)
+            except Exception as exc:
+                print(f"[{self.name}] closing analysis client failed: {exc!r}")
+
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5.0)
+        if not self._loop_thread.is_alive():
+            self._loop.close()
+        self._cpu_pool.shutdown(wait=True)
+
+    async def _run(self, camera_id: str, coro: Coroutine[Any, Any, Any]) -> Any:
+        ok = False
+        try:
+            result = await coro
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                remaining = self._in_flight.get(camera_id, 0) - 1
+                if remaining > 0:
+                    self._in_flight[camera_id] = remaining
+                else:
+                    self._in_flight.pop(camera_id, None)
+                if ok:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+            self._slots.release()
+
+    def _forget(self, future: concurrent.futures.Future) -> None:
+        with self._lock:
+            self._pending.pop(future, None)
+
+    def _loop_main(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop_ready.set()
+        self._loop.run_forever()
+
+
+_shared_service: Optional[AnalysisService] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_analysis_service(analysis_client: Any = None, **kwargs: Any) -> AnalysisService:
+    """Returnera processens gemensamma AnalysisService och skapa den vid första anropet.
+
+    `analysis_client` och övriga argument används bara när tjänsten skapas.
+    """
+    global _shared_service
+    with _shared_lock:
+        if _shared_service is None or _shared_service._closed:
+            _shared_service = AnalysisService(analysis_client, **kwargs)
+        return _shared_service
@@ -1,4 +1,17 @@
 from ingestion.buffers.rtsp_hot_buffer import BufferedFrame, FrameRingBuffer
+from ingestion.buffers.arena_hot_buffer import ArenaFrame, ArenaFrameRingBuffer
+from ingestion.buffers.shm_hot_buffer import SharedFrame, SharedFrameRingBuffer
 from ingestion.buffers.mqtt_event_buffer import BufferedMqttEvent, MqttEventRingBuffer
+from ingestion.buffers.pts_clock import PtsCameraClock
 
-__all__ = ["BufferedFrame", "FrameRingBuffer", "BufferedMqttEvent", "MqttEventRingBuffer"]
+__all__ = [
+    "BufferedFrame",
+    "FrameRingBuffer",
+    "ArenaFrame",
+    "ArenaFrameRingBuffer",
+    "SharedFrame",
+    "SharedFrameRingBuffer",
+    "BufferedMqttEvent",
+    "MqttEventRingBuffer",
+    "PtsCameraClock",
+]
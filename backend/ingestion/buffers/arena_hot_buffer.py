@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import numpy as np
+
+from ingestion.buffers.rtsp_hot_buffer import BufferedFrame
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def datetime_to_ns(timestamp: datetime) -> int:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return ((timestamp - _EPOCH) // timedelta(microseconds=1)) * 1000
+
+
+def ns_to_datetime(ns: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(ns) // 1000)
+
+
+@dataclass(frozen=True)
+class ArenaFrame:
+    """Frame som pekar rakt in i arenan (ingen kopia).
+
+    `jpeg_bytes` är en read-only memoryview och är bara giltig tills sloten
+    skrivs över av ringen. Använd `to_buffered_frame()` om framen ska sparas.
+    """
+
+    timestamp: datetime
+    jpeg_bytes: memoryview
+    width: int
+    height: int
+
+    def to_buffered_frame(self) -> BufferedFrame:
+        return BufferedFrame(
+            timestamp=self.timestamp,
+            jpeg_bytes=self.jpeg_bytes.tobytes(),
+            width=self.width,
+            height=self.height,
+        )
+
+
+class ArenaFrameRingBuffer:
+    """Alternativ hot buffer med förallokerad byte-arena och fast slot-tabell.
+
+    Samma API som `FrameRingBuffer`, men JPEG-bytes kopieras in i en enda
+    `bytearray` (storlek `max_bytes`) och metadata ligger i NumPy-arrayer
+    (timestamps som int64 epoch-ns, offsets, längder, dimensioner). Inga
+    per-frame-objekt lever i bufferten, vilket minskar allokeringar och GC.
+    Frames förutsätts komma i tidsordning.
+    """
+
+    def __init__(self, max_frames: int, max_bytes: int) -> None:
+        self._capacity = max(0, max_frames)
+        self._max_frames = max_frames
+        self._max_bytes = max_bytes
+        self._arena = bytearray(max(0, max_bytes))
+        self._arena_view = memoryview(self._arena).toreadonly()
+
+        self._timestamps_ns = np.zeros(self._capacity, dtype=np.int64)
+        self._offsets = np.zeros(self._capacity, dtype=np.int64)
+        self._lengths = np.zeros(self._capacity, dtype=np.int64)
+        self._widths = np.zeros(self._capacity, dtype=np.int32)
+        self._heights = np.zeros(self._capacity, dtype=np.int32)
+
+        self._head = 0
+        self._count = 0
+        self._write_offset = 0
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def append(self, frame: BufferedFrame) -> None:
+        self.append_bytes(frame.timestamp, frame.jpeg_bytes, frame.width, frame.height)
+
+    def append_bytes(self, timestamp: datetime, jpeg_bytes, width: int, height: int) -> None:
+        size = len(jpeg_bytes)
+        if self._capacity == 0 or size > len(self._arena):
+            return
+
+        timestamp_ns = datetime_to_ns(timestamp)
+        with self._lock:
+            if self._count == self._capacity:
+                self._pop_oldest_locked()
+
+            offset = self._write_offset
+            if offset + size > len(self._arena):
+                # Resten av arenan tillhör äldsta varvet; släpp det innan vi börjar om från 0.
+                while self._count and int(self._offsets[self._head]) >= offset:
+                    self._pop_oldest_locked()
+                offset = 0
+
+            while self._count and self._overlaps_oldest_locked(offset, size):
+                self._pop_oldest_locked()
+
+            self._arena[offset:offset + size] = jpeg_bytes
+            slot = (self._head + self._count) % self._capacity
+            self._timestamps_ns[slot] = timestamp_ns
+            self._offsets[slot] = offset
+            self._lengths[slot] = size
+            self._widths[slot] = width
+            self._heights[slot] = height
+            self._count += 1
+            self._total_bytes += size
+            self._write_offset = offset + size
+
+    def latest(self, seconds: int) -> List[ArenaFrame]:
+        if seconds <= 0:
+            return []
+        cutoff = datetime_to_ns(datetime.now(timezone.utc) - timedelta(seconds=seconds))
+        with self._lock:
+            return self._slice_locked(self._searchsorted_locked(cutoff, "left"), self._count)
+
+    def range(self, start_time: datetime, end_time: datetime) -> List[ArenaFrame]:
+        if end_time < start_time:
+            return []
+        with self._lock:
+            lo = self._searchsorted_locked(datetime_to_ns(start_time), "left")
+            hi = self._searchsorted_locked(datetime_to_ns(end_time), "right")
+            return self._slice_locked(lo, hi)
+
+    def search_frame(self, target_timestamp: datetime) -> ArenaFrame | None:
+        target_ns = datetime_to_ns(target_timestamp)
+        with self._lock:
+            if not self._count:
+                return None
+
+            lo = self._searchsorted_locked(target_ns, "left")
+            if lo == 0:
+                return self._frame_at_locked(0)
+            if lo >= self._count:
+                return self._frame_at_locked(self._count - 1)
+
+            before_ns = int(self._timestamps_ns[(self._head + lo - 1) % self._capacity])
+            after_ns = int(self._timestamps_ns[(self._head + lo) % self._capacity])
+            if (target_ns - before_ns) <= (after_ns - target_ns):
+                return self._frame_at_locked(lo - 1)
+            return self._frame_at_locked(lo)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "frames": self._count,
+                "bytes": self._total_bytes,
+                "max_frames": self._max_frames,
+                "max_bytes": self._max_bytes,
+            }
+
+    def _overlaps_oldest_locked(self, offset: int, size: int) -> bool:
+        old_offset = int(self._offsets[self._head])
+        old_end = old_offset + int(self._lengths[self._head])
+        return old_offset < offset + size and offset < old_end
+
+    def _pop_oldest_locked(self) -> None:
+        self._total_bytes -= int(self._lengths[self._head])
+        self._head = (self._head + 1) % self._capacity
+        self._count -= 1
+
+    def _searchsorted_locked(self, target_ns: int, side: str) -> int:
+        # Ringen är högst två sammanhängande segment i timestamp-arrayen.
+        first_len = min(self._count, self._capacity - self._head)
+        first = self._timestamps_ns[self._head:self._head + first_len]
+        index = int(np.searchsorted(first, target_ns, side=side))
+        if index < first_len or first_len == self._count:
+            return index
+        second = self._timestamps_ns[:self._count - first_len]
+        return first_len + int(np.searchsorted(second, target_ns, side=side))
+
+    def _frame_at_locked(self, index: int) -> ArenaFrame:
+        slot = (self._head + index) % self._capacity
+        offset = int(self._offsets[slot])
+        return ArenaFrame(
+            timestamp=ns_to_datetime(self._timestamps_ns[slot]),
+            jpeg_bytes=self._arena_view[offset:offset + int(self._lengths[slot])],
+            width=int(self._widths[slot]),
+            height=int(self._heights[slot]),
+        )
+
+    def _slice_locked(self, lo: int, hi: int) -> List[ArenaFrame]:
+        return [self._frame_at_locked(i) for i in range(lo, hi)]
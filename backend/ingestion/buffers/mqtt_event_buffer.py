@@ -2,39 +2,62 @@ from __future__ import annotations
 
 import json
 import threading
-from collections import deque
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Deque, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 
 @dataclass(frozen=True)
 class BufferedMqttEvent:
     timestamp: datetime
     payload: Dict[str, Any]
+    # Storlek på rå MQTT-payload i bytes (len(msg.payload)). Sätts av den som tar emot
+    # meddelandet så att bufferten slipper serialisera om payloaden för att mäta den.
+    size_bytes: Optional[int] = None
 
 
 class MqttEventRingBuffer:
-    """Liten, trådsäker ringbuffer för MQTT-event."""
+    """Liten, trådsäker ringbuffer för MQTT-event.
+
+    Events ligger i en förallokerad ring med parallella arrayer för timestamp
+    och storlek, så uppslag bisectas direkt i ringen (O(log n), ingen kopia)
+    och trimning använder storleken som räknades fram vid insättning.
+    Events förutsätts komma i tidsordning.
+    """
 
     def __init__(self, max_events: int = 300, max_bytes: int = 5 * 1024 * 1024) -> None:
-        self._events: Deque[BufferedMqttEvent] = deque()
+        self._capacity = max(0, max_events)
+        self._slots: List[Optional[BufferedMqttEvent]] = [None] * self._capacity
+        self._stamps: List[Optional[datetime]] = [None] * self._capacity
+        self._sizes: List[int] = [0] * self._capacity
+        self._head = 0
+        self._count = 0
         self._max_events = max_events
         self._max_bytes = max_bytes
         self._total_bytes = 0
         self._lock = threading.Lock()
 
     def append(self, event: BufferedMqttEvent) -> None:
-        approx_size = len(json.dumps(event.payload, ensure_ascii=False).encode("utf-8"))
+        if self._capacity == 0:
+            return
+        approx_size = event.size_bytes
+        if approx_size is None:
+            approx_size = len(json.dumps(event.payload, ensure_ascii=False).encode("utf-8"))
         with self._lock:
-            self._events.append(event)
+            if self._count == self._capacity:
+                self._pop_oldest_locked()
+            slot = (self._head + self._count) % self._capacity
+            self._slots[slot] = event
+            self._stamps[slot] = event.timestamp
+            self._sizes[slot] = approx_size
+            self._count += 1
             self._total_bytes += approx_size
             self._trim_locked()
 
     def stats(self) -> Dict[str, int]:
         with self._lock:
             return {
-                "events": len(self._events),
+                "events": self._count,
                 "bytes": self._total_bytes,
                 "max_events": self._max_events,
                 "max_bytes": self._max_bytes,
@@ -46,31 +69,18 @@ class MqttEventRingBuffer:
         tolerance_ms: Optional[int] = None,
     ) -> Optional[BufferedMqttEvent]:
         with self._lock:
-            if not self._events:
+            if not self._count:
                 return None
-            events = list(self._events)
 
-        lo = 0
-        hi = len(events) - 1
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            mid_ts = events[mid].timestamp
-            if mid_ts < target_timestamp:
-                lo = mid + 1
-            elif mid_ts > target_timestamp:
-                hi = mid - 1
+            lo = self._bisect_left_locked(target_timestamp)
+            if lo == 0:
+                candidate = self._event_at_locked(0)
+            elif lo >= self._count:
+                candidate = self._event_at_locked(self._count - 1)
             else:
-                candidate = events[mid]
-                return self._within_tolerance(candidate, target_timestamp, tolerance_ms)
-
-        if hi < 0:
-            candidate = events[0]
-        elif lo >= len(events):
-            candidate = events[-1]
-        else:
-            before = events[hi]
-            after = events[lo]
-            candidate = before if (target_timestamp - before.timestamp) <= (after.timestamp - target_timestamp) else after
+                before = self._event_at_locked(lo - 1)
+                after = self._event_at_locked(lo)
+                candidate = before if (target_timestamp - before.timestamp) <= (after.timestamp - target_timestamp) else after
 
         return self._within_tolerance(candidate, target_timestamp, tolerance_ms)
 
@@ -85,9 +95,27 @@ class MqttEventRingBuffer:
         delta_ms = abs((candidate.timestamp - target_timestamp).total_seconds() * 1000.0)
         return candidate if delta_ms <= tolerance_ms else None
 
+    def _event_at_locked(self, index: int) -> BufferedMqttEvent:
+        return self._slots[(self._head + index) % self._capacity]
+
+    def _bisect_left_locked(self, target_timestamp: datetime) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._stamps[(self._head + mid) % self._capacity] < target_timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _pop_oldest_locked(self) -> None:
+        self._total_bytes -= self._sizes[self._head]
+        self._slots[self._head] = None
+        self._stamps[self._head] = None
+        self._sizes[self._head] = 0
+        self._head = (self._head + 1) % self._capacity
+        self._count -= 1
+
     def _trim_locked(self) -> None:
-        while self._events and (
-            len(self._events) > self._max_events or self._total_bytes > self._max_bytes
-        ):
-            old = self._events.popleft()
-            self._total_bytes -= len(json.dumps(old.payload, ensure_ascii=False).encode("utf-8"))
+        while self._count and self._total_bytes > self._max_bytes:
+            self._pop_oldest_locked()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+
+class PtsCameraClock:
+    """Koppling mellan GStreamer-PTS och kamerans NTP-tid.
+
+    RTP-proben registrerar ett ankare (pts, kameratid) för varje frame som bär
+    NTP-extension. En frame behåller sin PTS genom depay, avkodning, skalning
+    och färgkonvertering, så kameratiden för en avkodad frame slås upp via dess
+    PTS i stället för att räknas fram ur ordningen frames kommer i. Frames som
+    släpps någonstans i pipelinen påverkar alltså inte de andras tider.
+
+    Utan exakt träff används närmaste ankare plus PTS-skillnaden. Om PTS går
+    bakåt (ny session efter omanslutning) börjar klockan om.
+    """
+
+    def __init__(self, max_anchors: int = 2048) -> None:
+        self._max_anchors = max(1, max_anchors)
+        self._pts: List[int] = []
+        self._times: List[datetime] = []
+        self._lock = threading.Lock()
+        self._resets = 0
+        self._lookups = 0
+        self._exact = 0
+
+    def add(self, pts_ns: int, camera_time: datetime) -> None:
+        with self._lock:
+            if self._pts and pts_ns <= self._pts[-1]:
+                if pts_ns == self._pts[-1]:
+                    return
+                self._pts.clear()
+                self._times.clear()
+                self._resets += 1
+            self._pts.append(pts_ns)
+            self._times.append(camera_time)
+            # Trimma i klump så att append förblir amorterat O(1).
+            if len(self._pts) >= 2 * self._max_anchors:
+                del self._pts[: -self._max_anchors]
+                del self._times[: -self._max_anchors]
+
+    def camera_time(self, pts_ns: int) -> Optional[datetime]:
+        with self._lock:
+            if not self._pts:
+                return None
+            self._lookups += 1
+            index = bisect_left(self._pts, pts_ns)
+            if index < len(self._pts) and self._pts[index] == pts_ns:
+                self._exact += 1
+                return self._times[index]
+            if index == len(self._pts) or (index > 0 and pts_ns - self._pts[index - 1] <= self._pts[index] - pts_ns):
+                index -= 1
+            return self._times[index] + timedelta(microseconds=(pts_ns - self._pts[index]) / 1000.0)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clock_anchors": len(self._pts),
+                "clock_lookups": self._lookups,
+                "clock_exact": self._exact,
+                "clock_resets": self._resets,
+            }
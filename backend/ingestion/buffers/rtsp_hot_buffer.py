@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import threading
-from collections import deque
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Deque, Dict, List
+from typing import Dict, List, Optional
 
 
 @dataclass(frozen=True)
@@ -15,18 +14,34 @@ class BufferedFrame:
     height: int
 
 class FrameRingBuffer:
-    """Fast storlek + minnesbudget för hot buffer."""
+    """Fast storlek + minnesbudget för hot buffer.
+
+    Frames ligger i en förallokerad ring (`_slots`) med en parallell
+    timestamp-array (`_stamps`) så att uppslag kan bisectas direkt i ringen
+    utan att kopiera hela bufferten. Frames förutsätts komma i tidsordning.
+    """
 
     def __init__(self, max_frames: int, max_bytes: int) -> None:
-        self._frames: Deque[BufferedFrame] = deque()
+        self._capacity = max(0, max_frames)
+        self._slots: List[Optional[BufferedFrame]] = [None] * self._capacity
+        self._stamps: List[Optional[datetime]] = [None] * self._capacity
+        self._head = 0
+        self._count = 0
         self._max_frames = max_frames
         self._max_bytes = max_bytes
         self._total_bytes = 0
         self._lock = threading.Lock()
 
     def append(self, frame: BufferedFrame) -> None:
+        if self._capacity == 0:
+            return
         with self._lock:
-            self._frames.append(frame)
+            if self._count == self._capacity:
+                self._pop_oldest_locked()
+            slot = (self._head + self._count) % self._capacity
+            self._slots[slot] = frame
+            self._stamps[slot] = frame.timestamp
+            self._count += 1
             self._total_bytes += len(frame.jpeg_bytes)
             self._trim_locked()
 
@@ -35,49 +50,82 @@ class FrameRingBuffer:
             return []
         cutoff = datetime.now(timezone.utc) - timedelta(seconds=seconds)
         with self._lock:
-            return [f for f in self._frames if f.timestamp >= cutoff]
+            return self._slice_locked(self._bisect_left_locked(cutoff), self._count)
+
+    def range(self, start_time: datetime, end_time: datetime) -> List[BufferedFrame]:
+        """Alla frames med start_time <= timestamp <= end_time, i tidsordning."""
+        if end_time < start_time:
+            return []
+        with self._lock:
+            lo = self._bisect_left_locked(start_time)
+            hi = self._bisect_right_locked(end_time)
+            return self._slice_locked(lo, hi)
 
     def stats(self) -> Dict[str, int]:
         with self._lock:
             return {
-                "frames": len(self._frames),
+                "frames": self._count,
                 "bytes": self._total_bytes,
                 "max_frames": self._max_frames,
                 "max_bytes": self._max_bytes,
             }
 
     def _trim_locked(self) -> None:
-        while self._frames and (
-            len(self._frames) > self._max_frames or self._total_bytes > self._max_bytes
-        ):
-            old = self._frames.popleft()
+        while self._count and self._total_bytes > self._max_bytes:
+            self._pop_oldest_locked()
+
+    def _pop_oldest_locked(self) -> None:
+        old = self._slots[self._head]
+        self._slots[self._head] = None
+        self._stamps[self._head] = None
+        self._head = (self._head + 1) % self._capacity
+        self._count -= 1
+        if old is not None:
             self._total_bytes -= len(old.jpeg_bytes)
 
-    def search_frame(self, target_timestamp: datetime) -> BufferedFrame | None:
-        with self._lock:
-            if not self._frames:
-                return None
-            frames = list(self._frames)
+    def _stamp_at_locked(self, index: int) -> datetime:
+        return self._stamps[(self._head + index) % self._capacity]
 
-        lo = 0
-        hi = len(frames) - 1
-        while lo <= hi:
+    def _frame_at_locked(self, index: int) -> BufferedFrame:
+        return self._slots[(self._head + index) % self._capacity]
+
+    def _bisect_left_locked(self, target_timestamp: datetime) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
             mid = (lo + hi) // 2
-            mid_ts = frames[mid].timestamp
-            if mid_ts < target_timestamp:
+            if self._stamp_at_locked(mid) < target_timestamp:
                 lo = mid + 1
-            elif mid_ts > target_timestamp:
-                hi = mid - 1
             else:
-                return frames[mid]
+                hi = mid
+        return lo
+
+    def _bisect_right_locked(self, target_timestamp: datetime) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if target_timestamp < self._stamp_at_locked(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _slice_locked(self, lo: int, hi: int) -> List[BufferedFrame]:
+        return [self._frame_at_locked(i) for i in range(lo, hi)]
+
+    def search_frame(self, target_timestamp: datetime) -> BufferedFrame | None:
+        with self._lock:
+            if not self._count:
+                return None
+
+            lo = self._bisect_left_locked(target_timestamp)
+            if lo == 0:
+                return self._frame_at_locked(0)
+            if lo >= self._count:
+                return self._frame_at_locked(self._count - 1)
 
-        if hi < 0:
-            return frames[0]
-        if lo >= len(frames):
-            return frames[-1]
+            before = self._frame_at_locked(lo - 1)
+            after = self._frame_at_locked(lo)
 
-        before = frames[hi]
-        after = frames[lo]
         if (target_timestamp - before.timestamp) <= (after.timestamp - target_timestamp):
             return before
         return after
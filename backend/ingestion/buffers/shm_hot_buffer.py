@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ingestion.buffers.arena_hot_buffer import datetime_to_ns, ns_to_datetime
+from ingestion.buffers.rtsp_hot_buffer import BufferedFrame
+
+_MAGIC = 0x4752385F484F5431  # "GR8_HOT1"
+_READ_RETRIES = 4
+
+# Header (uint64): magic, capacity, arena_size, write_count, oldest, total_bytes, write_offset, max_frames, writer_pid
+_HEADER_FIELDS = 9
+(
+    _H_MAGIC,
+    _H_CAPACITY,
+    _H_ARENA,
+    _H_WRITE_COUNT,
+    _H_OLDEST,
+    _H_TOTAL_BYTES,
+    _H_WRITE_OFFSET,
+    _H_MAX_FRAMES,
+    _H_WRITER_PID,
+) = range(_HEADER_FIELDS)
+
+_SLOT_DTYPE = np.dtype(
+    [
+        ("seq", "<u8"),
+        ("ts_ns", "<i8"),
+        ("offset", "<i8"),
+        ("length", "<i8"),
+        ("width", "<i4"),
+        ("height", "<i4"),
+    ]
+)
+
+
+# Segment som skapats av den här processen (resource_tracker äger dem redan).
+_created_here: set[str] = set()
+
+
+def shared_hot_buffer_name(camera_id: str) -> str:
+    return f"gr8_hot_buffer_{camera_id}"
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """Frame som pekar rakt in i shared memory (zero-copy).
+
+    `jpeg_bytes` kan skrivas över av writern när som helst. Läs klart datan
+    och kontrollera sedan `is_valid()` (seqlock), eller använd
+    `to_buffered_frame()` som kopierar och validerar i ett steg.
+    """
+
+    timestamp: datetime
+    jpeg_bytes: memoryview
+    width: int
+    height: int
+    frame_number: int
+    _owner: "SharedFrameRingBuffer"
+
+    def is_valid(self) -> bool:
+        return self._owner._slot_seq(self.frame_number) == _published_seq(self.frame_number)
+
+    def to_buffered_frame(self) -> BufferedFrame | None:
+        data = self.jpeg_bytes.tobytes()
+        if not self.is_valid():
+            return None
+        return BufferedFrame(timestamp=self.timestamp, jpeg_bytes=data, width=self.width, height=self.height)
+
+
+def _published_seq(frame_number: int) -> int:
+    # Jämnt = publicerad, udda = skrivs just nu, 0 = tom/evictad.
+    return 2 * frame_number + 2
+
+
+class SharedFrameRingBuffer:
+    """Hot buffer i `multiprocessing.shared_memory` med en writer och flera läsare.
+
+    Writern (Camera-processen) skapar bufferten med `create(camera_id, ...)`,
+    andra lokala processer kopplar upp sig med `attach(camera_id)` och läser
+    senaste frames utan kopiering. Ingen lås delas mellan processer: varje
+    slot har en sekvensräknare (seqlock) som writern sätter udda under
+    skrivning och jämn när framen är publicerad, och som nollas när framens
+    bytes i arenan skrivs över. Läsare validerar räknaren efter läsning.
+
+    Layout: header (uint64 x 9) | slot-tabell | byte-arena.
+    Frames förutsätts komma i tidsordning.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, *, owner: bool) -> None:
+        self._shm = shm
+        self._owner = owner
+        self._header = np.ndarray((_HEADER_FIELDS,), dtype="<u8", buffer=shm.buf, offset=0)
+        if int(self._header[_H_MAGIC]) != _MAGIC:
+            raise ValueError(f"shared memory {shm.name!r} is not a hot buffer")
+
+        self._capacity = int(self._header[_H_CAPACITY])
+        self._arena_size = int(self._header[_H_ARENA])
+        slots_offset = _HEADER_FIELDS * 8
+        self._slots = np.ndarray((self._capacity,), dtype=_SLOT_DTYPE, buffer=shm.buf, offset=slots_offset)
+        arena_offset = slots_offset + self._capacity * _SLOT_DTYPE.itemsize
+        self._arena = shm.buf[arena_offset:arena_offset + self._arena_size]
+        self._arena_view = self._arena.toreadonly()
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, camera_id: str, max_frames: int, max_bytes: int) -> "SharedFrameRingBuffer":
+        capacity = max(1, max_frames)
+        arena_size = max(1, max_bytes)
+        size = _HEADER_FIELDS * 8 + capacity * _SLOT_DTYPE.itemsize + arena_size
+        name = shared_hot_buffer_name(camera_id)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            _reclaim_stale(name)
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((_HEADER_FIELDS,), dtype="<u8", buffer=shm.buf, offset=0)
+        header[:] = 0
+        header[_H_WRITER_PID] = os.getpid()
+        header[_H_CAPACITY] = capacity
+        header[_H_ARENA] = arena_size
+        header[_H_MAX_FRAMES] = max(0, max_frames)
+        np.ndarray((capacity,), dtype=_SLOT_DTYPE, buffer=shm.buf, offset=_HEADER_FIELDS * 8)[:] = 0
+        header[_H_MAGIC] = _MAGIC
+        del header
+        _created_here.add(name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, camera_id: str) -> "SharedFrameRingBuffer":
+        name = shared_hot_buffer_name(camera_id)
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created_here:
+            _untrack(shm)
+        return cls(shm, owner=False)
+
+    # --- writer ---
+
+    def append(self, frame: BufferedFrame) -> None:
+        self.append_bytes(frame.timestamp, frame.jpeg_bytes, frame.width, frame.height)
+
+    def append_bytes(self, timestamp: datetime, jpeg_bytes, width: int, height: int) -> None:
+        if not self._owner:
+            raise RuntimeError("only the creating process may write to the shared hot buffer")
+        size = len(jpeg_bytes)
+        if size > self._arena_size:
+            return
+
+        header = self._header
+        with self._write_lock:
+            frame_number = int(header[_H_WRITE_COUNT])
+            if frame_number - int(header[_H_OLDEST]) >= self._capacity:
+                self._evict_oldest_locked()
+
+            offset = int(header[_H_WRITE_OFFSET])
+            if offset + size > self._arena_size:
+                while self._live_count_locked() and self._oldest_offset_locked() >= offset:
+                    self._evict_oldest_locked()
+                offset = 0
+            while self._live_count_locked() and self._oldest_overlaps_locked(offset, size):
+                self._evict_oldest_locked()
+
+            slot = self._slots[frame_number % self._capacity]
+            slot["seq"] = _published_seq(frame_number) - 1
+            self._arena[offset:offset + size] = jpeg_bytes
+            slot["ts_ns"] = datetime_to_ns(timestamp)
+            slot["offset"] = offset
+            slot["length"] = size
+            slot["width"] = width
+            slot["height"] = height
+            slot["seq"] = _published_seq(frame_number)
+
+            header[_H_TOTAL_BYTES] = int(header[_H_TOTAL_BYTES]) + size
+            header[_H_WRITE_OFFSET] = offset + size
+            header[_H_WRITE_COUNT] = frame_number + 1
+
+    def _live_count_locked(self) -> int:
+        return int(self._header[_H_WRITE_COUNT]) - int(self._header[_H_OLDEST])
+
+    def _oldest_offset_locked(self) -> int:
+        return int(self._slots[int(self._header[_H_OLDEST]) % self._capacity]["offset"])
+
+    def _oldest_overlaps_locked(self, offset: int, size: int) -> bool:
+        slot = self._slots[int(self._header[_H_OLDEST]) % self._capacity]
+        old_offset = int(slot["offset"])
+        return old_offset < offset + size and offset < old_offset + int(slot["length"])
+
+    def _evict_oldest_locked(self) -> None:
+        oldest = int(self._header[_H_OLDEST])
+        slot = self._slots[oldest % self._capacity]
+        slot["seq"] = 0
+        self._header[_H_TOTAL_BYTES] = int(self._header[_H_TOTAL_BYTES]) - int(slot["length"])
+        self._header[_H_OLDEST] = oldest + 1
+
+    # --- readers (alla processer) ---
+
+    def latest(self, seconds: int) -> List[SharedFrame]:
+        if seconds <= 0:
+            return []
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+        return self._range_ns(datetime_to_ns(cutoff), None)
+
+    def range(self, start_time: datetime, end_time: datetime) -> List[SharedFrame]:
+        if end_time < start_time:
+            return []
+        return self._range_ns(datetime_to_ns(start_time), datetime_to_ns(end_time))
+
+    def _range_ns(self, start_ns: int, end_ns: Optional[int]) -> List[SharedFrame]:
+        lo, hi = self._published_window()
+        first = self._bisect_left(lo, hi, start_ns)
+        frames = []
+        for frame_number in range(first, hi):
+            frame = self._read(frame_number)
+            if frame is None:
+                continue
+            if end_ns is not None and datetime_to_ns(frame.timestamp) > end_ns:
+                break
+            frames.append(frame)
+        return frames
+
+    def search_frame(self, target_timestamp: datetime) -> SharedFrame | None:
+        target_ns = datetime_to_ns(target_timestamp)
+        for _ in range(_READ_RETRIES):
+            lo, hi = self._published_window()
+            if lo >= hi:
+                return None
+            index = self._bisect_left(lo, hi, target_ns)
+            if index <= lo:
+                candidate = self._read(lo)
+            elif index >= hi:
+                candidate = self._read(hi - 1)
+            else:
+                before = self._read(index - 1)
+                after = self._read(index)
+                if before is None or after is None:
+                    candidate = before or after
+                elif (target_ns - datetime_to_ns(before.timestamp)) <= (datetime_to_ns(after.timestamp) - target_ns):
+                    candidate = before
+                else:
+                    candidate = after
+            if candidate is not None:
+                return candidate
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        lo, hi = self._published_window()
+        return {
+            "frames": hi - lo,
+            "bytes": int(self._header[_H_TOTAL_BYTES]),
+            "max_frames": int(self._header[_H_MAX_FRAMES]),
+            "max_bytes": self._arena_size,
+        }
+
+    def _published_window(self) -> tuple[int, int]:
+        hi = int(self._header[_H_WRITE_COUNT])
+        lo = max(int(self._header[_H_OLDEST]), hi - self._capacity)
+        return lo, hi
+
+    def _slot_seq(self, frame_number: int) -> int:
+        return int(self._slots[frame_number % self._capacity]["seq"])
+
+    def _bisect_left(self, lo: int, hi: int, target_ns: int) -> int:
+        # Läser timestamps utan validering; slutkandidaten valideras i _read.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if int(self._slots[mid % self._capacity]["ts_ns"]) < target_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _read(self, frame_number: int) -> Optional[SharedFrame]:
+        slot = self._slots[frame_number % self._capacity]
+        expected = _published_seq(frame_number)
+        if int(slot["seq"]) != expected:
+            return None
+        ts_ns = int(slot["ts_ns"])
+        offset = int(slot["offset"])
+        length = int(slot["length"])
+        width = int(slot["width"])
+        height = int(slot["height"])
+        if int(slot["seq"]) != expected:
+            return None
+        return SharedFrame(
+            timestamp=ns_to_datetime(ts_ns),
+            jpeg_bytes=self._arena_view[offset:offset + length],
+            width=width,
+            height=height,
+            frame_number=frame_number,
+            _owner=self,
+        )
+
+    def close(self) -> None:
+        # Numpy-vyer och memoryviews måste släppas innan mmap:en kan stängas,
+        # så SharedFrame-objekt får inte leva kvar efter close().
+        self._header = None
+        self._slots = None
+        self._arena_view.release()
+        self._arena.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            _created_here.discard(self._shm.name)
+
+
+def _reclaim_stale(name: str) -> None:
+    # Namnet finns redan. Lever writern som skapade segmentet är det i bruk och
+    # får inte tas över; annars är det rester från en krashad process.
+    stale = shared_memory.SharedMemory(name=name)
+    writer_pid = 0
+    if stale.size >= _HEADER_FIELDS * 8:
+        header = np.ndarray((_HEADER_FIELDS,), dtype="<u8", buffer=stale.buf, offset=0)
+        writer_pid = int(header[_H_WRITER_PID])
+        del header
+    if writer_pid and _pid_alive(writer_pid):
+        if name not in _created_here:
+            _untrack(stale)
+        stale.close()
+        raise FileExistsError(f"shared hot buffer {name!r} is in use by process {writer_pid}")
+    print(f"[shm-hot-buffer] reclaiming stale segment {name!r} (writer pid {writer_pid or 'unknown'})")
+    stale.close()
+    stale.unlink()
+    _created_here.discard(name)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processen finns men tillhör en annan användare.
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    # Före Python 3.13 registrerar attach() segmentet i resource_tracker, som
+    # då unlinkar det när läsarprocessen avslutas. Bara writern äger segmentet.
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
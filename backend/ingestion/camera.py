@@ -1,13 +1,14 @@
 from __future__ import annotations
 import base64
+import concurrent.futures
+import functools
 import json
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 import threading
 import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional
 import os
 import asyncio
 import numpy as np
@@ -26,10 +27,26 @@ import paho.mqtt.client as mqtt
 if __package__ in (None, ""):
     sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
+from analysis.utils import encode_bytes_to_base64
 from database.database import save_description_bundle
+from ingestion.analysis_queue import AnalysisQueue, OverflowPolicy
+from ingestion.analysis_service import AnalysisService
 from ingestion.buffers.mqtt_event_buffer import BufferedMqttEvent, MqttEventRingBuffer
 from ingestion.buffers.rtsp_hot_buffer import BufferedFrame, FrameRingBuffer
-from ingestion.record_ffmpeg import start_recording_ffmpeg, stop_recording
+from ingestion.buffers.shm_hot_buffer import SharedFrameRingBuffer
+from ingestion.record_ffmpeg import start_recording_ffmpeg
+from ingestion.recorder_supervisor import RecorderSupervisor
+from ingestion.storage.frame_table import try_read_frame_table
+from ingestion.storage.segment_index import SegmentIndex, ffmpeg_segment_start
+
+if TYPE_CHECKING:
+    from analysis.image_budget import ImageBudget
+
+AnalysisMode = Literal["separate", "combined"]
+ANALYSIS_MODES = ("separate", "combined")
+VideoPipeline = Literal["ffmpeg", "gstreamer"]
+VIDEO_PIPELINES = ("ffmpeg", "gstreamer")
+
 
 class Camera:
     def __init__(
@@ -48,7 +65,25 @@ class Camera:
         mqtt_buffer_max_bytes: int = 5 * 1024 * 1024,
         hot_buffer_jpeg_quality: int = 70,
         hot_buffer_max_width: int = 960,
+        hot_buffer_shared: bool = False,
+        analysis_concurrency: int = 10,
+        analysis_cpu_workers: int = 4,
+        analysis_timeout_seconds: float = 60.0,
+        analysis_queue_size: int = 100,
+        analysis_queue_policy: OverflowPolicy = "drop_oldest",
+        analysis_max_age_seconds: float | None = 120.0,
+        analysis_service: AnalysisService | None = None,
+        analysis_mode: AnalysisMode = "separate",
+        analysis_image_budget: ImageBudget | None = None,
+        analysis_image_workers: int = 2,
+        video_pipeline: VideoPipeline = "ffmpeg",
+        gstreamer_options: Dict[str, Any] | None = None,
+        recorder_options: Dict[str, Any] | None = None,
     ) -> None:
+        if analysis_mode not in ANALYSIS_MODES:
+            raise ValueError(f"analysis_mode must be one of: {', '.join(ANALYSIS_MODES)}")
+        if video_pipeline not in VIDEO_PIPELINES:
+            raise ValueError(f"video_pipeline must be one of: {', '.join(VIDEO_PIPELINES)}")
         self.camera_id = camera_id
         self.rtsp_url = rtsp_url
         self.recording_process = None
@@ -61,26 +96,59 @@ class Camera:
         self.mqtt_buffer_max_bytes = mqtt_buffer_max_bytes
         self.hot_buffer_jpeg_quality = hot_buffer_jpeg_quality
         self.hot_buffer_max_width = hot_buffer_max_width
+        self.hot_buffer_shared = hot_buffer_shared
+        # "ffmpeg": ffmpeg-inspelning + OpenCV-läsare (två RTSP-sessioner).
+        # "gstreamer": en GStreamer-pipeline som delar samma RTSP-ström mellan
+        # inspelning och hot buffer (se gstreamer_pipeline.py).
+        self.video_pipeline = video_pipeline
+        # Extra GStreamerHotBuffer-argument, t.ex. {"keyframes_only": True, "encode_workers": 2}.
+        self.gstreamer_options = dict(gstreamer_options or {})
+        self._gst_pipeline = None
+        # Extra RecorderSupervisor-argument för ffmpeg-inspelningen, t.ex. {"stall_seconds": 60}.
+        self.recorder_options = dict(recorder_options or {})
+        self._segment_index: SegmentIndex | None = None
 
         self.frame_buffer: FrameRingBuffer | None = None
+        # Spegling av hot buffern i shared memory så att andra processer kan läsa via
+        # SharedFrameRingBuffer.attach(camera_id).
+        self.shared_frame_buffer: SharedFrameRingBuffer | None = None
         self.mqtt_buffer = MqttEventRingBuffer(
             max_events=self.mqtt_buffer_max_events,
             max_bytes=self.mqtt_buffer_max_bytes,
         )
         self._buffer_stop_event = threading.Event()
         self._buffer_thread: threading.Thread | None = None
-        self.analysis_client = analysis_client
-        self._analysis_pool = ThreadPoolExecutor(
-            max_workers=10,
-            thread_name_prefix=f"camera-{self.camera_id}-analysis",
+        self.analysis_timeout_seconds = analysis_timeout_seconds
+        # "separate": fyra anrop per event, "combined": ett anrop med alla fyra beskrivningarna.
+        self.analysis_mode = analysis_mode
+        # Nedskalning/omkodning av bilder innan de skickas till LLM:en (None = skicka som de är).
+        self._image_encoder = None
+        if analysis_image_budget is not None:
+            from analysis.image_budget import ImageBudgetEncoder
+
+            self._image_encoder = ImageBudgetEncoder(analysis_image_budget, workers=analysis_image_workers)
+        # Utan given tjänst får kameran en egen (loop + CPU-pool + gräns analysis_concurrency).
+        # Med en delad tjänst gäller tjänstens globala gräns och pool i stället.
+        self._owns_analysis_service = analysis_service is None
+        if analysis_service is None:
+            analysis_service = AnalysisService(
+                analysis_client,
+                concurrency=analysis_concurrency,
+                cpu_workers=analysis_cpu_workers,
+                name=f"camera-{self.camera_id}-analysis-service",
+            )
+        self.analysis_service = analysis_service
+        self.analysis_client = analysis_client if analysis_client is not None else analysis_service.analysis_client
+        self.analysis_service.register(self.camera_id)
+        self._analysis_queue = AnalysisQueue(
+            self._dispatch_message,
+            max_size=analysis_queue_size,
+            workers=1,
+            policy=analysis_queue_policy,
+            max_age_seconds=analysis_max_age_seconds,
+            name=f"camera-{self.camera_id}-analysis",
         )
 
-        # Fix for asyncio
-        self._async_loop = asyncio.new_event_loop()
-        self._async_thread: threading.Thread | None = None
-        self._async_loop_ready = threading.Event()
-        self.init_async_loop()
-
         self.init_recording(ffmpeg, segment_seconds)
         self.init_buffer()
         self.init_mqtt(broker_host, broker_port)
@@ -91,9 +159,36 @@ class Camera:
         self.desync = None
 
     def init_recording(self, ffmpeg: str, segment_seconds: int) -> None:
+        self.segment_seconds = segment_seconds
+        if self.video_pipeline == "gstreamer":
+            # Inspelningen startas tillsammans med hot buffern i init_buffer.
+            return
 
-        self.recording_process = start_recording_ffmpeg(
-            ffmpeg, self.rtsp_url, self.camera_id, segment_seconds
+        # Färdiga segment läggs in i segmentindexet (med FrameTable) direkt när ffmpeg stänger dem.
+        self._recordings_dir = Path(__file__).resolve().parents[1] / "recordings" / str(self.camera_id)
+        self._segment_index = SegmentIndex()
+        # ffmpeg-processen övervakas och startas om vid krasch eller när segment uteblir.
+        self.recording_process = RecorderSupervisor(
+            self.camera_id,
+            functools.partial(
+                start_recording_ffmpeg, ffmpeg, self.rtsp_url, self.camera_id, segment_seconds, capture_output=True
+            ),
+            segment_seconds=segment_seconds,
+            on_segment=self._index_recorded_segment,
+            **self.recorder_options,
+        )
+        self.recording_process.start()
+
+    def _index_recorded_segment(self, file_name: str, duration_seconds: float) -> None:
+        path = self._recordings_dir / file_name
+        start = ffmpeg_segment_start(file_name)
+        self._segment_index.add_segment(
+            self.camera_id,
+            str(path),
+            start,
+            start + timedelta(seconds=duration_seconds),
+            path.stat().st_size,
+            try_read_frame_table(str(path)),
         )
 
     def init_mqtt(self, broker_host: str, broker_port: int) -> None:
@@ -102,36 +197,58 @@ class Camera:
         self.mqtt_client.subscribe(f"camera/{self.camera_id}")
         self.mqtt_client.loop_start()
 
-    def init_async_loop(self) -> None:
-        self._async_thread = threading.Thread(
-            target=self._async_loop_thread_main,
-            name=f"camera-{self.camera_id}-async-loop",
-            daemon=True,
-        )
-        self._async_thread.start()
-
-        if not self._async_loop_ready.wait(timeout=5.0):
-            raise RuntimeError(f"[camera:{self.camera_id}] async loop failed to start")
-
-    def _async_loop_thread_main(self) -> None:
-        asyncio.set_event_loop(self._async_loop)
-        self._async_loop_ready.set()
-        self._async_loop.run_forever()
-
     async def _run_analysis(
         self,
         snapshot_b64: str,
         full_frame_b64: str,
         selection_1_images: list[str],
         selection_2_images: list[str],
+        image_mime: str = "image/jpeg",
     ) -> tuple[Any, Any, Any, Any]:
+        if self.analysis_mode == "combined":
+            responses = await self.analysis_client.query_description_bundle(
+                {
+                    "snapshot": [snapshot_b64],
+                    "full_frame": [full_frame_b64],
+                    "selection_1": selection_1_images,
+                    "selection_2": selection_2_images,
+                },
+                image_mime=image_mime,
+            )
+            return (
+                responses["snapshot"],
+                responses["full_frame"],
+                responses["selection_1"],
+                responses["selection_2"],
+            )
+
         return await asyncio.gather(
-            self.analysis_client.query_description_open([snapshot_b64]),
-            self.analysis_client.query_description_open([full_frame_b64]),
-            self.analysis_client.query_description_open(selection_1_images),
-            self.analysis_client.query_description_open(selection_2_images),
+            self.analysis_client.query_description_open([snapshot_b64], image_mime=image_mime),
+            self.analysis_client.query_description_open([full_frame_b64], image_mime=image_mime),
+            self.analysis_client.query_description_open(selection_1_images, image_mime=image_mime),
+            self.analysis_client.query_description_open(selection_2_images, image_mime=image_mime),
         )
 
+    def _fit_analysis_images(self, groups: Dict[str, list[str]]) -> tuple[Dict[str, list[str]], str]:
+        # Budgeten gäller per request: i "combined" alla unika bilder tillsammans, annars per grupp.
+        if self._image_encoder is None:
+            return groups, "image/jpeg"
+        if self.analysis_mode == "combined":
+            unique = list(dict.fromkeys(image for images in groups.values() for image in images))
+            fitted, mime = self._image_encoder.encode(unique)
+            if len(fitted) == len(unique):
+                mapping = dict(zip(unique, fitted))
+                return {name: [mapping[image] for image in images] for name, images in groups.items()}, mime
+            # Budgeten tvingade fram att bilder släpptes: faller tillbaka på budget per grupp.
+        fitted_groups = {}
+        budget_mime = self._image_encoder.budget.mime_type
+        for name, images in groups.items():
+            fitted_groups[name], mime = self._image_encoder.encode(images)
+            if mime != budget_mime:
+                # Alla requests delar en MIME-typ: kunde en grupp inte kodas om skickas originalen.
+                return groups, mime
+        return fitted_groups, budget_mime
+
     def on_message(self, client, userdata, msg) -> None:
         received_at = datetime.now(timezone.utc)
         try:
@@ -144,9 +261,37 @@ class Camera:
             print(f"[camera:{self.camera_id}][mqtt] payload is not a JSON object")
             return
 
-        self._analysis_pool.submit(self._process_message, received_at, data)
+        # O(1) under ett kort lås; storleken tas från råa bytes så bufferten inte behöver serialisera om.
+        self.mqtt_buffer.append(
+            BufferedMqttEvent(timestamp=received_at, payload=data, size_bytes=len(msg.payload))
+        )
+        track_id = data.get("id")
+        self._analysis_queue.submit(
+            received_at,
+            data,
+            track_id=str(track_id) if track_id is not None else None,
+            duration=self._track_duration_seconds(data),
+        )
 
-    def _process_message(self, received_at: datetime, data: Dict[str, Any]) -> None:
+    def _track_duration_seconds(self, payload: Dict[str, Any]) -> float:
+        duration = payload.get("duration")
+        if isinstance(duration, (int, float)):
+            return float(duration)
+        start_time = self._extract_event_timestamp(payload)
+        end_time = self._extract_event_end_time(payload)
+        if start_time is None or end_time is None:
+            return 0.0
+        return max(0.0, (end_time - start_time).total_seconds())
+
+    def _dispatch_message(self, received_at: datetime, data: Dict[str, Any]) -> concurrent.futures.Future:
+        # Körs i analyskön: blockerar tills analystjänsten har en ledig plats så att kön
+        # (och dess policy) fortfarande tar emot överlasten.
+        return self.analysis_service.submit(self.camera_id, self._process_message(received_at, data))
+
+    async def _run_blocking(self, fn, *args):
+        return await self.analysis_service.run_blocking(fn, *args)
+
+    async def _process_message(self, received_at: datetime, data: Dict[str, Any]) -> None:
         # Get necessary info
         package_start_time = self._extract_event_timestamp(data)
         package_end_time = self._extract_event_end_time(data)
@@ -171,10 +316,16 @@ class Camera:
         if matched_full_frame is None:
                 print(f"[camera:{self.camera_id}] no matching frame in hot buffer")
                 return
-        full_frame_b64 = base64.b64encode(matched_full_frame.jpeg_bytes).decode("utf-8")
 
-        selection_1_images, selection_1_timestamps =  self.frame_selection_1(target_start_time, target_end_time)
-        selection_2_images, selection_2_timestamps =  self.frame_selection_2(target_start_time, target_end_time, 90)
+        # CPU-delarna (base64, JPEG-avkodning i frame_selection_2) körs i executorn
+        # så att event loopen kan hålla många LLM-anrop igång samtidigt.
+        full_frame_b64, selection_1, selection_2 = await asyncio.gather(
+            self._run_blocking(encode_bytes_to_base64, matched_full_frame.jpeg_bytes),
+            self._run_blocking(self.frame_selection_1, target_start_time, target_end_time),
+            self._run_blocking(self.frame_selection_2, target_start_time, target_end_time, 90),
+        )
+        selection_1_images, selection_1_timestamps = selection_1
+        selection_2_images, selection_2_timestamps = selection_2
 
         # Temporary solution for short consolodated, might have to prune short consolodated
         if not selection_1_images and not selection_1_timestamps:
@@ -187,19 +338,28 @@ class Camera:
 
 
         try:
-            future = asyncio.run_coroutine_threadsafe(
+            llm_images, image_mime = await self._run_blocking(
+                self._fit_analysis_images,
+                {
+                    "snapshot": [snapshot_b64],
+                    "full_frame": [full_frame_b64],
+                    "selection_1": selection_1_images,
+                    "selection_2": selection_2_images,
+                },
+            )
+            response_snapshot, response_full_frame, response_selection_1, response_selection_2 = await asyncio.wait_for(
                 self._run_analysis(
-                    snapshot_b64=snapshot_b64,
-                    full_frame_b64=full_frame_b64,
-                    selection_1_images=selection_1_images,
-                    selection_2_images=selection_2_images,
+                    snapshot_b64=llm_images["snapshot"][0],
+                    full_frame_b64=llm_images["full_frame"][0],
+                    selection_1_images=llm_images["selection_1"],
+                    selection_2_images=llm_images["selection_2"],
+                    image_mime=image_mime,
                 ),
-                self._async_loop,
+                timeout=self.analysis_timeout_seconds,
             )
-            response_snapshot, response_full_frame, response_selection_1, response_selection_2 = future.result(timeout=60)
 
         except Exception as exc:
-            print(f"[camera:{self.camera_id}] analysis failed: {exc}")
+            print(f"[camera:{self.camera_id}] analysis failed: {exc!r}")
             return
         
         print(response_snapshot)
@@ -208,7 +368,8 @@ class Camera:
         print(response_selection_2)
 
         try:
-            save_description_bundle(
+            await self._run_blocking(
+                save_description_bundle,
                 target_start_time,
                 target_end_time,
                 datetime.now(timezone.utc),
@@ -225,7 +386,6 @@ class Camera:
         except Exception as exc:
             print(f"[camera:{self.camera_id}] saving to database failed: {exc}")
 
-
     def _extract_event_timestamp(self, payload: Dict[str, Any]) -> datetime:
         start_time = payload.get("start_time")
         if isinstance(start_time, str) and start_time.strip():
@@ -254,6 +414,31 @@ class Camera:
 
     def init_buffer(self) -> None:
         max_frames = self.hot_buffer_seconds * self.hot_buffer_fps
+        if self.hot_buffer_shared:
+            self.shared_frame_buffer = SharedFrameRingBuffer.create(
+                self.camera_id,
+                max_frames=max_frames,
+                max_bytes=self.hot_buffer_max_bytes,
+            )
+        if self.video_pipeline == "gstreamer":
+            from ingestion.gstreamer_pipeline import GStreamerCameraPipeline
+
+            self._gst_pipeline = GStreamerCameraPipeline(
+                self.rtsp_url,
+                self.camera_id,
+                segment_seconds=self.segment_seconds,
+                seconds=self.hot_buffer_seconds,
+                fps=self.hot_buffer_fps,
+                max_bytes=self.hot_buffer_max_bytes,
+                jpeg_quality=self.hot_buffer_jpeg_quality,
+                max_width=self.hot_buffer_max_width,
+                on_frame=self.shared_frame_buffer.append if self.shared_frame_buffer is not None else None,
+                **self.gstreamer_options,
+            )
+            self.frame_buffer = self._gst_pipeline.buffer
+            self._gst_pipeline.start()
+            return
+        # GStreamer-pipelinen har en egen buffer; bara ffmpeg/OpenCV-vägen fyller den här.
         self.frame_buffer = FrameRingBuffer(
             max_frames=max_frames,
             max_bytes=self.hot_buffer_max_bytes,
@@ -312,6 +497,8 @@ class Camera:
                 )
                 if self.frame_buffer is not None:
                     self.frame_buffer.append(packet)
+                if self.shared_frame_buffer is not None:
+                    self.shared_frame_buffer.append(packet)
 
             capture.release()
             if not self._buffer_stop_event.is_set():
@@ -405,10 +592,7 @@ class Camera:
         if self.frame_buffer is None:
             return [], []
 
-        with self.frame_buffer._lock:
-            buffer_frames = [
-                frame for frame in self.frame_buffer._frames if start_time <= frame.timestamp <= end_time
-            ]
+        buffer_frames = self.frame_buffer.range(start_time, end_time)
 
         if not buffer_frames:
             return [], []
@@ -437,6 +621,21 @@ class Camera:
     def mqtt_buffer_stats(self) -> Dict[str, int]:
         return self.mqtt_buffer.stats()
 
+    def analysis_queue_stats(self) -> Dict[str, int]:
+        return self._analysis_queue.stats()
+
+    def recording_stats(self) -> Dict[str, Any]:
+        if self.recording_process is not None:
+            return self.recording_process.stats()
+        if self._gst_pipeline is not None:
+            return {"segments": self._gst_pipeline.stats().get("segments_written", 0)}
+        return {"segments": 0}
+
+    def image_budget_stats(self) -> Dict[str, int]:
+        if self._image_encoder is None:
+            return {"requests": 0, "images_in": 0, "images_out": 0, "bytes_in": 0, "bytes_out": 0}
+        return self._image_encoder.stats()
+
 #för testning av RTSP data (frames)
     def dump_latest_hot_buffer_frame(self, output_path: str = "debug_latest.jpg") -> bool:
         frames = self.get_hot_buffer_frames(5)
@@ -460,13 +659,29 @@ class Camera:
         if self._buffer_thread is not None:
             self._buffer_thread.join(timeout=2.0)
             self._buffer_thread = None
+        if self._gst_pipeline is not None:
+            self._gst_pipeline.stop()
+            self._gst_pipeline = None
+        if self.shared_frame_buffer is not None:
+            self.shared_frame_buffer.close()
+            self.shared_frame_buffer = None
 
         self.mqtt_client.loop_stop()
         self.mqtt_client.disconnect()
-        self._analysis_pool.shutdown(wait=True)
-
-        stop_recording(self.recording_process)
-        self.recording_process = None
+        self._analysis_queue.shutdown(wait=True)
+        self.analysis_service.wait_idle(self.camera_id, timeout=self.analysis_timeout_seconds + 5.0)
+        self.analysis_service.unregister(self.camera_id)
+        if self._image_encoder is not None:
+            self._image_encoder.close()
+        if self._owns_analysis_service:
+            self.analysis_service.close(close_client=False)
+
+        if self.recording_process is not None:
+            self.recording_process.stop()
+            self.recording_process = None
+        if self._segment_index is not None:
+            self._segment_index.close()
+            self._segment_index = None
 
 
 def main() -> None:
@@ -3,13 +3,16 @@ from __future__ import annotations
 import base64
 import threading
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
+from typing import Callable
 from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 import cv2
 import gi
 import numpy as np
 
+from ingestion.buffers.pts_clock import PtsCameraClock
 from ingestion.buffers.rtsp_hot_buffer import BufferedFrame, FrameRingBuffer
 
 gi.require_version("Gst", "1.0")
@@ -30,7 +33,55 @@ def ntp_to_datetime(ntp_seconds: int, ntp_fraction: int) -> datetime:
     return datetime.fromtimestamp(unix_time, timezone.utc)
 
 
+def rtp_camera_time(buf: Gst.Buffer) -> datetime | None:
+    # Axis lägger kamerans NTP-tid i en RTP header extension (0xABAC) på sista
+    # paketet i varje frame (marker-biten satt).
+    ok, rtp = GstRtp.RTPBuffer.map(buf, Gst.MapFlags.READ)
+    if not ok:
+        return None
+
+    camera_time = None
+    marker = GstRtp.RTPBuffer.get_marker(rtp)
+    ext = GstRtp.RTPBuffer.get_extension_data(rtp)
+
+    if marker and ext:
+        ext_data, ext_id = ext
+
+        if ext_id == 0xABAC:
+            payload = ext_data.get_data()
+            ntp_seconds = int.from_bytes(payload[0:4], "big")
+            ntp_fraction = int.from_bytes(payload[4:8], "big")
+            camera_time = ntp_to_datetime(ntp_seconds, ntp_fraction)
+
+    GstRtp.RTPBuffer.unmap(rtp)
+    return camera_time
+
+
 class GStreamerHotBuffer:
+    """Hot buffer som läser kamerans RTSP-ström via GStreamer.
+
+    Avkodningen kan göras billigare utan hårdvaruavkodare:
+    - `keyframes_only`: bara IDR-frames skickas till avkodaren, övriga släpps
+      redan före `avdec_h264`. Bildtakten blir kamerans GOP-takt (t.ex. 1 fps)
+      om den är lägre än `fps`.
+    - `scale_before_convert`: `videoscale` till `max_width` körs på YUV-bilden
+      före `videoconvert`, så färgkonverteringen görs på den mindre bilden.
+      Förutsätter att strömmen är minst `max_width` bred (annars skalas den upp).
+    - `decoder_threads`: `max-threads` för `avdec_h264` (0 = automatiskt).
+    - `encode_workers`: JPEG-kodningen görs i en trådpool i stället för i
+      appsink-callbacken. Frames läggs ändå i bufferten i tidsordning, och om
+      poolen ligger efter släpps nya frames (`dropped_busy`).
+
+    Bildtakten begränsas direkt efter avkodaren (`rate_gate`), så frames som
+    ändå släpps konverteras aldrig. Till skillnad från `videorate` behåller
+    gaten buffertarnas PTS och duplicerar inga frames.
+
+    Varje frame får kamerans NTP-tid via sin PTS (se `PtsCameraClock`): RTP-
+    proben registrerar PTS -> kameratid och appsink slår upp samplets PTS.
+    Frames som släpps av rate gate, nyckelbildsfiltret eller appsink påverkar
+    därför inte de andra framesens tider.
+    """
+
     def __init__(
         self,
         rtsp_url: str,
@@ -40,19 +91,49 @@ class GStreamerHotBuffer:
         max_bytes: int = 50 * 1024 * 1024,
         jpeg_quality: int = 70,
         max_width: int = 960,
+        on_frame: Callable[[BufferedFrame], None] | None = None,
+        keyframes_only: bool = False,
+        scale_before_convert: bool = False,
+        decoder_threads: int = 0,
+        encode_workers: int = 0,
     ) -> None:
         self.rtsp_url = add_onvif_replay_ext(rtsp_url)
         self.camera_id = str(camera_id)
         self.fps = fps
         self.jpeg_quality = jpeg_quality
         self.max_width = max_width
+        # Anropas med varje ny frame efter att den lagts i bufferten (t.ex. shared memory-spegling).
+        self.on_frame = on_frame
+        self.keyframes_only = keyframes_only
+        self.scale_before_convert = scale_before_convert
+        self.decoder_threads = decoder_threads
+
+        self._encoder_pool: ThreadPoolExecutor | None = None
+        if encode_workers > 0:
+            self._encoder_pool = ThreadPoolExecutor(
+                max_workers=encode_workers,
+                thread_name_prefix=f"camera-{self.camera_id}-jpeg",
+            )
+        # Högst så här många frames får vänta på kodning innan nya släpps.
+        self._max_pending_encodes = 2 * max(1, encode_workers)
+        self._encode_pending: deque[Future] = deque()
+        self._encode_lock = threading.Lock()
+        self._counters = {
+            "samples": 0,
+            "encoded": 0,
+            "dropped_busy": 0,
+            "skipped_delta_frames": 0,
+            "rate_dropped": 0,
+            "untimed_frames": 0,
+        }
 
         self.buffer = FrameRingBuffer(
             max_frames=seconds * fps,
             max_bytes=max_bytes,
         )
 
-        self._timestamps: deque[datetime] = deque(maxlen=300)
+        self.clock = PtsCameraClock()
+        self._next_keep_pts: int | None = None
         self._stop_event = threading.Event()
         self._thread: threading.Thread | None = None
         self._loop: GLib.MainLoop | None = None
@@ -71,6 +152,7 @@ class GStreamerHotBuffer:
 
         if self._pipeline is not None:
             self._pipeline.send_event(Gst.Event.new_eos())
+            self._wait_for_eos()
 
         if self._loop is not None:
             self._loop.quit()
@@ -79,6 +161,9 @@ class GStreamerHotBuffer:
             self._thread.join(timeout=3)
             self._thread = None
 
+        if self._encoder_pool is not None:
+            self._encoder_pool.shutdown(wait=True)
+
     def latest(self, seconds: int | None = None) -> list[BufferedFrame]:
         return self.buffer.latest(seconds)
 
@@ -86,40 +171,64 @@ class GStreamerHotBuffer:
         return self.buffer.search_frame(timestamp)
 
     def stats(self) -> dict[str, int]:
-        return self.buffer.stats()
+        with self._encode_lock:
+            counters = dict(self._counters)
+        return {**self.buffer.stats(), **counters, **self.clock.stats()}
 
     def _rtp_probe(self, pad, info):
         buf = info.get_buffer()
         if not buf:
             return Gst.PadProbeReturn.OK
 
-        ok, rtp = GstRtp.RTPBuffer.map(buf, Gst.MapFlags.READ)
-        if not ok:
-            return Gst.PadProbeReturn.OK
+        camera_time = rtp_camera_time(buf)
+        if camera_time is not None:
+            self._on_camera_time(camera_time, buf.pts)
+
+        return Gst.PadProbeReturn.OK
+
+    def _on_camera_time(self, camera_time: datetime, pts: int) -> None:
+        if pts != Gst.CLOCK_TIME_NONE:
+            self.clock.add(pts, camera_time)
 
-        marker = GstRtp.RTPBuffer.get_marker(rtp)
-        ext = GstRtp.RTPBuffer.get_extension_data(rtp)
+    def _rate_gate(self, pad, info):
+        # Släpper frames som kommer tätare än 1/fps, räknat på PTS. En tiondels
+        # intervall i marginal så att t.ex. var sjätte frame i 30 fps behålls vid 5 fps.
+        buf = info.get_buffer()
+        if buf is None or buf.pts == Gst.CLOCK_TIME_NONE:
+            return Gst.PadProbeReturn.OK
 
-        if marker and ext:
-            ext_data, ext_id = ext
+        interval = Gst.SECOND // max(1, self.fps)
+        next_keep = self._next_keep_pts
+        if next_keep is not None and next_keep - interval <= buf.pts < next_keep:
+            with self._encode_lock:
+                self._counters["rate_dropped"] += 1
+            return Gst.PadProbeReturn.DROP
 
-            if ext_id == 0xABAC:
-                payload = ext_data.get_data()
-                ntp_seconds = int.from_bytes(payload[0:4], "big")
-                ntp_fraction = int.from_bytes(payload[4:8], "big")
-                self._timestamps.append(ntp_to_datetime(ntp_seconds, ntp_fraction))
+        self._next_keep_pts = buf.pts + interval - interval // 10
+        return Gst.PadProbeReturn.OK
 
-        GstRtp.RTPBuffer.unmap(rtp)
+    def _keyframe_gate(self, pad, info):
+        buf = info.get_buffer()
+        if buf is not None and buf.has_flags(Gst.BufferFlags.DELTA_UNIT):
+            with self._encode_lock:
+                self._counters["skipped_delta_frames"] += 1
+            return Gst.PadProbeReturn.DROP
         return Gst.PadProbeReturn.OK
 
     def _on_sample(self, sink):
         sample = sink.emit("pull-sample")
-        if sample is None or not self._timestamps:
+        if sample is None:
             return Gst.FlowReturn.OK
 
-        camera_time = self._timestamps.popleft()
-
         buf = sample.get_buffer()
+        camera_time = None
+        if buf.pts != Gst.CLOCK_TIME_NONE:
+            camera_time = self.clock.camera_time(buf.pts)
+        if camera_time is None:
+            with self._encode_lock:
+                self._counters["untimed_frames"] += 1
+            return Gst.FlowReturn.OK
+
         caps = sample.get_caps()
         info = caps.get_structure(0)
 
@@ -138,6 +247,29 @@ class GStreamerHotBuffer:
 
         buf.unmap(map_info)
 
+        with self._encode_lock:
+            self._counters["samples"] += 1
+
+        if self._encoder_pool is None:
+            encoded = self._encode_frame(camera_time, frame)
+            if encoded is not None:
+                with self._encode_lock:
+                    self._store_frame(encoded)
+            return Gst.FlowReturn.OK
+
+        with self._encode_lock:
+            if len(self._encode_pending) >= self._max_pending_encodes:
+                self._counters["dropped_busy"] += 1
+                return Gst.FlowReturn.OK
+            future = self._encoder_pool.submit(self._encode_frame, camera_time, frame)
+            self._encode_pending.append(future)
+        future.add_done_callback(self._drain_encoded)
+
+        return Gst.FlowReturn.OK
+
+    def _encode_frame(self, camera_time: datetime, frame: np.ndarray) -> BufferedFrame | None:
+        height, width = frame.shape[:2]
+
         if self.max_width > 0 and width > self.max_width:
             new_height = int(height * (self.max_width / float(width)))
             frame = cv2.resize(frame, (self.max_width, new_height), interpolation=cv2.INTER_AREA)
@@ -146,43 +278,83 @@ class GStreamerHotBuffer:
         encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(self.jpeg_quality)]
         ok, encoded = cv2.imencode(".jpg", frame, encode_params)
         if not ok:
-            return Gst.FlowReturn.OK
+            return None
 
-        self.buffer.append(
-            BufferedFrame(
-                timestamp=camera_time,
-                jpeg_bytes=encoded.tobytes(),
-                width=width,
-                height=height,
-            )
+        return BufferedFrame(
+            timestamp=camera_time,
+            jpeg_bytes=encoded.tobytes(),
+            width=width,
+            height=height,
         )
 
-        return Gst.FlowReturn.OK
-
-    def _run(self) -> None:
-        Gst.init(None)
-
-        frame_interval = max(1, int(30 / self.fps))
-
-        self._pipeline = Gst.parse_launch(
-            f"""
+    def _drain_encoded(self, _future: Future) -> None:
+        # Frames kan bli klara i fel ordning; de läggs i bufferten i den ordning de kom.
+        with self._encode_lock:
+            while self._encode_pending and self._encode_pending[0].done():
+                done = self._encode_pending.popleft()
+                if done.exception() is None and done.result() is not None:
+                    self._store_frame(done.result())
+
+    def _store_frame(self, frame: BufferedFrame) -> None:
+        # Anropas med _encode_lock tagen.
+        self._counters["encoded"] += 1
+        self.buffer.append(frame)
+        if self.on_frame is not None:
+            self.on_frame(frame)
+
+    def _decode_description(self) -> str:
+        # Allt efter h264parse: (nyckelbildsfilter,) avkodning, rate gate till
+        # self.fps, (skalning,) färgkonvertering och appsink.
+        decoder = "avdec_h264"
+        if self.decoder_threads > 0:
+            decoder += f" max-threads={self.decoder_threads}"
+
+        steps = ["identity name=decode_gate silent=true", decoder, "identity name=rate_gate silent=true"]
+        if self.scale_before_convert and self.max_width > 0:
+            steps += ["videoscale", f"video/x-raw,width={self.max_width},pixel-aspect-ratio=1/1"]
+        steps += [
+            "videoconvert",
+            "video/x-raw,format=BGR",
+            "appsink name=sink emit-signals=true sync=false max-buffers=1 drop=true",
+        ]
+        return "\n            ! ".join(steps)
+
+    def _launch_description(self) -> str:
+        return f"""
             rtspsrc location="{self.rtsp_url}" protocols=tcp latency=100
             ! application/x-rtp,media=video,encoding-name=H264
             ! identity name=rtp_probe silent=true
             ! rtph264depay
             ! h264parse
-            ! avdec_h264
-            ! videoconvert
-            ! video/x-raw,format=BGR
-            ! videorate
-            ! video/x-raw,framerate={self.fps}/1
-            ! appsink name=sink emit-signals=true sync=false max-buffers=1 drop=true
+            ! {self._decode_description()}
             """
-        )
+
+    def _on_bus_message(self, bus, message) -> None:
+        if message.type == Gst.MessageType.EOS:
+            self._loop.quit()
+
+    def _wait_for_eos(self) -> None:
+        # Hot buffern har inget att skriva färdigt; loopen kan stoppas direkt.
+        return None
+
+    def _on_pipeline_stopped(self) -> None:
+        return None
+
+    def _run(self) -> None:
+        Gst.init(None)
+
+        self._pipeline = Gst.parse_launch(self._launch_description())
 
         probe = self._pipeline.get_by_name("rtp_probe")
         probe.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._rtp_probe)
 
+        rate_gate = self._pipeline.get_by_name("rate_gate")
+        rate_gate.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._rate_gate)
+
+        if self.keyframes_only:
+            gate = self._pipeline.get_by_name("decode_gate")
+            gate.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._keyframe_gate)
+
         sink = self._pipeline.get_by_name("sink")
         sink.connect("new-sample", self._on_sample)
 
@@ -190,8 +362,9 @@ class GStreamerHotBuffer:
 
         bus = self._pipeline.get_bus()
         bus.add_signal_watch()
-        bus.connect("message::eos", lambda *_: self._loop.quit())
+        bus.connect("message", self._on_bus_message)
 
         self._pipeline.set_state(Gst.State.PLAYING)
         self._loop.run()
-        self._pipeline.set_state(Gst.State.NULL)
\ No newline at end of file
+        self._pipeline.set_state(Gst.State.NULL)
+        self._on_pipeline_stopped()
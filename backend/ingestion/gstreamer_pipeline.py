@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+
+from ingestion.gstreamer_hot_buffer import GStreamerHotBuffer, Gst
+from ingestion.gstreamer_recorder import SegmentIndexWriter, recording_paths, splitmuxsink_description
+
+
+class GStreamerCameraPipeline(GStreamerHotBuffer):
+    """En RTSP-session per kamera för både inspelning och hot buffer.
+
+    Efter depayload delar en `tee` den komprimerade H.264-strömmen:
+    - inspelningsgrenen muxar utan omkodning till `splitmuxsink` (samma filer och
+      segmentindex som `GStreamerRecorder`)
+    - avkodningsgrenen är samma som i `GStreamerHotBuffer`
+
+    NTP-proben på RTP-paketen körs en gång och matar både segmentindexet och hot
+    bufferns tidsstämplar. Avkodningsgrenens kö är läckande, så en långsam
+    avkodare tappar frames i hot buffern men stoppar aldrig inspelningen.
+    """
+
+    def __init__(
+        self,
+        rtsp_url: str,
+        camera_id: str,
+        segment_seconds: int = 10,
+        eos_timeout_seconds: float = 10.0,
+        **hot_buffer_options,
+    ) -> None:
+        super().__init__(rtsp_url, camera_id, **hot_buffer_options)
+        self.segment_seconds = segment_seconds
+        self.eos_timeout_seconds = eos_timeout_seconds
+        self.recordings_dir, self.index_path = recording_paths(self.camera_id)
+        self._index: SegmentIndexWriter | None = None
+        self._eos_received = threading.Event()
+
+    def stats(self) -> dict[str, int]:
+        stats = dict(super().stats())
+        stats["segments_written"] = self._index.segments_written if self._index is not None else 0
+        return stats
+
+    def _launch_description(self) -> str:
+        self._index = SegmentIndexWriter(self.index_path, self.camera_id)
+        return f"""
+            rtspsrc location="{self.rtsp_url}" protocols=tcp latency=100
+            ! application/x-rtp,media=video,encoding-name=H264
+            ! identity name=rtp_probe silent=true
+            ! rtph264depay
+            ! h264parse config-interval=-1
+            ! tee name=split
+            split. ! queue name=record_queue max-size-buffers=0 max-size-bytes=0 max-size-time=5000000000
+                   ! {splitmuxsink_description(self.recordings_dir, self.segment_seconds)}
+            split. ! queue name=decode_queue leaky=downstream max-size-buffers=30 max-size-bytes=0 max-size-time=0
+                   ! {self._decode_description()}
+            """
+
+    def _on_camera_time(self, camera_time: datetime, pts: int) -> None:
+        super()._on_camera_time(camera_time, pts)
+        if self._index is not None:
+            self._index.observe(camera_time)
+
+    def _on_bus_message(self, bus, message) -> None:
+        if message.type == Gst.MessageType.ELEMENT and self._index is not None:
+            self._index.on_element_message(message)
+        elif message.type == Gst.MessageType.EOS:
+            self._eos_received.set()
+        super()._on_bus_message(bus, message)
+
+    def _wait_for_eos(self) -> None:
+        # splitmuxsink skriver klart mp4-filen (moov) först när EOS nått fram.
+        if not self._eos_received.wait(timeout=self.eos_timeout_seconds):
+            print(f"[camera:{self.camera_id}][gst] no EOS within {self.eos_timeout_seconds}s, last segment may be incomplete")
+
+    def _on_pipeline_stopped(self) -> None:
+        if self._index is not None:
+            self._index.close()
@@ -1,11 +1,14 @@
-import csv
 import os
 import signal
+import threading
 import time
 import multiprocessing as mp
 from datetime import datetime, timezone
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
 
+from ingestion.storage.frame_table import try_read_frame_table
+from ingestion.storage.segment_index import SegmentIndex
+
 
 def add_onvif_replay_ext(rtsp_url):
     parsed = urlparse(rtsp_url)
@@ -31,16 +34,7 @@ def ntp_to_datetime(ntp_seconds, ntp_fraction):
     return datetime.fromtimestamp(unix_time, timezone.utc)
 
 
-def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
-    import gi
-
-    gi.require_version("Gst", "1.0")
-    gi.require_version("GstRtp", "1.0")
-
-    from gi.repository import Gst, GstRtp, GLib
-
-    Gst.init(None)
-
+def recording_paths(camera_id):
     root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     recordings_dir = os.path.join(root_dir, "recordings", str(camera_id))
     indexes_dir = os.path.join(root_dir, "indexes")
@@ -48,42 +42,49 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
     os.makedirs(recordings_dir, exist_ok=True)
     os.makedirs(indexes_dir, exist_ok=True)
 
-    index_path = os.path.join(indexes_dir, f"index-{camera_id}.csv")
-    start_index = next_segment_index(recordings_dir)
+    return recordings_dir, os.path.join(indexes_dir, "segments.sqlite")
 
-    csv_exists = os.path.exists(index_path)
 
-    csv_file = open(index_path, "a", newline="")
-    writer = csv.writer(csv_file)
+def splitmuxsink_description(recordings_dir, segment_seconds, name="mux"):
+    return f"""
+        splitmuxsink
+            name={name}
+            location="{recordings_dir}/segment-%05d.mp4"
+            muxer-factory=mp4mux
+            max-size-time={segment_seconds * 1_000_000_000}
+            start-index={next_segment_index(recordings_dir)}
+        """
 
-    if not csv_exists:
-        writer.writerow(["file_name", "segment_start_camera_time", "segment_end_camera_time"])
-        csv_file.flush()
 
-    state = {
-        "active_file": None,
-        "segment_times": {},
-        "written_files": set(),
-        "stopping": False,
-    }
+class SegmentIndexWriter:
+    # Skriver en rad per stängt splitmuxsink-segment till SegmentIndex: fil +
+    # första/sista kameratid (NTP) som sågs medan segmentet var öppet, plus
+    # segmentets FrameTable (läses ur den färdiga mp4-filen). observe()
+    # anropas från GStreamers streamingtråd och bus-meddelandena från GLib-loopen,
+    # därav låset.
+    def __init__(self, index_path, camera_id):
+        self.camera_id = str(camera_id)
+        self._index = SegmentIndex(index_path)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._active_file = None
+        self._segment_times = {}
+        self._written_files = set()
+        self.segments_written = 0
 
-    def write_index_row(file_name):
-        if not file_name or file_name in state["written_files"]:
-            return
+    def observe(self, camera_time):
+        with self._lock:
+            if self._active_file is None:
+                return
 
-        times = state["segment_times"].get(file_name)
-        if not times or not times["start"] or not times["end"]:
-            return
+            times = self._segment_times[self._active_file]
+
+            if times["start"] is None:
+                times["start"] = camera_time
 
-        writer.writerow([
-            file_name,
-            times["start"].isoformat(),
-            times["end"].isoformat(),
-        ])
-        csv_file.flush()
-        state["written_files"].add(file_name)
+            times["end"] = camera_time
 
-    def on_splitmux_message(bus, message):
+    def on_element_message(self, message):
         structure = message.get_structure()
         if not structure:
             return
@@ -91,13 +92,63 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
         name = structure.get_name()
 
         if name == "splitmuxsink-fragment-opened":
-            file_name = structure.get_value("location")
-            state["active_file"] = file_name
-            state["segment_times"][file_name] = {"start": None, "end": None}
+            with self._lock:
+                self._active_file = structure.get_value("location")
+                self._segment_times[self._active_file] = {"start": None, "end": None}
 
         elif name == "splitmuxsink-fragment-closed":
-            file_name = structure.get_value("location")
-            write_index_row(file_name)
+            self.write_row(structure.get_value("location"))
+
+    def write_row(self, file_name):
+        with self._lock:
+            if not file_name or file_name in self._written_files or self._closed:
+                return
+
+            times = self._segment_times.get(file_name)
+            if not times or not times["start"] or not times["end"]:
+                return
+
+            try:
+                size_bytes = os.path.getsize(file_name)
+            except OSError:
+                size_bytes = None
+
+            self._index.add_segment(
+                self.camera_id,
+                file_name,
+                times["start"],
+                times["end"],
+                size_bytes,
+                try_read_frame_table(file_name) if size_bytes else None,
+            )
+            self._written_files.add(file_name)
+            del self._segment_times[file_name]
+            self.segments_written += 1
+
+    def close(self):
+        self.write_row(self._active_file)
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._index.close()
+
+
+def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
+    import gi
+
+    gi.require_version("Gst", "1.0")
+    gi.require_version("GstRtp", "1.0")
+
+    from gi.repository import Gst, GstRtp, GLib
+
+    Gst.init(None)
+
+    recordings_dir, index_path = recording_paths(camera_id)
+    index = SegmentIndexWriter(index_path, camera_id)
+
+    state = {
+        "stopping": False,
+    }
 
     def rtp_probe(pad, info):
         buffer = info.get_buffer()
@@ -111,7 +162,7 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
         marker = GstRtp.RTPBuffer.get_marker(rtp)
         ext = GstRtp.RTPBuffer.get_extension_data(rtp)
 
-        if state["active_file"] and ext and marker:
+        if ext and marker:
             ext_data, ext_id = ext
 
             if ext_id == 0xABAC:
@@ -119,14 +170,7 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
 
                 ntp_seconds = int.from_bytes(payload[0:4], "big")
                 ntp_fraction = int.from_bytes(payload[4:8], "big")
-                camera_time = ntp_to_datetime(ntp_seconds, ntp_fraction)
-
-                times = state["segment_times"][state["active_file"]]
-
-                if times["start"] is None:
-                    times["start"] = camera_time
-
-                times["end"] = camera_time
+                index.observe(ntp_to_datetime(ntp_seconds, ntp_fraction))
 
         GstRtp.RTPBuffer.unmap(rtp)
         return Gst.PadProbeReturn.OK
@@ -138,12 +182,7 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
         ! identity name=rtp_probe silent=true
         ! rtph264depay
         ! h264parse config-interval=-1
-        ! splitmuxsink
-            name=mux
-            location="{recordings_dir}/segment-%05d.mp4"
-            muxer-factory=mp4mux
-            max-size-time={segment_seconds * 1_000_000_000}
-            start-index={start_index}
+        ! {splitmuxsink_description(recordings_dir, segment_seconds)}
         """
     )
 
@@ -162,10 +201,9 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
 
     def on_bus_message(bus, message):
         if message.type == Gst.MessageType.ELEMENT:
-            on_splitmux_message(bus, message)
+            index.on_element_message(message)
 
         elif message.type == Gst.MessageType.EOS:
-            write_index_row(state["active_file"])
             loop.quit()
 
     bus = pipeline.get_bus()
@@ -183,9 +221,8 @@ def recorder_worker(rtsp_url, camera_id, segment_seconds, stop_event):
     pipeline.set_state(Gst.State.PLAYING)
     loop.run()
 
-    write_index_row(state["active_file"])
     pipeline.set_state(Gst.State.NULL)
-    csv_file.close()
+    index.close()
 
 
 class GStreamerRecorder:
@@ -1,15 +1,79 @@
 # ingestion_/ingestion_service.py
 from __future__ import annotations
 
+import os
 import uuid
-from typing import Callable, Optional
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Deque, List, Optional, Tuple
 
-from ingestion.source.replay_reader import iter_replay_events, RawEvent
+from ingestion.source.replay_reader import (
+    iter_replay_events,
+    iter_replay_records,
+    raw_event_from_record,
+    RawEvent,
+    ReplayRecord,
+)
 from ingestion.storage.raw_event_store import RawEventStore
 from ingestion.validation.validator import validate_raw_event
 from ingestion.normalization.mapper import transform_axis_payload_to_internal_event
 from ingestion.normalization.mapper import InternalEvent
 
+
+def _new_event_id() -> str:
+    return str(uuid.uuid4())
+
+
+@dataclass(frozen=True)
+class _IngestResult:
+    # Gick igenom valideringen (och sparas då i raw_store)
+    valid: bool
+    internal: Optional[InternalEvent] = None
+    message: Optional[str] = None
+
+
+def _ingest_raw_event(raw_event: RawEvent, next_event_id: Callable[[], str]) -> _IngestResult:
+    """validate -> map för en händelse. Samma logik för live, replay och batch-replay."""
+    # 1) validera
+    res = validate_raw_event(raw_event)
+    if not res.ok or res.event is None:
+        # F02: logga + flagga utan crash (här: print, byt senare mot logger)
+        return _IngestResult(False, message=f"[ingestion][invalid] {res.error} replay_seq={raw_event.replay_seq}")
+
+    # 2) mappa till InternalEvent om vi känner igen typen
+    kind = res.event.kind
+    if kind == "object_track":
+        internal = transform_axis_payload_to_internal_event(
+            src=res.event.payload,
+            source="replay" if res.event.source == "replay" else "live",
+            fallback_event_id=next_event_id(),
+        )
+        return _IngestResult(True, internal=internal)
+
+    # Om vi inte kan mappa ännu (t.ex. frame eller unknown), flagga men krascha inte
+    return _IngestResult(True, message=f"[ingestion][skip] kind={kind} not mapped yet replay_seq={raw_event.replay_seq}")
+
+
+# (InternalEvent eller None, rad till raw_store eller None, loggrad eller None)
+_BatchItem = Tuple[Optional[InternalEvent], Optional[str], Optional[str]]
+
+
+def _ingest_replay_batch(records: List[ReplayRecord], keep_raw_lines: bool) -> List[_BatchItem]:
+    """Körs i en worker-process: tolka, validera och mappa en batch replay-poster."""
+    items: List[_BatchItem] = []
+    for record in records:
+        raw_event = raw_event_from_record(record)
+        if raw_event is None:
+            continue
+        result = _ingest_raw_event(raw_event, _new_event_id)
+        raw_line = RawEventStore.to_line(raw_event) if keep_raw_lines and result.valid else None
+        items.append((result.internal, raw_line, result.message))
+    return items
+
+
 class IngestionService:
     """Kopplar ihop ingestion-pipelinen:
     source -> validator -> mapper
@@ -20,53 +84,135 @@ class IngestionService:
         self,
         *,
         on_internal_event: Optional[Callable[[InternalEvent], None]] = None,
+        on_internal_batch: Optional[Callable[[List[InternalEvent]], None]] = None,
         raw_store: Optional[RawEventStore] = None,
         enable_raw_store: bool = True,
     ) -> None:
         self.on_internal_event = on_internal_event
+        # Används av run_replay_batches; saknas den anropas on_internal_event per händelse.
+        self.on_internal_batch = on_internal_batch
         self.raw_store = raw_store or RawEventStore()
         self.enable_raw_store = enable_raw_store
 
     def _next_event_id(self) -> str:
-        return str(uuid.uuid4())
+        return _new_event_id()
 
     def handle_raw_event(self, raw_event: RawEvent) -> bool:
         """En 'ingång' för både MQTT och replay."""
-        # 1) validera
-        res = validate_raw_event(raw_event)
-        if not res.ok or res.event is None:
-            # F02: logga + flagga utan crash (här: print, byt senare mot logger)
-            print(f"[ingestion][invalid] {res.error} replay_seq={raw_event.replay_seq}")
-            return False
+        result = _ingest_raw_event(raw_event, self._next_event_id)
+        if result.message is not None:
+            print(result.message)
 
-        # 2) (valfritt) spara rådata för replay/debug (FIL, ej DB)
-        if self.enable_raw_store:
+        # (valfritt) spara rådata för replay/debug (FIL, ej DB)
+        if result.valid and self.enable_raw_store:
             try:
                 self.raw_store.append(raw_event)
             except Exception as e:
                 print(f"[ingestion][warn] raw_store append failed: {e}")
 
-        # 3) mappa till InternalEvent om vi känner igen typen
-        kind = res.event.kind
-        if kind == "object_track":
-            internal = transform_axis_payload_to_internal_event(
-                src=res.event.payload,
-                source="replay" if res.event.source == "replay" else "live",
-                fallback_event_id=self._next_event_id(),
-            )
-            if self.on_internal_event is not None:
-                self.on_internal_event(internal)
-            return True
-
-        # Om vi inte kan mappa ännu (t.ex. frame eller unknown), flagga men krascha inte
-        print(f"[ingestion][skip] kind={kind} not mapped yet replay_seq={raw_event.replay_seq}")
-        return False
-
-    def run_replay(self, replay_file_path: str) -> int:
-        """Kör en replay-fil igenom ingestion (F03). Returnerar antal InternalEvents."""
+        if result.internal is None:
+            return False
+        if self.on_internal_event is not None:
+            self.on_internal_event(result.internal)
+        return True
+
+    def run_replay(
+        self,
+        replay_file_path: str,
+        start_offset: int = 0,
+        start_time: Optional[datetime] = None,
+    ) -> int:
+        """Kör en replay-fil igenom ingestion (F03). Returnerar antal InternalEvents.
+
+        `start_offset`/`start_time` skickas vidare till `iter_replay_events`.
+        """
         count = 0
-        for raw_event in iter_replay_events(replay_file_path):
+        for raw_event in iter_replay_events(replay_file_path, start_offset=start_offset, start_time=start_time):
             ok = self.handle_raw_event(raw_event)
             if ok:
                 count += 1
+        self._flush_raw_store()
         return count
+
+    def run_replay_batches(
+        self,
+        replay_file_path: str,
+        batch_size: int = 1000,
+        workers: Optional[int] = None,
+        start_offset: int = 0,
+        start_time: Optional[datetime] = None,
+    ) -> int:
+        """Kör en replay-fil i batcher över en processpool. Returnerar antal InternalEvents.
+
+        Huvudprocessen läser filen och skickar batcher med `batch_size`
+        otolkade JSONL-rader till `workers` processer (default antal CPU:er),
+        som tolkar, validerar och mappar dem. Resultaten tas emot i filens
+        ordning, skrivs till raw_store och skickas vidare med
+        `on_internal_batch` (en lista per batch). Högst två batcher per
+        worker är ute samtidigt, så minnet hålls begränsat.
+
+        Med `workers=0` körs allt i den här processen. Händelserna blir
+        desamma som med `run_replay`.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        records = iter_replay_records(replay_file_path, start_offset=start_offset, start_time=start_time)
+        batches = iter(lambda: list(islice(records, batch_size)), [])
+        keep_raw_lines = self.enable_raw_store
+
+        count = 0
+        if workers <= 0:
+            for batch in batches:
+                count += self._deliver_batch(_ingest_replay_batch(batch, keep_raw_lines))
+            self._flush_raw_store()
+            return count
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: Deque[Future] = deque()
+            for batch in batches:
+                pending.append(pool.submit(_ingest_replay_batch, batch, keep_raw_lines))
+                if len(pending) >= 2 * workers:
+                    count += self._deliver_batch(pending.popleft().result())
+            while pending:
+                count += self._deliver_batch(pending.popleft().result())
+        self._flush_raw_store()
+        return count
+
+    def close(self) -> None:
+        """Skriv ut buffrad rådata och stäng raw_store."""
+        self.raw_store.close()
+
+    def _flush_raw_store(self) -> None:
+        # raw_store buffrar rader; efter en replay ska allt ligga i filen.
+        if self.enable_raw_store:
+            try:
+                self.raw_store.flush()
+            except Exception as e:
+                print(f"[ingestion][warn] raw_store flush failed: {e}")
+
+    def _deliver_batch(self, items: List[_BatchItem]) -> int:
+        internals: List[InternalEvent] = []
+        raw_lines: List[str] = []
+        for internal, raw_line, message in items:
+            if message is not None:
+                print(message)
+            if raw_line is not None:
+                raw_lines.append(raw_line)
+            if internal is not None:
+                internals.append(internal)
+
+        if raw_lines:
+            try:
+                self.raw_store.append_lines(raw_lines)
+            except Exception as e:
+                print(f"[ingestion][warn] raw_store append failed: {e}")
+
+        if internals:
+            if self.on_internal_batch is not None:
+                self.on_internal_batch(internals)
+            elif self.on_internal_event is not None:
+                for internal in internals:
+                    self.on_internal_event(internal)
+        return len(internals)
@@ -40,7 +40,9 @@ def record_once(ffmpeg, rtsp_url, camera_id, duration_seconds):
         text=True,
     )
 
-def start_recording_ffmpeg(ffmpeg, rtsp_url, camera_id, segment_seconds=10): # Will create a seperate process, pls be careful
+def start_recording_ffmpeg(ffmpeg, rtsp_url, camera_id, segment_seconds=10, capture_output=False): # Will create a seperate process, pls be careful
+    # capture_output=True: segmentlistan (en CSV-rad per färdigt segment) skrivs till
+    # stdout och varningar till stderr, båda som textpipes för RecorderSupervisor.
 
     # setup directory
     camera_id = str(camera_id)
@@ -64,9 +66,20 @@ def start_recording_ffmpeg(ffmpeg, rtsp_url, camera_id, segment_seconds=10): # W
         "-reset_timestamps", "1",
         "-strftime", "1",
         "-movflags", "+faststart",
-
-        file,
     ]
+    if capture_output:
+        cmd += ["-segment_list", "pipe:1", "-segment_list_type", "csv"]
+    cmd.append(file)
+
+    if capture_output:
+        return subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
 
     return subprocess.Popen(
         cmd,
@@ -76,10 +89,15 @@ def start_recording_ffmpeg(ffmpeg, rtsp_url, camera_id, segment_seconds=10): # W
     )
 
 
-def stop_recording(process):
+def stop_recording(process, timeout=5.0):
     if process is None:
         return
     process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
 
 
 def main():
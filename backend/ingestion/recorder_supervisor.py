@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Startar inspelningsprocessen. Den ska ha stdout (segmentlista, en rad
+# "filnamn,start,slut" per stängt segment) och stderr som textpipes.
+ProcessFactory = Callable[[], Any]
+# Anropas per färdigt segment med (filnamn, längd i sekunder).
+SegmentCallback = Callable[[str, float], None]
+
+
+class RecorderSupervisor:
+    """Övervakar en inspelningsprocess (ffmpeg) och startar om den vid fel.
+
+    Processen startas via `start_process` och skriver en rad till stdout per
+    färdigt segment (`-segment_list pipe:1`, se `start_recording_ffmpeg`).
+    `poll()` körs i en bakgrundstråd och startar om processen när:
+    - den har avslutats
+    - inget segment blivit klart på `stall_seconds` (default 3 × segmentlängden),
+      t.ex. när RTSP-strömmen hänger utan att ffmpeg avslutas
+
+    Omstart sker med exponentiell backoff (`restart_backoff_seconds` dubblas per
+    fel i följd, max `max_restart_backoff_seconds`). Räknaren nollställs när
+    processen levererar ett segment igen.
+
+    stderr läses hela tiden (annars kan pipen bli full och blockera ffmpeg). De
+    senaste `stderr_max_lines` raderna finns i `stderr_tail()`, och med
+    `stderr_log_path` skrivs de även till en fil som roteras till `.1` vid
+    `stderr_log_max_bytes`.
+
+    Ett glapp räknas när tiden mellan två färdiga segment är mer än
+    `segment_seconds + gap_tolerance_seconds`. Det täcker både omstarter och
+    strömavbrott som ffmpeg själv tog sig igenom.
+
+    `on_segment` anropas från lästråden för varje färdigt segment, t.ex. för att
+    lägga in det i segmentindexet.
+    """
+
+    def __init__(
+        self,
+        camera_id: str,
+        start_process: ProcessFactory,
+        segment_seconds: float = 10.0,
+        stall_seconds: Optional[float] = None,
+        gap_tolerance_seconds: Optional[float] = None,
+        restart_backoff_seconds: float = 1.0,
+        max_restart_backoff_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+        stop_timeout_seconds: float = 5.0,
+        stderr_max_lines: int = 200,
+        stderr_log_path: str | Path | None = None,
+        stderr_log_max_bytes: int = 1024 * 1024,
+        on_segment: Optional[SegmentCallback] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.camera_id = str(camera_id)
+        self.segment_seconds = segment_seconds
+        self.stall_seconds = stall_seconds if stall_seconds is not None else 3 * segment_seconds
+        self.gap_tolerance_seconds = gap_tolerance_seconds if gap_tolerance_seconds is not None else segment_seconds / 2
+        self.restart_backoff_seconds = restart_backoff_seconds
+        self.max_restart_backoff_seconds = max_restart_backoff_seconds
+        self.poll_interval = poll_interval
+        self.stop_timeout_seconds = stop_timeout_seconds
+        self.stderr_log_path = Path(stderr_log_path) if stderr_log_path is not None else None
+        self.stderr_log_max_bytes = stderr_log_max_bytes
+        self._start_process = start_process
+        self._on_segment = on_segment
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._stderr_lines: deque[str] = deque(maxlen=max(1, stderr_max_lines))
+        self._stderr_log = None
+        self._process: Optional[Any] = None
+        self._started_at = 0.0
+        self._last_segment_at: Optional[float] = None
+        self._last_segment: Optional[str] = None
+        self._next_start_at = 0.0
+        self._consecutive_failures = 0
+        self._stopping = False
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._starts = 0
+        self._restarts = 0
+        self._exits = 0
+        self._stalls = 0
+        self._start_failures = 0
+        self._segments = 0
+        self._gaps = 0
+        self._gap_seconds = 0.0
+        self._stderr_total = 0
+
+    @property
+    def process(self) -> Optional[Any]:
+        with self._lock:
+            return self._process
+
+    def start(self) -> None:
+        with self._lock:
+            self._stopping = False
+            self._start_locked(self._clock())
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopping = True
+            process = self._process
+            self._process = None
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1.0)
+            self._thread = None
+        if process is not None:
+            self._terminate(process)
+        with self._lock:
+            if self._stderr_log is not None:
+                self._stderr_log.close()
+                self._stderr_log = None
+
+    def poll(self) -> None:
+        """Kontrollera processen och starta om vid behov. Körs av bakgrundstråden."""
+        now = self._clock()
+        with self._lock:
+            if self._stopping:
+                return
+            process = self._process
+            if process is None:
+                if now >= self._next_start_at:
+                    self._start_locked(now)
+                return
+
+            exitcode = process.poll()
+            last_progress = max(self._started_at, self._last_segment_at or 0.0)
+            if exitcode is not None:
+                self._exits += 1
+                reason = f"exited with code {exitcode}"
+            elif now - last_progress > self.stall_seconds:
+                self._stalls += 1
+                reason = f"no segment for {now - last_progress:.0f}s"
+            else:
+                return
+            self._process = None
+            delay = self._schedule_restart_locked(now)
+
+        print(f"[recorder:{self.camera_id}] {reason}, restarting in {delay:.1f}s")
+        if exitcode is None:
+            self._terminate(process)
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            reference = self._last_segment_at if self._last_segment_at is not None else self._started_at
+            age = now - reference if self._starts else 0.0
+            alive = self._process is not None and self._process.poll() is None
+            return {
+                "alive": int(alive),
+                "pid": getattr(self._process, "pid", None) if alive else None,
+                "starts": self._starts,
+                "restarts": self._restarts,
+                "exits": self._exits,
+                "stalls": self._stalls,
+                "start_failures": self._start_failures,
+                "consecutive_failures": self._consecutive_failures,
+                "segments": self._segments,
+                "last_segment": self._last_segment,
+                "last_segment_age_seconds": round(age, 3),
+                # Hur långt efter förväntat nästa segment inspelningen ligger.
+                "recording_lag_seconds": round(max(0.0, age - self.segment_seconds), 3),
+                "gaps": self._gaps,
+                "gap_seconds": round(self._gap_seconds, 3),
+                "stderr_lines": self._stderr_total,
+            }
+
+    def stderr_tail(self) -> List[str]:
+        with self._lock:
+            return list(self._stderr_lines)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as exc:
+                print(f"[recorder:{self.camera_id}] poll failed: {exc!r}")
+
+    def _schedule_restart_locked(self, now: float) -> float:
+        self._consecutive_failures += 1
+        delay = min(
+            self.max_restart_backoff_seconds,
+            self.restart_backoff_seconds * (2 ** (self._consecutive_failures - 1)),
+        )
+        self._next_start_at = now + delay
+        return delay
+
+    def _start_locked(self, now: float) -> None:
+        try:
+            process = self._start_process()
+        except Exception as exc:
+            self._start_failures += 1
+            delay = self._schedule_restart_locked(now)
+            print(f"[recorder:{self.camera_id}] start failed: {exc!r}, retrying in {delay:.1f}s")
+            return
+        if self._starts:
+            self._restarts += 1
+        self._starts += 1
+        self._process = process
+        self._started_at = now
+        for stream, handler in ((process.stdout, self._on_stdout_line), (process.stderr, self._on_stderr_line)):
+            if stream is not None:
+                threading.Thread(
+                    target=self._read_lines,
+                    args=(stream, handler),
+                    name=f"recorder-{self.camera_id}-reader",
+                    daemon=True,
+                ).start()
+
+    @staticmethod
+    def _read_lines(stream, handler: Callable[[str], None]) -> None:
+        try:
+            for line in stream:
+                line = line.rstrip("\r\n")
+                if line:
+                    handler(line)
+        except (OSError, ValueError):
+            # Pipen stängdes när processen avslutades.
+            pass
+
+    def _on_stdout_line(self, line: str) -> None:
+        # Segmentlista i CSV-format: filnamn,start,slut (sekunder i strömmen).
+        parts = line.rsplit(",", 2)
+        file_name = parts[0]
+        try:
+            duration = float(parts[2]) - float(parts[1])
+        except (IndexError, ValueError):
+            duration = float(self.segment_seconds)
+        now = self._clock()
+        with self._lock:
+            if self._last_segment_at is not None:
+                interval = now - self._last_segment_at
+                if interval > self.segment_seconds + self.gap_tolerance_seconds:
+                    self._gaps += 1
+                    self._gap_seconds += interval - self.segment_seconds
+            self._last_segment_at = now
+            self._last_segment = file_name
+            self._segments += 1
+            self._consecutive_failures = 0
+        if self._on_segment is not None:
+            try:
+                self._on_segment(file_name, duration)
+            except Exception as exc:
+                print(f"[recorder:{self.camera_id}] on_segment failed for {file_name}: {exc!r}")
+
+    def _on_stderr_line(self, line: str) -> None:
+        with self._lock:
+            self._stderr_lines.append(line)
+            self._stderr_total += 1
+            if self.stderr_log_path is not None:
+                self._write_stderr_log_locked(line)
+
+    def _write_stderr_log_locked(self, line: str) -> None:
+        if self._stderr_log is None:
+            if self._stopping:
+                return
+            self.stderr_log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._stderr_log = open(self.stderr_log_path, "a", encoding="utf-8")
+        self._stderr_log.write(f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {line}\n")
+        self._stderr_log.flush()
+        if self._stderr_log.tell() >= self.stderr_log_max_bytes:
+            self._stderr_log.close()
+            os.replace(self.stderr_log_path, f"{self.stderr_log_path}.1")
+            self._stderr_log = open(self.stderr_log_path, "a", encoding="utf-8")
+
+    def _terminate(self, process: Any) -> None:
+        if process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=self.stop_timeout_seconds)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
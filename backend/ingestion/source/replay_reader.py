@@ -2,15 +2,30 @@
 # ingestion_/source/replay_reader.py
 from __future__ import annotations
 
+import codecs
+import gzip
+import io
 import json
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterator, Literal, Optional, Union
+from typing import Any, BinaryIO, Dict, Iterator, Literal, Optional, Tuple, Union
 from datetime import datetime, timezone
 
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: no cover - optional for thin envs
+    zstandard = None
+
 
 SourceType = Literal["live", "replay"]
 
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_CHUNK_SIZE = 64 * 1024
+# När sökintervallet är mindre än så här läses resten rad för rad.
+_BISECT_MIN_SPAN = 64 * 1024
+
 
 @dataclass(frozen=True)
 class RawEvent:
@@ -21,70 +36,318 @@ class RawEvent:
     # Hjälpfält ifall vi vill debugga replay och veta vilken rad/post som kom
     replay_seq: Optional[int] = None
     replay_file: Optional[str] = None
+    # Byte-offset (i uppackad data) där JSONL-raden börjar. Kan skickas som
+    # start_offset till iter_replay_events för att fortsätta därifrån.
+    replay_offset: Optional[int] = None
 
 
 def _now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _load_json_any(path: Path) -> Any:
-    # Stöd: 1) JSONL (en json per rad), 2) single JSON object, 3) JSON array
-    text = path.read_text(encoding="utf-8").strip()
-    if not text:
-        return []
-
-    # JSONL detection: om första icke-whitespace inte är '{' eller '[' -> fortfarande kan vara JSONL,
-    # men enklast: om flera rader och varje rad ser ut som JSON-object
-    if "\n" in text:
-        # prova JSONL först
-        rows = [r.strip() for r in text.splitlines() if r.strip()]
-        jsonl_ok = True
-        parsed_rows = []
-        for r in rows:
-            try:
-                obj = json.loads(r)
-                parsed_rows.append(obj)
-            except Exception:
-                jsonl_ok = False
-                break
-        if jsonl_ok:
-            return parsed_rows
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else None
 
-    # annars: prova standard JSON (object eller array)
-    return json.loads(text)
 
+def event_timestamp(payload: Any) -> Optional[datetime]:
+    """Händelsens tid: `start_time`, annars `image.timestamp`. Rader från RawEventStore packas upp via `raw`."""
+    if not isinstance(payload, dict):
+        return None
+    ts = _parse_timestamp(payload.get("start_time"))
+    if ts is not None:
+        return ts
+    image = payload.get("image")
+    if isinstance(image, dict):
+        ts = _parse_timestamp(image.get("timestamp"))
+        if ts is not None:
+            return ts
+    if isinstance(payload.get("raw"), dict):
+        return event_timestamp(payload["raw"])
+    return None
 
-def iter_replay_events(file_path: Union[str, Path]) -> Iterator[RawEvent]:
-    """Läser replay-data och yieldar RawEvent i ordning.
 
-    Accepterar:
-    - JSONL: en JSON per rad
-    - JSON array: [ {...}, {...} ]
-    - JSON object: { ... } (yieldar en enda händelse)
+def open_replay_stream(file_path: Union[str, Path]) -> BinaryIO:
+    """Öppna en replay-fil som buffrad binär ström.
+
+    gzip- och zstd-filer känns igen på de första byten (inte filändelsen)
+    och packas upp medan de läses. zstd kräver paketet `zstandard`.
     """
     path = Path(file_path)
-    data = _load_json_any(path)
-
-    def emit(obj: Any, seq: int) -> Optional[RawEvent]:
-        if not isinstance(obj, dict):
-            return None
-        return RawEvent(
-            raw=obj,
-            received_at=_now_utc(),
-            source="replay",
-            replay_seq=seq,
-            replay_file=str(path),
-        )
-
-    if isinstance(data, list):
-        for i, item in enumerate(data, start=1):
-            ev = emit(item, i)
-            if ev:
-                yield ev
-    elif isinstance(data, dict):
-        ev = emit(data, 1)
-        if ev:
-            yield ev
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.open(path, "rb")
+    if magic == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but the zstandard package is not installed")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader, buffer_size=_CHUNK_SIZE)
+    return open(path, "rb", buffering=_CHUNK_SIZE)
+
+
+def _is_plain_file(stream: BinaryIO) -> bool:
+    # Bara okomprimerade filer kan sökas i direkt; komprimerade läses framåt.
+    return isinstance(stream, io.BufferedReader) and isinstance(stream.raw, io.FileIO)
+
+
+def _skip_bytes(stream: BinaryIO, count: int) -> None:
+    while count > 0:
+        chunk = stream.read(min(count, _CHUNK_SIZE))
+        if not chunk:
+            return
+        count -= len(chunk)
+
+
+def _seek_to_line(stream: BinaryIO, offset: int) -> int:
+    """Ställ strömmen på första radstart vid eller efter `offset`. Returnerar den radens offset."""
+    if offset <= 0:
+        return 0
+    if _is_plain_file(stream):
+        stream.seek(offset - 1)
     else:
-        # Okänt format, yieldar ingenting
+        _skip_bytes(stream, offset - 1)
+    if stream.read(1) in (b"\n", b""):
+        return offset
+    return offset + len(stream.readline())
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _line_timestamp(line: bytes) -> Optional[datetime]:
+    return event_timestamp(_parse_line(line))
+
+
+def _bisect_jsonl(stream: BinaryIO, lo: int, start_time: datetime) -> int:
+    """Binärsök en okomprimerad, tidsordnad JSONL-fil efter första raden med tid >= start_time.
+
+    Returnerar en radstart före (eller på) den raden; resten hittas genom att
+    läsa rader framåt därifrån.
+    """
+    hi = os.fstat(stream.fileno()).st_size
+    while hi - lo > _BISECT_MIN_SPAN:
+        mid = (lo + hi) // 2
+        pos = _seek_to_line(stream, mid)
+        ts = None
+        while ts is None and pos < hi:
+            line = stream.readline()
+            if not line:
+                break
+            ts = _line_timestamp(line)
+            pos += len(line)
+        if ts is None or ts >= start_time:
+            hi = mid
+        else:
+            lo = pos
+    stream.seek(lo)
+    return lo
+
+
+def _iter_jsonl(stream: BinaryIO, offset: int) -> Iterator[Tuple[Optional[int], Any]]:
+    # Raderna lämnas otolkade (bytes); de tolkas av raw_event_from_record.
+    for line in stream:
+        line_offset = offset
+        offset += len(line)
+        if line.strip():
+            yield line_offset, line
+
+
+def _iter_document(stream: BinaryIO, prefix: bytes, in_array: bool, path: Path) -> Iterator[Tuple[Optional[int], Any]]:
+    """Tolka en JSON-array (eller ett/flera JSON-dokument efter varandra) bit för bit.
+
+    Filen läses i block; varje element tolkas med `raw_decode` så fort det
+    finns helt i bufferten, och den tolkade delen släpps direkt.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = text.decode(prefix)
+    pos = buf.index("[") + 1 if in_array else 0
+    eof = False
+    read_size = _CHUNK_SIZE
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (in_array and buf[pos] == ",")):
+            pos += 1
+        if pos < len(buf):
+            if in_array and buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Ett värde som slutar precis vid buffertens slut kan vara avklippt (t.ex. ett tal).
+                if end < len(buf) or eof:
+                    yield None, obj
+                    pos = end
+                    read_size = _CHUNK_SIZE
+                    continue
+        elif eof:
+            if in_array:
+                raise ValueError(f"unterminated JSON array in {path}")
+            return
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buf = buf[pos:] + text.decode(chunk, final=eof)
+        pos = 0
+        # Stora element: läs i växande block så att de inte tolkas om för varje block.
+        read_size = max(_CHUNK_SIZE, len(buf))
+
+
+def _iter_values(
+    stream: BinaryIO,
+    path: Path,
+    start_offset: int,
+    start_time: Optional[datetime],
+) -> Iterator[Tuple[Optional[int], Any]]:
+    if start_offset > 0:
+        # En byte-offset är bara meningsfull i JSONL.
+        offset = _seek_to_line(stream, start_offset)
+        if start_time is not None and _is_plain_file(stream):
+            offset = _bisect_jsonl(stream, offset, start_time)
+        yield from _iter_jsonl(stream, offset)
+        return
+
+    offset = 0
+    first = stream.readline()
+    while first and not first.strip():
+        offset += len(first)
+        first = stream.readline()
+    if not first:
         return
+    if first.lstrip().startswith(b"["):
+        yield from _iter_document(stream, first, True, path)
+        return
+    offset_after = offset + len(first)
+    try:
+        obj = json.loads(first)
+    except ValueError:
+        # Första raden är inte ett helt JSON-värde. Är nästa rad ett eget
+        # JSON-objekt är det JSONL med en trasig första rad (loggas av
+        # _decode), annars ett formaterat dokument.
+        skipped = b""
+        second = stream.readline()
+        while second and not second.strip():
+            skipped += second
+            second = stream.readline()
+        if second and not isinstance(_parse_line(second), dict):
+            yield from _iter_document(stream, first + skipped + second, False, path)
+            return
+        yield offset, first
+        if second:
+            second_offset = offset_after + len(skipped)
+            yield second_offset, second
+            yield from _iter_jsonl(stream, second_offset + len(second))
+        return
+
+    if start_time is not None and _is_plain_file(stream):
+        ts = event_timestamp(obj)
+        if ts is not None and ts < start_time:
+            yield from _iter_jsonl(stream, _bisect_jsonl(stream, offset_after, start_time))
+            return
+    yield offset, obj
+    yield from _iter_jsonl(stream, offset_after)
+
+
+def _decode(data: Any, path: str, offset: Optional[int]) -> Any:
+    if not isinstance(data, bytes):
+        return data
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        # F02: logga och hoppa över raden i stället för att avbryta hela replayn
+        print(f"[replay][invalid] {path} offset={offset}: {exc}")
+        return None
+
+
+@dataclass(frozen=True)
+class ReplayRecord:
+    """En post ur en replay-fil innan den blivit RawEvent.
+
+    JSONL-rader lämnas som bytes så att tolkningen kan göras där posten
+    används (t.ex. i en worker-process vid batch-replay).
+    """
+    seq: int
+    offset: Optional[int]
+    data: Any
+    file: str
+
+
+def raw_event_from_record(record: ReplayRecord) -> Optional[RawEvent]:
+    """Tolka en ReplayRecord till RawEvent. None för trasiga rader och värden som inte är objekt."""
+    obj = _decode(record.data, record.file, record.offset)
+    if not isinstance(obj, dict):
+        return None
+    return RawEvent(
+        raw=obj,
+        received_at=_now_utc(),
+        source="replay",
+        replay_seq=record.seq,
+        replay_file=record.file,
+        replay_offset=record.offset,
+    )
+
+
+def iter_replay_records(
+    file_path: Union[str, Path],
+    start_offset: int = 0,
+    start_time: Optional[datetime] = None,
+) -> Iterator[ReplayRecord]:
+    """Som `iter_replay_events`, men yieldar ReplayRecord med otolkade JSONL-rader."""
+    path = Path(file_path)
+    if start_time is not None and start_time.tzinfo is None:
+        raise ValueError("start_time must be timezone-aware")
+
+    with open_replay_stream(path) as stream:
+        seq = 0
+        seeking = start_time is not None
+        for offset, data in _iter_values(stream, path, start_offset, start_time):
+            seq += 1
+            if seeking:
+                data = _decode(data, str(path), offset)
+                ts = event_timestamp(data)
+                if ts is None or ts < start_time:
+                    continue
+                seeking = False
+            yield ReplayRecord(seq=seq, offset=offset, data=data, file=str(path))
+
+
+def iter_replay_events(
+    file_path: Union[str, Path],
+    start_offset: int = 0,
+    start_time: Optional[datetime] = None,
+) -> Iterator[RawEvent]:
+    """Läser replay-data strömmande och yieldar RawEvent i ordning.
+
+    Accepterar:
+    - JSONL: en JSON per rad (läses rad för rad)
+    - JSON array: [ {...}, {...} ] (tolkas element för element)
+    - JSON object: { ... } (yieldar en enda händelse)
+    - samma sak gzip- eller zstd-komprimerat
+
+    Filen läses aldrig in i sin helhet, så första händelsen kommer direkt
+    även för stora inspelningar.
+
+    Parameters:
+        start_offset: börja vid första JSONL-raden på eller efter denna byte
+            (i uppackad data), t.ex. `replay_offset` från en tidigare händelse.
+        start_time: hoppa fram till första händelsen med tid >= start_time
+            (se `event_timestamp`); därefter yieldas allt. Okomprimerad JSONL
+            antas vara tidsordnad och binärsöks, annars läses filen framåt.
+
+    `replay_seq` räknas från startpunkten.
+    """
+    for record in iter_replay_records(file_path, start_offset=start_offset, start_time=start_time):
+        raw_event = raw_event_from_record(record)
+        if raw_event is not None:
+            yield raw_event
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import struct
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+@dataclass(frozen=True)
+class FrameTable:
+    """PTS och nyckelbilder för videospåret i ett segment, i visningsordning.
+
+    `pts` är relativ till första visade frame (i `timescale`-enheter), så
+    offset i sekunder från segmentets start kan slås upp direkt. `keyframes`
+    är index i `pts` för synkframes (IDR).
+    """
+
+    timescale: int
+    pts: Tuple[int, ...]
+    keyframes: Tuple[int, ...]
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.pts)
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.pts[-1] / self.timescale if self.pts else 0.0
+
+    def seconds(self, index: int) -> float:
+        return self.pts[index] / self.timescale
+
+    def frame_index(self, offset_seconds: float) -> int:
+        """Framen som visas vid `offset_seconds`: sista frame med pts <= offset."""
+        target = round(offset_seconds * self.timescale)
+        return max(0, bisect_right(self.pts, target) - 1)
+
+    def nearest_index(self, offset_seconds: float) -> int:
+        target = offset_seconds * self.timescale
+        index = bisect_right(self.pts, target)
+        if index == 0:
+            return 0
+        if index == len(self.pts) or target - self.pts[index - 1] <= self.pts[index] - target:
+            return index - 1
+        return index
+
+    def keyframe_for(self, index: int) -> int:
+        """Närmaste nyckelbild vid eller före `index` (avkodningen måste börja där)."""
+        position = bisect_right(self.keyframes, index) - 1
+        return self.keyframes[position] if position >= 0 else 0
+
+    def to_bytes(self) -> bytes:
+        return struct.pack(
+            f"<III{len(self.pts)}q{len(self.keyframes)}I",
+            self.timescale,
+            len(self.pts),
+            len(self.keyframes),
+            *self.pts,
+            *self.keyframes,
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> FrameTable:
+        timescale, frames, keyframes = struct.unpack_from("<III", data)
+        values = struct.unpack_from(f"<{frames}q{keyframes}I", data, 12)
+        return cls(timescale=timescale, pts=tuple(values[:frames]), keyframes=tuple(values[frames:]))
+
+
+def _iter_boxes(data: bytes, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise ValueError(f"invalid mp4 box size {size} for {box_type!r}")
+        yield box_type, offset + header, min(end, offset + size)
+        offset += size
+
+
+def _find_boxes(data: bytes, start: int, end: int, path: Tuple[bytes, ...]) -> List[Tuple[int, int]]:
+    found = []
+    for box_type, payload_start, payload_end in _iter_boxes(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            found.append((payload_start, payload_end))
+        elif box_type in _CONTAINER_BOXES:
+            found.extend(_find_boxes(data, payload_start, payload_end, path[1:]))
+    return found
+
+
+def _read_moov(f: BinaryIO) -> bytes:
+    # Läser bara moov; mdat (själva videon) hoppas över.
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("no moov box found")
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            if box_type != b"moov":
+                raise ValueError("no moov box found")
+            return f.read()
+        if box_type == b"moov":
+            return f.read(size - header_size)
+        if box_type == b"moof":
+            raise ValueError("fragmented mp4 is not supported")
+        f.seek(size - header_size, 1)
+
+
+def _full_box_entries(data: bytes, start: int, fmt: str) -> Tuple[int, List[Tuple[int, ...]]]:
+    version = data[start]
+    (count,) = struct.unpack_from(">I", data, start + 4)
+    item = struct.Struct(fmt)
+    return version, [item.unpack_from(data, start + 8 + i * item.size) for i in range(count)]
+
+
+def _video_track_table(moov: bytes, trak_start: int, trak_end: int) -> Optional[FrameTable]:
+    hdlr = _find_boxes(moov, trak_start, trak_end, (b"mdia", b"hdlr"))
+    if not hdlr or moov[hdlr[0][0] + 8 : hdlr[0][0] + 12] != b"vide":
+        return None
+
+    mdhd_start = _find_boxes(moov, trak_start, trak_end, (b"mdia", b"mdhd"))[0][0]
+    timescale_offset = 20 if moov[mdhd_start] == 1 else 12
+    (timescale,) = struct.unpack_from(">I", moov, mdhd_start + timescale_offset)
+
+    stbl = (b"mdia", b"minf", b"stbl")
+    stts = _find_boxes(moov, trak_start, trak_end, stbl + (b"stts",))
+    if not stts:
+        raise ValueError("video track has no stts box")
+    decode_times = []
+    dts = 0
+    for count, delta in _full_box_entries(moov, stts[0][0], ">II")[1]:
+        for _ in range(count):
+            decode_times.append(dts)
+            dts += delta
+
+    composition = [0] * len(decode_times)
+    ctts = _find_boxes(moov, trak_start, trak_end, stbl + (b"ctts",))
+    if ctts:
+        version, entries = _full_box_entries(moov, ctts[0][0], ">II")
+        sample = 0
+        for count, offset in entries:
+            if version == 1 and offset >= 1 << 31:
+                offset -= 1 << 32
+            composition[sample : sample + count] = [offset] * count
+            sample += count
+
+    stss = _find_boxes(moov, trak_start, trak_end, stbl + (b"stss",))
+    if stss:
+        sync_samples = {number - 1 for (number,) in _full_box_entries(moov, stss[0][0], ">I")[1]}
+    else:
+        # Utan stss är alla samples synkframes.
+        sync_samples = set(range(len(decode_times)))
+
+    presentation = sorted(range(len(decode_times)), key=lambda i: decode_times[i] + composition[i])
+    if not presentation:
+        return FrameTable(timescale=timescale, pts=(), keyframes=())
+    first = decode_times[presentation[0]] + composition[presentation[0]]
+    pts = tuple(decode_times[i] + composition[i] - first for i in presentation)
+    keyframes = tuple(position for position, i in enumerate(presentation) if i in sync_samples)
+    return FrameTable(timescale=timescale, pts=pts, keyframes=keyframes)
+
+
+def read_frame_table(path: str) -> FrameTable:
+    """Bygg FrameTable ur mp4-filens sampletabeller (stts/ctts/stss), utan att avkoda något."""
+    with open(path, "rb") as f:
+        moov = _read_moov(f)
+    for trak_start, trak_end in _find_boxes(moov, 0, len(moov), (b"trak",)):
+        table = _video_track_table(moov, trak_start, trak_end)
+        if table is not None:
+            return table
+    raise ValueError(f"no video track in {path}")
+
+
+def try_read_frame_table(path: str) -> Optional[FrameTable]:
+    """Som `read_frame_table`, men None för filer som saknas eller inte kan tolkas."""
+    try:
+        return read_frame_table(path)
+    except (OSError, ValueError, IndexError, struct.error) as exc:
+        print(f"[frame-table] could not read {path}: {exc!r}")
+        return None
+
+
+def read_frame_at(path: str, offset_seconds: float, table: Optional[FrameTable] = None, stats: Optional[Dict[str, int]] = None) -> Optional[np.ndarray]:
+    """Avkoda framen som visas `offset_seconds` in i segmentet.
+
+    Med en FrameTable söker OpenCV till närmaste nyckelbild före målet, och
+    sedan avkodas (`grab`, utan färgkonvertering) exakt så många frames som
+    behövs för att nå målets PTS. OpenCVs sökning räknar om via medel-fps och
+    kan hamna fel vid variabel bildtakt, så var den hamnade kontrolleras mot
+    tabellen via framens faktiska PTS. Hamnade den efter målet görs ett nytt
+    försök från föregående nyckelbild. Utan tabell används OpenCVs egen
+    tidsbaserade sökning.
+
+    `stats` (valfri) får antal avkodade frames i `decoded`.
+    """
+    cap = cv2.VideoCapture(path)
+    try:
+        if table is None or not table.pts:
+            cap.set(cv2.CAP_PROP_POS_MSEC, max(0.0, offset_seconds) * 1000.0)
+            ok, frame = cap.read()
+            if stats is not None:
+                stats["decoded"] = 1
+            return frame if ok else None
+
+        target = table.frame_index(offset_seconds)
+        keyframe = table.keyframe_for(target)
+        decoded = 0
+        seeked = False
+        while True:
+            if keyframe > 0 or seeked:
+                # Både POS_FRAMES och POS_MSEC räknas om via medel-fps i OpenCV,
+                # så positionen är ungefärlig; den kontrolleras nedan.
+                cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                seeked = True
+            decoded += 1
+            if not cap.grab():
+                return None
+            if keyframe == 0:
+                # Filens början: första framen är frame 0.
+                current = 0
+                break
+            # Var sökningen faktiskt hamnade avgörs av framens PTS.
+            current = table.nearest_index(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+            if current <= target:
+                break
+            # Sökningen hamnade efter målet: ta föregående nyckelbild och försök igen.
+            keyframe = table.keyframe_for(keyframe - 1)
+        while current < target:
+            decoded += 1
+            if not cap.grab():
+                return None
+            current += 1
+        if stats is not None:
+            stats["decoded"] = decoded
+        ok, frame = cap.retrieve()
+        return frame if ok else None
+    finally:
+        cap.release()
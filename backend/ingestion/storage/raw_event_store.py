@@ -1,24 +1,106 @@
 # ingestion_/storage/raw_event_store.py
 from __future__ import annotations
 
+import atexit
+import gzip
 import json
+import os
+import shutil
+import threading
+import time
+import weakref
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from ingestion.source.replay_reader import RawEvent
 
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: no cover - optional for thin envs
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# json.dumps(..., ensure_ascii=False) skapar en ny encoder per anrop.
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+# Öppna stores stängs av en gemensam atexit-hook. Svaga referenser, så att en
+# store som ingen använder längre kan städas bort före processens slut.
+_OPEN_STORES: "weakref.WeakSet[RawEventStore]" = weakref.WeakSet()
+
+
+def _close_open_stores() -> None:
+    for store in list(_OPEN_STORES):
+        try:
+            store.close()
+        except Exception as exc:
+            print(f"[raw-store] close at exit failed: {exc!r}")
+
+
+atexit.register(_close_open_stores)
+
 
 class RawEventStore:
     """Valfri lagring av rådata (för replay/debug), INTE databasen.
 
     (Används i största syfte för testning)
+
+    Rader buffras i minnet och skrivs till en fil som hålls öppen:
+    - när bufferten når `flush_bytes`
+    - senast `flush_interval_seconds` efter första obuffrade raden (bakgrundstråd,
+      None stänger av den)
+    - vid `flush()`, `close()`, när objektet städas bort och när processen
+      avslutas (atexit)
+
+    När filen når `max_file_bytes` döps den om till
+    `raw_events-<UTC-tid med ms>.jsonl` och en ny fil påbörjas. Med `compress`
+    ("gzip" eller "zstd", det senare kräver `zstandard`) packas den
+    roterade filen i en bakgrundstråd. replay_reader läser alla varianterna.
     """
-    def __init__(self, folder: str = "replay_out") -> None:
+    def __init__(
+        self,
+        folder: str = "replay_out",
+        flush_bytes: int = 256 * 1024,
+        flush_interval_seconds: Optional[float] = 1.0,
+        max_file_bytes: Optional[int] = 256 * 1024 * 1024,
+        compress: Optional[str] = None,
+    ) -> None:
+        if compress is not None and compress not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"unknown compression {compress!r}, expected one of {sorted(COMPRESSION_SUFFIXES)}")
+        if compress == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
         self.base = Path(folder)
         self.base.mkdir(parents=True, exist_ok=True)
         self.file = self.base / "raw_events.jsonl"
+        self.flush_bytes = flush_bytes
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_file_bytes = max_file_bytes
+        self.compress = compress
 
-    def append(self, raw_event: RawEvent) -> None:
+        # _write_lock tas före _lock, så att buffertar skrivs i den ordning de togs.
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._handle = None
+        self._file_bytes = 0
+        self._closed = False
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._compressors: List[threading.Thread] = []
+
+        self._events = 0
+        self._flushes = 0
+        self._bytes_written = 0
+        self._rotations = 0
+        self._compressed_files = 0
+        self._flush_failures = 0
+
+        _OPEN_STORES.add(self)
+
+    @staticmethod
+    def to_line(raw_event: RawEvent) -> str:
+        """En JSONL-rad för `raw_event` (utan radbrytning)."""
         row: Dict[str, Any] = {
             "received_at": raw_event.received_at.isoformat(),
             "source": raw_event.source,
@@ -26,5 +108,201 @@ class RawEventStore:
             "replay_file": raw_event.replay_file,
             "raw": raw_event.raw,
         }
-        with self.file.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return _ENCODER.encode(row)
+
+    def append(self, raw_event: RawEvent) -> None:
+        self.append_lines([self.to_line(raw_event)])
+
+    def append_lines(self, lines: List[str]) -> None:
+        """Buffra färdiga rader från `to_line` (t.ex. serialiserade i en worker-process)."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("RawEventStore is closed")
+            was_empty = not self._pending
+            for line in lines:
+                self._pending.append(line + "\n")
+                self._pending_bytes += len(line) + 1
+            self._events += len(lines)
+            flush_now = self._pending_bytes >= self.flush_bytes
+            if was_empty and not flush_now and self.flush_interval_seconds is not None:
+                self._ensure_flusher_locked()
+                self._wakeup.set()
+        if flush_now:
+            self.flush()
+
+    def flush(self) -> None:
+        """Skriv buffrade rader till filen (och roterar den vid behov)."""
+        with self._write_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = []
+                self._pending_bytes = 0
+            if not pending:
+                return
+            data = "".join(pending).encode("utf-8")
+            try:
+                self._write_locked(data)
+            except Exception:
+                # Inget får tappas: lägg tillbaka raderna först i bufferten så
+                # att nästa flush försöker igen.
+                with self._lock:
+                    self._pending[:0] = pending
+                    self._pending_bytes += sum(len(line) for line in pending)
+                    self._flush_failures += 1
+                raise
+            with self._lock:
+                self._flushes += 1
+                self._bytes_written += len(data)
+            if self.max_file_bytes is not None and self._file_bytes >= self.max_file_bytes:
+                self._rotate_locked()
+
+    def _write_locked(self, data: bytes) -> None:
+        if self._handle is None:
+            # Obuffrad: det som skrivits ligger i filen, inget hänger kvar i Pythons buffer.
+            self._handle = open(self.file, "ab", buffering=0)
+            self._file_bytes = self._handle.tell()
+        view = memoryview(data)
+        written = 0
+        try:
+            while written < len(data):
+                written += self._handle.write(view[written:])
+        except OSError:
+            # Ta bort en halvskriven batch så att den inte dubbleras när den skrivs om.
+            if written:
+                try:
+                    os.ftruncate(self._handle.fileno(), self._file_bytes)
+                except OSError:
+                    pass
+            raise
+        self._file_bytes += len(data)
+
+    def close(self) -> None:
+        """Skriv det som är kvar, stoppa bakgrundstrådarna och stäng filen."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        _OPEN_STORES.discard(self)
+        self._stop_event.set()
+        self._wakeup.set()
+        # close() kan köras från __del__ i flush-tråden själv.
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=(self.flush_interval_seconds or 0.0) + 1.0)
+            self._thread = None
+        try:
+            self.flush()
+        finally:
+            with self._write_lock:
+                if self._handle is not None:
+                    self._handle.close()
+                    self._handle = None
+                compressors, self._compressors = self._compressors, []
+            for thread in compressors:
+                thread.join()
+
+    def __del__(self) -> None:
+        # Stängdes den aldrig: skriv ut bufferten i stället för att tappa den.
+        if not getattr(self, "_closed", True):
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def __enter__(self) -> RawEventStore:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "events": self._events,
+                "pending_events": len(self._pending),
+                "pending_bytes": self._pending_bytes,
+                "flushes": self._flushes,
+                "bytes_written": self._bytes_written,
+                "rotations": self._rotations,
+                "compressed_files": self._compressed_files,
+                "flush_failures": self._flush_failures,
+            }
+
+    def _ensure_flusher_locked(self) -> None:
+        if self._thread is None:
+            # Tråden får bara en svag referens, annars håller den liv i storen.
+            self._thread = threading.Thread(
+                target=_run_flusher,
+                args=(weakref.ref(self), self._wakeup, self._stop_event, self.flush_interval_seconds),
+                name="raw-event-store-flush",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _rotate_locked(self) -> None:
+        self._handle.close()
+        self._handle = None
+        # Millisekunder i namnet så att filerna sorteras i skrivordning. Finns
+        # namnet redan (flera rotationer samma ms) flyttas tiden fram en ms.
+        ms = time.time_ns() // 1_000_000
+        while True:
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(ms // 1000)) + f"{ms % 1000:03d}Z"
+            rotated = self.base / f"raw_events-{stamp}.jsonl"
+            if not any(Path(f"{rotated}{suffix}").exists() for suffix in ("", *COMPRESSION_SUFFIXES.values())):
+                break
+            ms += 1
+        os.replace(self.file, rotated)
+        with self._lock:
+            self._rotations += 1
+        if self.compress is not None:
+            self._compressors = [t for t in self._compressors if t.is_alive()]
+            thread = threading.Thread(target=self._compress_file, args=(rotated,), name="raw-event-store-compress", daemon=True)
+            self._compressors.append(thread)
+            thread.start()
+
+    def _compress_file(self, path: Path) -> None:
+        target = Path(f"{path}{COMPRESSION_SUFFIXES[self.compress]}")
+        tmp = Path(f"{target}.tmp")
+        try:
+            with open(path, "rb") as src:
+                if self.compress == "gzip":
+                    with gzip.open(tmp, "wb", compresslevel=6) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                else:
+                    with open(tmp, "wb") as raw_dst:
+                        with zstandard.ZstdCompressor().stream_writer(raw_dst) as dst:
+                            shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp, target)
+            path.unlink()
+        except Exception as exc:
+            tmp.unlink(missing_ok=True)
+            print(f"[raw-store] compressing {path} failed: {exc!r}")
+            return
+        with self._lock:
+            self._compressed_files += 1
+
+
+def _run_flusher(
+    store_ref: "weakref.ref[RawEventStore]",
+    wakeup: threading.Event,
+    stop_event: threading.Event,
+    interval: float,
+) -> None:
+    while not stop_event.is_set():
+        # Med timeout så att tråden märker om storen städats bort utan close().
+        if not wakeup.wait(interval):
+            if store_ref() is None:
+                return
+            continue
+        wakeup.clear()
+        # Vänta ut intervallet så att fler rader hinner samlas ihop.
+        if stop_event.wait(interval):
+            return
+        store = store_ref()
+        if store is None:
+            return
+        try:
+            store.flush()
+        except Exception as exc:
+            # Räknas i flush(); raderna ligger kvar till nästa försök.
+            print(f"[raw-store] flush failed: {exc!r}")
+        del store
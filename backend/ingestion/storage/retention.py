@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone, tzinfo
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from ingestion.storage.frame_table import try_read_frame_table
+from ingestion.storage.segment_index import RECORDINGS_TZ, SegmentIndex, SegmentRecord
+
+RECORDINGS_ROOT = Path(__file__).resolve().parents[2] / "recordings"
+# Kompakterade filer: UTC-start i namnet, en underkatalog per dag (UTC).
+COMPACTED_SEGMENT_FORMAT = "H%Y-%m-%d-T%H-%M-%S.mp4"
+
+# (indatafiler i tidsordning, utfil) -> skriver utfilen eller kastar.
+Compactor = Callable[[List[str], str], None]
+
+
+def ffmpeg_concat(ffmpeg: str) -> Compactor:
+    """Kompaktering med ffmpegs concat-demuxer (`-c copy`, ingen omkodning)."""
+
+    def _concat(inputs: List[str], output: str) -> None:
+        list_path = f"{output}.txt"
+        tmp_output = f"{output}.tmp"
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in inputs:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        try:
+            subprocess.run(
+                [
+                    ffmpeg,
+                    "-hide_banner",
+                    "-loglevel", "error",
+                    "-y",
+                    "-f", "concat",
+                    "-safe", "0",
+                    "-i", list_path,
+                    "-c", "copy",
+                    "-movflags", "+faststart",
+                    "-f", "mp4",
+                    tmp_output,
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+            os.replace(tmp_output, output)
+        finally:
+            for path in (list_path, tmp_output):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    return _concat
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    # None = ingen gräns.
+    max_bytes: Optional[int] = None
+    max_age_seconds: Optional[float] = None
+    max_segments: Optional[int] = None
+    # Kompaktera segment vars tidsspann (compact_span_seconds) slutade för mer än
+    # compact_after_seconds sedan. None = ingen kompaktering.
+    compact_after_seconds: Optional[float] = None
+    compact_span_seconds: float = 3600.0
+    # Större glapp än så mellan två segment delar en kompaktering, så att
+    # offset i den sammanslagna filen fortfarande motsvarar kameratid.
+    max_gap_seconds: float = 1.5
+
+
+def _empty_counters() -> Dict[str, int]:
+    return {
+        "segments": 0,
+        "bytes": 0,
+        "expired": 0,
+        "evicted_bytes": 0,
+        "evicted_count": 0,
+        "stale_rows": 0,
+        "compacted_runs": 0,
+        "compacted_segments": 0,
+        "compaction_failures": 0,
+        "freed_bytes": 0,
+    }
+
+
+class RecordingRetention:
+    """Retention för `recordings/<kamera>/` via SegmentIndex.
+
+    Varje körning (`run_once`, eller periodiskt i en bakgrundstråd via `start`):
+    1. ffmpeg-segment som saknas i indexet läggs till och rader vars fil är borta tas bort
+    2. segment äldre än `max_age_seconds` raderas
+    3. färdiga tidsspann (default en timme) med sammanhängande segment slås ihop
+       till en fil i `recordings/<kamera>/<YYYY-MM-DD>/`, och indexet byts i en transaktion
+    4. äldsta segmenten raderas tills kameran ligger under `max_bytes` och `max_segments`
+
+    Segment som slutade inom `active_guard_seconds` rörs aldrig, så filen som
+    ffmpeg eller splitmuxsink skriver just nu lämnas i fred. Kamerakatalogen
+    innehåller därmed bara segmenten som ännu inte kompakterats plus en
+    katalog per dag.
+    """
+
+    def __init__(
+        self,
+        policies: Dict[str, RetentionPolicy],
+        index: Optional[SegmentIndex] = None,
+        recordings_root: str | Path = RECORDINGS_ROOT,
+        compactor: Optional[Compactor] = None,
+        interval_seconds: float = 60.0,
+        active_guard_seconds: float = 30.0,
+        segment_seconds: float = 10.0,
+        recordings_tz: tzinfo = RECORDINGS_TZ,
+    ) -> None:
+        if any(policy.compact_after_seconds is not None for policy in policies.values()) and compactor is None:
+            raise ValueError("compaction needs a compactor, e.g. ffmpeg_concat(ffmpeg)")
+        self.policies = {str(camera_id): policy for camera_id, policy in policies.items()}
+        self.index = index if index is not None else SegmentIndex()
+        self.recordings_root = Path(recordings_root)
+        self.compactor = compactor
+        self.interval_seconds = interval_seconds
+        self.active_guard_seconds = active_guard_seconds
+        self.segment_seconds = segment_seconds
+        self.recordings_tz = recordings_tz
+
+        self._lock = threading.Lock()
+        self._totals = {camera_id: _empty_counters() for camera_id in self.policies}
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="recording-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {camera_id: dict(counters) for camera_id, counters in self._totals.items()}
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+        now = now or datetime.now(timezone.utc)
+        result = {}
+        for camera_id, policy in self.policies.items():
+            counters = self._run_camera(camera_id, policy, now)
+            with self._lock:
+                totals = self._totals[camera_id]
+                for key, value in counters.items():
+                    if key in ("segments", "bytes"):
+                        totals[key] = value
+                    else:
+                        totals[key] += value
+            result[camera_id] = counters
+        return result
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                for camera_id, counters in self.run_once().items():
+                    print(f"[retention] camera {camera_id}: {counters}")
+            except Exception as exc:
+                print(f"[retention] run failed: {exc!r}")
+            self._stop_event.wait(self.interval_seconds)
+
+    def _run_camera(self, camera_id: str, policy: RetentionPolicy, now: datetime) -> Dict[str, int]:
+        counters = _empty_counters()
+        camera_dir = self.recordings_root / camera_id
+        guard = now - timedelta(seconds=self.active_guard_seconds)
+
+        self.index.sync_directory(camera_id, camera_dir, clip_seconds=self.segment_seconds, tz=self.recordings_tz)
+        segments = []
+        for segment in self.index.segments(camera_id):
+            if os.path.exists(segment.path):
+                segments.append(segment)
+            else:
+                self.index.remove_segment(camera_id, segment.path)
+                counters["stale_rows"] += 1
+
+        if policy.max_age_seconds is not None:
+            cutoff = min(guard, now - timedelta(seconds=policy.max_age_seconds))
+            kept = []
+            for segment in segments:
+                if segment.end < cutoff:
+                    counters["freed_bytes"] += self._delete(camera_id, segment)
+                    counters["expired"] += 1
+                else:
+                    kept.append(segment)
+            segments = kept
+
+        if policy.compact_after_seconds is not None:
+            segments = self._compact(camera_id, camera_dir, policy, segments, now, guard, counters)
+
+        sizes = [self._size(segment) for segment in segments]
+        total = sum(sizes)
+        count = len(segments)
+        for segment, size in zip(segments, sizes):
+            over_bytes = policy.max_bytes is not None and total > policy.max_bytes
+            over_count = policy.max_segments is not None and count > policy.max_segments
+            if not (over_bytes or over_count) or segment.end >= guard:
+                break
+            counters["freed_bytes"] += self._delete(camera_id, segment)
+            counters["evicted_bytes" if over_bytes else "evicted_count"] += 1
+            total -= size
+            count -= 1
+
+        counters["segments"] = count
+        counters["bytes"] = total
+        return counters
+
+    def _compact(
+        self,
+        camera_id: str,
+        camera_dir: Path,
+        policy: RetentionPolicy,
+        segments: List[SegmentRecord],
+        now: datetime,
+        guard: datetime,
+        counters: Dict[str, int],
+    ) -> List[SegmentRecord]:
+        span = policy.compact_span_seconds
+        ready_before = min(guard, now - timedelta(seconds=policy.compact_after_seconds)).timestamp()
+        runs: List[List[SegmentRecord]] = []
+        bucket = None
+        for segment in segments:
+            segment_bucket = int(segment.start.timestamp() // span)
+            if (segment_bucket + 1) * span > ready_before:
+                break
+            if (
+                segment_bucket != bucket
+                or (segment.start - runs[-1][-1].end).total_seconds() > policy.max_gap_seconds
+            ):
+                runs.append([])
+                bucket = segment_bucket
+            runs[-1].append(segment)
+
+        replaced: Dict[str, SegmentRecord] = {}
+        for run in runs:
+            if len(run) < 2:
+                continue
+            day_dir = camera_dir / run[0].start.strftime("%Y-%m-%d")
+            day_dir.mkdir(parents=True, exist_ok=True)
+            output = str(day_dir / run[0].start.strftime(COMPACTED_SEGMENT_FORMAT))
+            try:
+                self.compactor([segment.path for segment in run], output)
+                compacted = SegmentRecord(camera_id, output, run[0].start, run[-1].end, os.path.getsize(output))
+            except Exception as exc:
+                counters["compaction_failures"] += 1
+                print(f"[retention] camera {camera_id}: compacting {len(run)} segments into {output} failed: {exc!r}")
+                continue
+            self.index.replace_segments(
+                camera_id, [segment.path for segment in run], compacted, try_read_frame_table(output)
+            )
+            for segment in run:
+                if segment.path != output:
+                    self._unlink(segment.path)
+                replaced[segment.path] = compacted
+            counters["compacted_runs"] += 1
+            counters["compacted_segments"] += len(run)
+
+        result = []
+        for segment in segments:
+            compacted = replaced.get(segment.path)
+            if compacted is None:
+                result.append(segment)
+            elif not result or result[-1] is not compacted:
+                result.append(compacted)
+        return result
+
+    def _delete(self, camera_id: str, segment: SegmentRecord) -> int:
+        # Indexraden först, så att uppslag aldrig pekar på en fil som just försvann.
+        size = self._size(segment)
+        self.index.remove_segment(camera_id, segment.path)
+        self._unlink(segment.path)
+        return size
+
+    def _unlink(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        parent = Path(path).parent
+        if parent.parent.parent == self.recordings_root:
+            # Tom dagkatalog efter radering.
+            try:
+                parent.rmdir()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _size(segment: SegmentRecord) -> int:
+        # Storleken på disk gäller: sync_directory kan ha indexerat en fil som
+        # fortfarande skrevs, och size_bytes uppdateras inte efteråt.
+        try:
+            return os.path.getsize(segment.path)
+        except OSError:
+            return segment.size_bytes or 0
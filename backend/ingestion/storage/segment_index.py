@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import csv
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone, tzinfo
+from pathlib import Path
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from ingestion.storage.frame_table import FrameTable, try_read_frame_table
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parents[2] / "indexes" / "segments.sqlite"
+# Filnamn från record_ffmpeg.start_recording_ffmpeg (lokal tid i namnet).
+FFMPEG_SEGMENT_FORMAT = "D%Y-%m-%d-T%H-%M-%S.mp4"
+# Tidszonen som ffmpeg-filnamnen tolkas i (samma som database.image_from_timestamp).
+RECORDINGS_TZ = ZoneInfo("Europe/Stockholm")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_us(value: datetime) -> int:
+    if value.tzinfo is None:
+        raise ValueError("segment timestamps must be timezone-aware")
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_us(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def ffmpeg_segment_start(file_name: str, tz: tzinfo = RECORDINGS_TZ) -> datetime:
+    """Starttid (UTC) ur ett ffmpeg-segments filnamn. ValueError om namnet inte matchar."""
+    return datetime.strptime(os.path.basename(file_name), FFMPEG_SEGMENT_FORMAT).replace(tzinfo=tz).astimezone(timezone.utc)
+
+
+@dataclass(frozen=True)
+class SegmentRecord:
+    camera_id: str
+    path: str
+    start: datetime
+    end: datetime
+    size_bytes: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class SegmentLocation:
+    segment: SegmentRecord
+    # Sekunder från segmentets första frame (kameratid) till den sökta tidpunkten.
+    offset_seconds: float
+
+    @property
+    def path(self) -> str:
+        return self.segment.path
+
+
+class SegmentIndex:
+    """Index över inspelade segment: kamera, fil och kameratid (UTC) för första/sista frame.
+
+    Lagras i en SQLite-tabell med index på (camera_id, start_us), så att
+    `locate` hittar segmentet för en tidpunkt med en B-trädsökning (O(log n))
+    i stället för att lista och tolka filnamn. Databasen körs i WAL-läge så
+    att inspelningsprocesser kan skriva medan API:t läser.
+
+    Per segment kan även en FrameTable (PTS + nyckelbilder) sparas, så att
+    en bild kan hämtas med exakt sökning utan att tabellen byggs om.
+
+    Parameters:
+        path: SQLite-fil. Default `indexes/segments.sqlite` i backend-katalogen.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path) if path is not None else DEFAULT_INDEX_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # monotonic-tid för senaste sync_after_miss-skanning per kamera.
+        self._last_miss_sync: Dict[str, float] = {}
+        self._conn = sqlite3.connect(str(self.path), timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                camera_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                start_us INTEGER NOT NULL,
+                end_us INTEGER NOT NULL,
+                size_bytes INTEGER,
+                PRIMARY KEY (camera_id, path)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS segments_by_start ON segments (camera_id, start_us)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS frame_tables (
+                camera_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                frame_table BLOB NOT NULL,
+                PRIMARY KEY (camera_id, path)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> SegmentIndex:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def add_segment(
+        self,
+        camera_id: str,
+        path: str,
+        start: datetime,
+        end: datetime,
+        size_bytes: Optional[int] = None,
+        frame_table: Optional[FrameTable] = None,
+    ) -> None:
+        if end < start:
+            raise ValueError("segment end is before its start")
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO segments (camera_id, path, start_us, end_us, size_bytes) VALUES (?, ?, ?, ?, ?)",
+                    (str(camera_id), str(path), _to_us(start), _to_us(end), size_bytes),
+                )
+                self._store_frame_table_locked(camera_id, path, frame_table)
+
+    def remove_segment(self, camera_id: str, path: str) -> None:
+        with self._lock:
+            with self._conn:
+                for table in ("segments", "frame_tables"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE camera_id = ? AND path = ?", (str(camera_id), str(path)))
+
+    def replace_segments(
+        self,
+        camera_id: str,
+        old_paths: List[str],
+        new: SegmentRecord,
+        frame_table: Optional[FrameTable] = None,
+    ) -> None:
+        """Byt flera segment mot ett (kompaktering) i en transaktion, så att uppslag aldrig ser ett hål."""
+        with self._lock:
+            with self._conn:
+                for table in ("segments", "frame_tables"):
+                    self._conn.executemany(
+                        f"DELETE FROM {table} WHERE camera_id = ? AND path = ?",
+                        [(str(camera_id), str(path)) for path in old_paths],
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO segments (camera_id, path, start_us, end_us, size_bytes) VALUES (?, ?, ?, ?, ?)",
+                    (str(camera_id), new.path, _to_us(new.start), _to_us(new.end), new.size_bytes),
+                )
+                self._store_frame_table_locked(camera_id, new.path, frame_table)
+
+    def frame_table(self, camera_id: str, path: str, compute: bool = True) -> Optional[FrameTable]:
+        """FrameTable för ett segment. Saknas den byggs den ur filen (om `compute`) och sparas."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT frame_table FROM frame_tables WHERE camera_id = ? AND path = ?",
+                (str(camera_id), str(path)),
+            ).fetchone()
+        if row is not None:
+            return FrameTable.from_bytes(row[0])
+        if not compute:
+            return None
+        table = try_read_frame_table(path)
+        if table is not None:
+            with self._lock:
+                with self._conn:
+                    self._store_frame_table_locked(camera_id, path, table)
+        return table
+
+    def locate(self, camera_id: str, timestamp: datetime, tolerance_seconds: float = 0.5) -> Optional[SegmentLocation]:
+        """Segmentet som innehåller `timestamp`, eller None (t.ex. i ett glapp mellan segment).
+
+        `tolerance_seconds` täcker att sista registrerade kameratiden ligger upp
+        till en frame före segmentets faktiska slut.
+        """
+        target = _to_us(timestamp)
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT camera_id, path, start_us, end_us, size_bytes FROM segments
+                WHERE camera_id = ? AND start_us <= ?
+                ORDER BY start_us DESC LIMIT 1
+                """,
+                (str(camera_id), target),
+            ).fetchone()
+        if row is None or target > row[3] + int(tolerance_seconds * 1_000_000):
+            return None
+        segment = self._record(row)
+        return SegmentLocation(segment=segment, offset_seconds=(target - row[2]) / 1_000_000)
+
+    def segments(
+        self,
+        camera_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[SegmentRecord]:
+        """Segment för en kamera i tidsordning, valfritt begränsat till de som överlappar [start, end]."""
+        query = "SELECT camera_id, path, start_us, end_us, size_bytes FROM segments WHERE camera_id = ?"
+        params: list = [str(camera_id)]
+        if end is not None:
+            query += " AND start_us <= ?"
+            params.append(_to_us(end))
+        if start is not None:
+            query += " AND end_us >= ?"
+            params.append(_to_us(start))
+        query += " ORDER BY start_us"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._record(row) for row in rows]
+
+    def latest_end(self, camera_id: str) -> Optional[datetime]:
+        """Slutet på kamerans senaste segment, eller None om kameran saknar segment."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT end_us FROM segments WHERE camera_id = ? ORDER BY start_us DESC LIMIT 1",
+                (str(camera_id),),
+            ).fetchone()
+        return _from_us(row[0]) if row is not None else None
+
+    def sync_after_miss(
+        self,
+        camera_id: str,
+        timestamp: datetime,
+        directory: str | Path,
+        clip_seconds: float = 10.0,
+        tz: tzinfo = RECORDINGS_TZ,
+        min_interval_seconds: Optional[float] = None,
+    ) -> int:
+        """Kör `sync_directory` efter en miss i `locate`, men bara när det kan hjälpa.
+
+        Inspelaren indexerar segment när de stängs, så en miss före senaste
+        segmentets slut är ett glapp eller en raderad inspelning och katalogen
+        läses inte. Efter slutet kan ett segment saknas i indexet; då läses
+        katalogen högst en gång per `min_interval_seconds` (default
+        `clip_seconds`, tätare än så kommer inga nya segment) och kamera.
+        Returnerar antal nya rader.
+        """
+        latest = self.latest_end(camera_id)
+        if latest is not None and _to_us(timestamp) <= _to_us(latest):
+            return 0
+        interval = clip_seconds if min_interval_seconds is None else min_interval_seconds
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_miss_sync.get(str(camera_id))
+            if last is not None and now - last < interval:
+                return 0
+            self._last_miss_sync[str(camera_id)] = now
+        return self.sync_directory(camera_id, directory, clip_seconds=clip_seconds, tz=tz)
+
+    def camera_ids(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT camera_id FROM segments ORDER BY camera_id").fetchall()
+        return [row[0] for row in rows]
+
+    def sync_directory(
+        self,
+        camera_id: str,
+        directory: str | Path,
+        clip_seconds: float = 10.0,
+        tz: tzinfo = RECORDINGS_TZ,
+    ) -> int:
+        """Lägg till ffmpeg-segment (`D%Y-%m-%d-T%H-%M-%S.mp4`) som saknas i indexet.
+
+        Starttiden tas ur filnamnet (tolkat i `tz`) och sluttiden är nästa
+        segments start, högst `clip_seconds` senare. Returnerar antal nya rader.
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            return 0
+        starts = []
+        for name in os.listdir(directory):
+            try:
+                start = ffmpeg_segment_start(name, tz)
+            except ValueError:
+                continue
+            starts.append((start, str(directory / name)))
+        starts.sort()
+
+        with self._lock:
+            known = {
+                row[0]
+                for row in self._conn.execute("SELECT path FROM segments WHERE camera_id = ?", (str(camera_id),))
+            }
+            added = 0
+            for i, (start, path) in enumerate(starts):
+                if path in known:
+                    continue
+                end = start + timedelta(seconds=clip_seconds)
+                if i + 1 < len(starts):
+                    end = min(end, starts[i + 1][0])
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO segments (camera_id, path, start_us, end_us, size_bytes) VALUES (?, ?, ?, ?, ?)",
+                    (str(camera_id), path, _to_us(start), _to_us(end), size),
+                )
+                added += 1
+            self._conn.commit()
+        return added
+
+    def import_csv(self, camera_id: str, csv_path: str | Path, recordings_dir: str | Path) -> int:
+        """Importera ett äldre `indexes/index-<kamera>.csv` från GStreamerRecorder."""
+        added = 0
+        with open(csv_path, newline="") as f:
+            for row in csv.DictReader(f):
+                path = Path(row["file_name"])
+                if not path.is_absolute():
+                    path = Path(recordings_dir) / path
+                self.add_segment(
+                    camera_id,
+                    str(path),
+                    datetime.fromisoformat(row["segment_start_camera_time"]),
+                    datetime.fromisoformat(row["segment_end_camera_time"]),
+                    os.path.getsize(path) if path.exists() else None,
+                )
+                added += 1
+        return added
+
+    def _store_frame_table_locked(self, camera_id: str, path: str, frame_table: Optional[FrameTable]) -> None:
+        if frame_table is not None:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO frame_tables (camera_id, path, frame_table) VALUES (?, ?, ?)",
+                (str(camera_id), str(path), frame_table.to_bytes()),
+            )
+
+    @staticmethod
+    def _record(row) -> SegmentRecord:
+        return SegmentRecord(
+            camera_id=row[0],
+            path=row[1],
+            start=_from_us(row[2]),
+            end=_from_us(row[3]),
+            size_bytes=row[4],
+        )
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+CameraFactory = Callable[["CameraConfig", Any], Any]
+ClientFactory = Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class CameraConfig:
+    camera_id: str
+    rtsp_url: str
+    broker_host: str = "127.0.0.1"
+    broker_port: int = 1883
+    segment_seconds: int = 10
+    # Övriga Camera-argument, t.ex. hot_buffer_fps eller analysis_queue_policy.
+    options: Dict[str, Any] = field(default_factory=dict)
+
+
+def load_camera_configs(path: str | Path) -> List[CameraConfig]:
+    """Läs kameralistan från JSON.
+
+    Format::
+
+        {
+          "defaults": {"broker_host": "127.0.0.1", "hot_buffer_fps": 5},
+          "cameras": [
+            {"camera_id": "1", "rtsp_url": "rtsp://127.0.0.1:8554/1"},
+            {"camera_id": "2", "rtsp_url": "rtsp://127.0.0.1:8554/2", "broker_port": 1884}
+          ]
+        }
+
+    Fält som inte hör till CameraConfig hamnar i `options` och skickas vidare till Camera.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"cameras": data}
+    if not isinstance(data, dict) or not isinstance(data.get("cameras"), list):
+        raise ValueError("camera config must contain a 'cameras' list")
+
+    defaults = data.get("defaults") or {}
+    configs: List[CameraConfig] = []
+    seen: set[str] = set()
+    for entry in data["cameras"]:
+        merged = {**defaults, **entry}
+        camera_id = str(merged.pop("camera_id", "") or "")
+        rtsp_url = merged.pop("rtsp_url", None)
+        if not camera_id or not rtsp_url:
+            raise ValueError(f"camera entry needs camera_id and rtsp_url: {entry!r}")
+        if camera_id in seen:
+            raise ValueError(f"duplicate camera_id: {camera_id}")
+        seen.add(camera_id)
+        configs.append(
+            CameraConfig(
+                camera_id=camera_id,
+                rtsp_url=str(rtsp_url),
+                broker_host=str(merged.pop("broker_host", "127.0.0.1")),
+                broker_port=int(merged.pop("broker_port", 1883)),
+                segment_seconds=int(merged.pop("segment_seconds", 10)),
+                options=merged,
+            )
+        )
+    return configs
+
+
+def plan_worker_groups(
+    configs: List[CameraConfig],
+    cameras_per_worker: Optional[int] = None,
+    max_workers: Optional[int] = None,
+) -> List[List[CameraConfig]]:
+    """Dela upp kamerorna på workerprocesser.
+
+    Default är en kamera per process, men aldrig fler processer än `max_workers`
+    (default antal kärnor). Då packas flera kameror i samma process.
+    """
+    if not configs:
+        return []
+    if cameras_per_worker is None:
+        workers = max(1, max_workers or os.cpu_count() or 1)
+        cameras_per_worker = math.ceil(len(configs) / workers)
+    cameras_per_worker = max(1, cameras_per_worker)
+    return [configs[i:i + cameras_per_worker] for i in range(0, len(configs), cameras_per_worker)]
+
+
+def default_camera_factory(config: CameraConfig, analysis_service: Any) -> Any:
+    import imageio_ffmpeg
+
+    from ingestion.camera import Camera
+
+    return Camera(
+        camera_id=config.camera_id,
+        rtsp_url=config.rtsp_url,
+        ffmpeg=imageio_ffmpeg.get_ffmpeg_exe(),
+        broker_host=config.broker_host,
+        broker_port=config.broker_port,
+        segment_seconds=config.segment_seconds,
+        analysis_service=analysis_service,
+        **config.options,
+    )
+
+
+def _camera_stats(camera: Any) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    for key, method in (
+        ("hot_buffer", "hot_buffer_stats"),
+        ("mqtt_buffer", "mqtt_buffer_stats"),
+        ("analysis_queue", "analysis_queue_stats"),
+        ("recording", "recording_stats"),
+    ):
+        fn = getattr(camera, method, None)
+        if fn is None:
+            continue
+        try:
+            stats[key] = fn()
+        except Exception as exc:
+            stats[key] = {"error": repr(exc)}
+    return stats
+
+
+def _worker_main(
+    worker_index: int,
+    configs: List[CameraConfig],
+    stats_queue: Any,
+    stop_event: Any,
+    stats_interval: float,
+    camera_factory: CameraFactory,
+    client_factory: Optional[ClientFactory],
+    analysis_concurrency: int,
+    analysis_cpu_workers: int,
+) -> None:
+    from ingestion.analysis_service import AnalysisService
+
+    prefix = f"[supervisor:worker-{worker_index}]"
+    client = client_factory() if client_factory is not None else None
+    # Kameror i samma process delar loop, CPU-pool och analysclient.
+    service = AnalysisService(
+        client,
+        concurrency=analysis_concurrency,
+        cpu_workers=analysis_cpu_workers,
+        name=f"worker-{worker_index}-analysis",
+    )
+    cameras: List[Any] = []
+    try:
+        for config in configs:
+            cameras.append(camera_factory(config, service))
+            print(f"{prefix} started camera_id={config.camera_id} pid={os.getpid()}")
+
+        while True:
+            for config, camera in zip(configs, cameras):
+                stats_queue.put(
+                    {
+                        "worker": worker_index,
+                        "pid": os.getpid(),
+                        "camera_id": config.camera_id,
+                        "at": time.time(),
+                        **_camera_stats(camera),
+                    }
+                )
+            if stop_event.wait(stats_interval):
+                break
+    finally:
+        for camera in cameras:
+            try:
+                camera.stop_recording()
+            except Exception as exc:
+                print(f"{prefix} stopping camera failed: {exc!r}")
+        service.close()
+
+
+@dataclass
+class _WorkerState:
+    index: int
+    configs: List[CameraConfig]
+    process: Optional[Any] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    consecutive_failures: int = 0
+    next_start_at: float = 0.0
+    last_exitcode: Optional[int] = None
+
+
+class IngestionSupervisor:
+    """Kör kameror i separata workerprocesser och startar om de som kraschar.
+
+    Varje worker kör en eller flera Camera-instanser (se `plan_worker_groups`),
+    så avkodning, JPEG-kodning och rörelseanalys sprids över alla kärnor i stället
+    för att dela en GIL. Workers skickar sin statistik till supervisorn via en kö.
+    `aggregate_stats()` ger senaste värdet per kamera plus summor. När en worker
+    dör tas dess kameror bort tills den nya processen har rapporterat.
+
+    En worker som dör startas om med exponentiell backoff (`restart_backoff_seconds`
+    dubblas per krasch i följd, max `max_restart_backoff_seconds`). Räknaren
+    nollställs när workern har levt i `stable_after_seconds`.
+    """
+
+    def __init__(
+        self,
+        configs: List[CameraConfig],
+        *,
+        cameras_per_worker: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        stats_interval: float = 10.0,
+        camera_factory: CameraFactory = default_camera_factory,
+        client_factory: Optional[ClientFactory] = None,
+        analysis_concurrency: int = 10,
+        analysis_cpu_workers: int = 2,
+        restart_backoff_seconds: float = 1.0,
+        max_restart_backoff_seconds: float = 60.0,
+        stable_after_seconds: float = 60.0,
+        start_method: str = "spawn",
+        monotonic_fn: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ctx = mp.get_context(start_method)
+        self._stats_queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._stats_interval = stats_interval
+        self._camera_factory = camera_factory
+        self._client_factory = client_factory
+        self._analysis_concurrency = analysis_concurrency
+        self._analysis_cpu_workers = analysis_cpu_workers
+        self._restart_backoff_seconds = restart_backoff_seconds
+        self._max_restart_backoff_seconds = max_restart_backoff_seconds
+        self._stable_after_seconds = stable_after_seconds
+        self._monotonic = monotonic_fn
+
+        self._workers = [
+            _WorkerState(index=i, configs=group)
+            for i, group in enumerate(plan_worker_groups(configs, cameras_per_worker, max_workers))
+        ]
+        self._camera_stats: Dict[str, Dict[str, Any]] = {}
+        self._stopping = False
+
+    @property
+    def worker_count(self) -> int:
+        return len(self._workers)
+
+    def start(self) -> None:
+        for worker in self._workers:
+            self._start_worker(worker)
+
+    def poll(self) -> None:
+        """Samla in statistik och starta om döda workers. Anropas periodiskt."""
+        self._drain_stats()
+        if self._stopping:
+            return
+        now = self._monotonic()
+        for worker in self._workers:
+            process = worker.process
+            if process is not None and process.is_alive():
+                if worker.consecutive_failures and now - worker.started_at >= self._stable_after_seconds:
+                    worker.consecutive_failures = 0
+                continue
+
+            if process is not None:
+                # Workern har dött sedan förra poll: planera omstart.
+                process.join(timeout=0)
+                worker.last_exitcode = process.exitcode
+                worker.process = None
+                # Senaste värdena kommer från en död process och ska inte räknas in i summorna.
+                for config in worker.configs:
+                    self._camera_stats.pop(config.camera_id, None)
+                worker.consecutive_failures += 1
+                delay = min(
+                    self._max_restart_backoff_seconds,
+                    self._restart_backoff_seconds * (2 ** (worker.consecutive_failures - 1)),
+                )
+                worker.next_start_at = now + delay
+                ids = ",".join(c.camera_id for c in worker.configs)
+                print(
+                    f"[supervisor] worker-{worker.index} ({ids}) exited with code {worker.last_exitcode}, "
+                    f"restarting in {delay:.1f}s"
+                )
+
+            if now >= worker.next_start_at:
+                worker.restarts += 1
+                self._start_worker(worker)
+
+    def run_forever(self, poll_interval: float = 1.0) -> None:
+        while not self._stopping:
+            self.poll()
+            time.sleep(poll_interval)
+
+    def stop(self, timeout: float = 15.0) -> None:
+        self._stopping = True
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            process = worker.process
+            if process is None:
+                continue
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                print(f"[supervisor] force-stopping worker-{worker.index}")
+                process.terminate()
+                process.join(timeout=5.0)
+        self._drain_stats()
+
+    def aggregate_stats(self) -> Dict[str, Any]:
+        self._drain_stats()
+        totals = {
+            "hot_buffer_frames": 0,
+            "hot_buffer_bytes": 0,
+            "mqtt_events": 0,
+            "mqtt_bytes": 0,
+            "analysis_queued": 0,
+            "analysis_dropped": 0,
+            "analysis_processed": 0,
+            "recorder_restarts": 0,
+            "recording_gaps": 0,
+        }
+        for snapshot in self._camera_stats.values():
+            hot = snapshot.get("hot_buffer") or {}
+            mqtt = snapshot.get("mqtt_buffer") or {}
+            analysis = snapshot.get("analysis_queue") or {}
+            recording = snapshot.get("recording") or {}
+            totals["hot_buffer_frames"] += int(hot.get("frames", 0))
+            totals["hot_buffer_bytes"] += int(hot.get("bytes", 0))
+            totals["mqtt_events"] += int(mqtt.get("events", 0))
+            totals["mqtt_bytes"] += int(mqtt.get("bytes", 0))
+            totals["analysis_queued"] += int(analysis.get("queued", 0))
+            totals["analysis_dropped"] += int(analysis.get("dropped", 0))
+            totals["analysis_processed"] += int(analysis.get("processed", 0))
+            totals["recorder_restarts"] += int(recording.get("restarts", 0))
+            totals["recording_gaps"] += int(recording.get("gaps", 0))
+
+        return {
+            "workers": len(self._workers),
+            "workers_alive": sum(1 for w in self._workers if w.process is not None and w.process.is_alive()),
+            "restarts": sum(w.restarts for w in self._workers),
+            "cameras": dict(self._camera_stats),
+            "totals": totals,
+        }
+
+    def _start_worker(self, worker: _WorkerState) -> None:
+        process = self._ctx.Process(
+            target=_worker_main,
+            name=f"ingestion-worker-{worker.index}",
+            args=(
+                worker.index,
+                worker.configs,
+                self._stats_queue,
+                self._stop_event,
+                self._stats_interval,
+                self._camera_factory,
+                self._client_factory,
+                self._analysis_concurrency,
+                self._analysis_cpu_workers,
+            ),
+            daemon=True,
+        )
+        process.start()
+        worker.process = process
+        worker.started_at = self._monotonic()
+
+    def _drain_stats(self) -> None:
+        while True:
+            try:
+                snapshot = self._stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            # Kan ligga kvar i kön från en process som redan dött eller startats om.
+            process = self._workers[snapshot["worker"]].process
+            if process is None or process.pid != snapshot["pid"]:
+                continue
+            self._camera_stats[snapshot["camera_id"]] = snapshot
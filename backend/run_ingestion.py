@@ -18,7 +18,7 @@ import time
 
 import imageio_ffmpeg
 
-from ingestion.camera import Camera
+from ingestion.camera import VIDEO_PIPELINES, Camera
 
 
 class StubAnalysisClient:
@@ -56,7 +56,19 @@ def _build_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument("--stub-analysis", action="store_true", help="Use local stub analysis client.")
     parser.add_argument("--no-analysis", action="store_true", help="Disable analysis entirely.")
+    parser.add_argument(
+        "--response-cache",
+        help="JSON file for the perceptual-hash LLM response cache. Enables the cache.",
+    )
+    parser.add_argument("--response-cache-threshold", type=int, default=6, help="Max dHash Hamming distance per image.")
+    parser.add_argument("--response-cache-ttl", type=float, default=300.0, help="Seconds a cached response stays valid.")
     parser.add_argument("--no-mqtt", action="store_true", help="Disable MQTT and only run RTSP + recording + hotbuffer.")
+    parser.add_argument(
+        "--video-pipeline",
+        choices=VIDEO_PIPELINES,
+        default="ffmpeg",
+        help="ffmpeg recorder + OpenCV reader, or one GStreamer pipeline sharing the RTSP stream.",
+    )
     return parser
 
 
@@ -79,6 +91,18 @@ def main() -> int:
             print("[ingestion-runner] no API key found, falling back to StubAnalysisClient")
             analysis_client = StubAnalysisClient()
 
+    if analysis_client is not None and args.response_cache:
+        from analysis.response_cache import CachedLLMClient, PerceptualResponseCache
+
+        analysis_client = CachedLLMClient(
+            analysis_client,
+            PerceptualResponseCache(
+                threshold=args.response_cache_threshold,
+                ttl_seconds=args.response_cache_ttl,
+                path=args.response_cache,
+            ),
+        )
+
     ffmpeg_path = imageio_ffmpeg.get_ffmpeg_exe()
     camera_class = NoMqttCamera if args.no_mqtt else Camera
 
@@ -90,6 +114,7 @@ def main() -> int:
         broker_port=args.broker_port,
         analysis_client=analysis_client,
         segment_seconds=args.segment_seconds,
+        video_pipeline=args.video_pipeline,
     )
 
     print(f"[ingestion-runner] started for camera_id={args.camera_id}")
@@ -109,11 +134,19 @@ def main() -> int:
             time.sleep(args.stats_interval)
             print("[ingestion-runner] Hot buffer stats:", camera.hot_buffer_stats())
             print("[ingestion-runner] MQTT buffer stats:", camera.mqtt_buffer_stats())
+            print("[ingestion-runner] Analysis queue stats:", camera.analysis_queue_stats())
+            print("[ingestion-runner] Recording stats:", camera.recording_stats())
+            if hasattr(analysis_client, "stats"):
+                print("[ingestion-runner] LLM client stats:", analysis_client.stats())
+            if hasattr(analysis_client, "cache"):
+                print("[ingestion-runner] Response cache stats:", analysis_client.cache.stats())
     except KeyboardInterrupt:
         print("[ingestion-runner] stopping...")
         return 0
     finally:
         camera.stop_recording()
+        if hasattr(analysis_client, "cache"):
+            analysis_client.cache.save()
 
 
 if __name__ == "__main__":
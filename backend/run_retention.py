@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Retention för inspelningarna från GR8/backend, bredvid run_ingestion.py/run_supervisor.py:
+# python run_retention.py --cameras 1 2 --max-gb 50 --max-age-hours 72 --compact-after-hours 2
+# python run_retention.py --config ingestion/cameras.example.json --max-gb 20 --once
+
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import imageio_ffmpeg
+
+from ingestion.storage.retention import RecordingRetention, RetentionPolicy, ffmpeg_concat
+from ingestion.supervisor import load_camera_configs
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Enforce per-camera retention budgets on recordings/<camera>/.")
+    cameras = parser.add_mutually_exclusive_group(required=True)
+    cameras.add_argument("--cameras", nargs="+", help="Camera ids.")
+    cameras.add_argument("--config", help="Camera list JSON (same format as run_supervisor.py).")
+    parser.add_argument("--max-gb", type=float, help="Byte budget per camera.")
+    parser.add_argument("--max-age-hours", type=float, help="Delete segments older than this.")
+    parser.add_argument("--max-segments", type=int, help="Max segment files per camera.")
+    parser.add_argument("--compact-after-hours", type=float, help="Merge finished spans older than this into one file.")
+    parser.add_argument("--compact-span-minutes", type=float, default=60.0, help="Length of a compacted file.")
+    parser.add_argument("--segment-seconds", type=float, default=10.0, help="Recorder segment length.")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between runs.")
+    parser.add_argument("--once", action="store_true", help="Run once and exit.")
+    return parser
+
+
+def main() -> int:
+    args = _build_parser().parse_args()
+    camera_ids = args.cameras or [config.camera_id for config in load_camera_configs(args.config)]
+
+    policy = RetentionPolicy(
+        max_bytes=int(args.max_gb * 1024**3) if args.max_gb is not None else None,
+        max_age_seconds=args.max_age_hours * 3600 if args.max_age_hours is not None else None,
+        max_segments=args.max_segments,
+        compact_after_seconds=args.compact_after_hours * 3600 if args.compact_after_hours is not None else None,
+        compact_span_seconds=args.compact_span_minutes * 60,
+    )
+    compactor = ffmpeg_concat(imageio_ffmpeg.get_ffmpeg_exe()) if policy.compact_after_seconds is not None else None
+    retention = RecordingRetention(
+        {camera_id: policy for camera_id in camera_ids},
+        compactor=compactor,
+        interval_seconds=args.interval,
+        segment_seconds=args.segment_seconds,
+    )
+
+    if args.once:
+        for camera_id, counters in retention.run_once().items():
+            print(f"[retention] camera {camera_id}: {counters}")
+        return 0
+
+    retention.start()
+    print(f"[retention] running for cameras {', '.join(camera_ids)} every {args.interval:g}s")
+    print("[retention] press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        print("[retention] stopping...")
+        return 0
+    finally:
+        retention.stop()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
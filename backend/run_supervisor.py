@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Starta flera kameror från GR8/backend, en workerprocess per kamera:
+# source .venv/bin/activate
+# export FACADE_API_KEY='din_nyckel'
+# python run_supervisor.py --config ingestion/cameras.example.json
+
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import time
+
+from ingestion.supervisor import IngestionSupervisor, load_camera_configs
+
+
+def build_llm_client(endpoint: str, api_key: str, model: str):
+    from analysis.async_prisma import LLMClient
+
+    return LLMClient(endpoint, api_key, model)
+
+
+def build_stub_client():
+    from run_ingestion import StubAnalysisClient
+
+    return StubAnalysisClient()
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Start ingestion for several cameras in supervised worker processes.")
+    parser.add_argument("--config", required=True, help="JSON file with the camera list.")
+    parser.add_argument("--cameras-per-worker", type=int, help="Cameras per worker process. Default: spread over --max-workers.")
+    parser.add_argument("--max-workers", type=int, help="Max worker processes. Defaults to the number of CPU cores.")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="How often stats are printed.")
+    parser.add_argument("--analysis-concurrency", type=int, default=10, help="Concurrent analyses per worker process.")
+    parser.add_argument("--api-key", help="API key for real analysis. Falls back to FACADE_API_KEY env var.")
+    parser.add_argument("--model", default="prisma_gemini_pro", help="LLM model name.")
+    parser.add_argument(
+        "--endpoint",
+        default="https://api.ai.auth.axis.cloud/v1/chat/completions",
+        help="LLM endpoint.",
+    )
+    parser.add_argument("--stub-analysis", action="store_true", help="Use local stub analysis client.")
+    parser.add_argument("--no-analysis", action="store_true", help="Disable analysis entirely.")
+    return parser
+
+
+def main() -> int:
+    parser = _build_parser()
+    args = parser.parse_args()
+
+    # Klienten skapas i varje workerprocess; här skickas bara en fabrik dit.
+    client_factory = None
+    if args.no_analysis:
+        client_factory = None
+    elif args.stub_analysis:
+        client_factory = build_stub_client
+    else:
+        api_key = args.api_key or os.environ.get("FACADE_API_KEY")
+        if api_key:
+            client_factory = functools.partial(build_llm_client, args.endpoint, api_key, args.model)
+        else:
+            print("[supervisor] no API key found, falling back to StubAnalysisClient")
+            client_factory = build_stub_client
+
+    configs = load_camera_configs(args.config)
+    supervisor = IngestionSupervisor(
+        configs,
+        cameras_per_worker=args.cameras_per_worker,
+        max_workers=args.max_workers,
+        stats_interval=args.stats_interval,
+        client_factory=client_factory,
+        analysis_concurrency=args.analysis_concurrency,
+    )
+    supervisor.start()
+    print(f"[supervisor] started {len(configs)} cameras in {supervisor.worker_count} worker processes")
+    print("[supervisor] press Ctrl+C to stop")
+
+    try:
+        next_stats_at = time.monotonic() + args.stats_interval
+        while True:
+            time.sleep(1.0)
+            supervisor.poll()
+            if time.monotonic() >= next_stats_at:
+                next_stats_at += args.stats_interval
+                stats = supervisor.aggregate_stats()
+                print(
+                    f"[supervisor] workers={stats['workers_alive']}/{stats['workers']} "
+                    f"restarts={stats['restarts']} totals={stats['totals']}"
+                )
+                for camera_id, snapshot in sorted(stats["cameras"].items()):
+                    print(
+                        f"[supervisor] camera {camera_id}: hot_buffer={snapshot.get('hot_buffer')} "
+                        f"mqtt_buffer={snapshot.get('mqtt_buffer')} recording={snapshot.get('recording')}"
+                    )
+    except KeyboardInterrupt:
+        print("[supervisor] stopping...")
+        return 0
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
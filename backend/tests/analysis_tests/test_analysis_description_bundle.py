@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+"""
+Combined (one-request) description tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att de fyra beskrivningarna per event kan hämtas i ett anrop utan att skicka samma bild flera gånger.
+
+Vad testet verifierar:
+- Bilder som delas mellan grupper skickas en gång och grupperna refererar till bildnummer.
+- JSON-schemat kräver en beskrivning per grupp.
+- Svaret packas upp till samma form som query_description_open ger per grupp.
+- Saknade grupper i svaret ger ValueError.
+
+Förutsättningar:
+- httpx (MockTransport, inget nätverk).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/analysis_tests/test_analysis_description_bundle.py -v
+"""
+
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from analysis.async_prisma import LLMClient
+
+GROUPS = {
+    "snapshot": ["snap"],
+    "full_frame": ["full"],
+    "selection_1": ["full", "a", "b"],
+    "selection_2": ["full", "b"],
+}
+
+
+class DescriptionBundleTests(unittest.TestCase):
+    def test_body_deduplicates_images_and_lists_groups(self) -> None:
+        body, unique = LLMClient.build_description_bundle_body("model", GROUPS)
+        content = body["messages"][0]["content"]
+        urls = [part["image_url"]["url"] for part in content if part["type"] == "image_url"]
+
+        self.assertEqual(unique, 4)
+        self.assertEqual(urls, [f"data:image/jpeg;base64,{image}" for image in ("snap", "full", "a", "b")])
+        self.assertIn("- selection_1: a sequence, images 2, 3, 4", content[0]["text"])
+        self.assertIn("- selection_2: a sequence, images 2, 4", content[0]["text"])
+        schema = body["response_format"]["json_schema"]["schema"]
+        self.assertEqual(schema["required"], list(GROUPS))
+
+    def test_query_returns_one_description_per_group(self) -> None:
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            answer = {name: f"{name} text" for name in GROUPS}
+            return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(answer)}}]})
+
+        async def run():
+            llm = LLMClient("http://llm.test/v1/chat/completions", "key", "model")
+            llm.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                return await llm.query_description_bundle(GROUPS)
+            finally:
+                await llm.close()
+
+        result = asyncio.run(run())
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(result["selection_2"], {"description": "selection_2 text"})
+        self.assertEqual(set(result), set(GROUPS))
+
+    def test_missing_group_in_response_raises(self) -> None:
+        def handler(request: httpx.Request) -> httpx.Response:
+            content = json.dumps({"snapshot": "only one"})
+            return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+        async def run():
+            llm = LLMClient("http://llm.test/v1/chat/completions", "key", "model")
+            llm.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                await llm.query_description_bundle(GROUPS)
+            finally:
+                await llm.close()
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+    def test_empty_group_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            LLMClient.build_description_bundle_body("model", {"snapshot": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
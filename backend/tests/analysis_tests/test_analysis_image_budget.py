@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+"""
+Image budget tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att bilder skalas ned och kodas om innan de skickas till LLM:en.
+
+Vad testet verifierar:
+- Bilder större än max_pixels skalas ned med bibehållet bildförhållande.
+- WebP-läget ger WebP-bilder och rätt MIME-typ.
+- max_total_bytes hålls genom lägre kvalitet/upplösning och i sista hand färre bilder (första och sista behålls).
+- Kan en bild inte avkodas skickas originalen med sin egen MIME-typ, inte budgetformatets.
+
+Förutsättningar:
+- opencv-python och numpy.
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/analysis_tests/test_analysis_image_budget.py -v
+"""
+
+import base64
+import unittest
+
+try:
+    import cv2
+    import numpy as np
+
+    from analysis.image_budget import ImageBudget, ImageBudgetEncoder, _evenly_spaced, fit_image
+
+    HAVE_CV2 = hasattr(cv2, "imencode")
+except ImportError:  # pragma: no cover - optional in thin test envs
+    HAVE_CV2 = False
+
+
+def _jpeg(width: int, height: int, seed: int = 0, quality: int = 95) -> bytes:
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return encoded.tobytes()
+
+
+def _size(image_bytes: bytes) -> tuple[int, int]:
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return image.shape[1], image.shape[0]
+
+
+@unittest.skipUnless(HAVE_CV2, "opencv-python is required")
+class ImageBudgetTests(unittest.TestCase):
+    def test_fit_image_downscales_to_max_pixels(self) -> None:
+        fitted = fit_image(_jpeg(960, 540), max_pixels=480 * 270, quality=70)
+        width, height = _size(fitted)
+        self.assertLessEqual(width * height, 480 * 270)
+        self.assertAlmostEqual(width / height, 960 / 540, places=1)
+
+    def test_webp_output_and_mime_type(self) -> None:
+        encoder = ImageBudgetEncoder(ImageBudget(max_pixels=320 * 180, image_format="webp"))
+        self.addCleanup(encoder.close)
+        images, mime = encoder.encode([base64.b64encode(_jpeg(640, 360)).decode("ascii")])
+
+        self.assertEqual(mime, "image/webp")
+        raw = base64.b64decode(images[0])
+        self.assertEqual(raw[:4], b"RIFF")
+        self.assertEqual(raw[8:12], b"WEBP")
+
+    def test_total_byte_budget_drops_images_as_last_resort(self) -> None:
+        images = [_jpeg(640, 360, seed=i) for i in range(6)]
+        encoder = ImageBudgetEncoder(ImageBudget(max_pixels=640 * 360, max_total_bytes=8_000, min_quality=30))
+        self.addCleanup(encoder.close)
+        fitted = encoder.fit(images)
+
+        self.assertLessEqual(sum(len(image) for image in fitted), 8_000)
+        self.assertTrue(1 <= len(fitted) < 6)
+        stats = encoder.stats()
+        self.assertEqual(stats["images_in"], 6)
+        self.assertEqual(stats["images_out"], len(fitted))
+        self.assertLess(stats["bytes_out"], stats["bytes_in"])
+
+    def test_dropping_keeps_first_and_last_image(self) -> None:
+        self.assertEqual(_evenly_spaced(list(range(6)), 3), [0, 2, 5])
+        self.assertEqual(_evenly_spaced(list(range(6)), 6), [0, 1, 2, 4, 5])
+
+    def test_budget_without_byte_limit_keeps_all_images(self) -> None:
+        images = [_jpeg(320, 180, seed=i) for i in range(4)]
+        encoder = ImageBudgetEncoder(ImageBudget())
+        self.addCleanup(encoder.close)
+        self.assertEqual(len(encoder.fit(images)), 4)
+
+    def test_undecodable_image_keeps_originals_and_mime(self) -> None:
+        encoder = ImageBudgetEncoder(ImageBudget(image_format="webp"))
+        self.addCleanup(encoder.close)
+        images_b64 = [base64.b64encode(_jpeg(640, 360)).decode("ascii"), base64.b64encode(b"not an image").decode("ascii")]
+
+        images, mime = encoder.encode(images_b64)
+
+        self.assertEqual(mime, "image/jpeg")
+        self.assertEqual(images, images_b64)
+        self.assertIsNone(fit_image(b"not an image", max_pixels=None, quality=70, image_format="webp"))
+
+    def test_invalid_format_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            ImageBudget(image_format="png")
+
+
+if __name__ == "__main__":
+    unittest.main()
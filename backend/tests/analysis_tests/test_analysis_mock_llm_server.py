@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+"""
+Mock LLM server tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Integrationstest (LLMClient mot lokal HTTP-server)
+
+Varför testet finns:
+- Lasttestet av analysvägen (benchmarks/analysis_load_benchmark.py) bygger på att mock-servern beter sig som ett
+  chat-completions-API, inklusive fel och rate limits som LLMClient ska hantera.
+
+Vad testet verifierar:
+- Svaren följer request-bodyns JSON-schema och kan tolkas av LLMClient.
+- --error-rate 1.0 ger 500 som LLMClient rapporterar som RuntimeError.
+- Rate limit ger 429 med Retry-After och LLMClient lyckas efter retry.
+- Fler samtidiga requests än max_concurrent ger 503.
+
+Förutsättningar:
+- httpx. Servern lyssnar på en ledig port på 127.0.0.1.
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/analysis_tests/test_analysis_mock_llm_server.py -v
+"""
+
+import asyncio
+import unittest
+
+from analysis.async_prisma import LLMClient
+from benchmarks.mock_llm_server import MockLLMConfig, MockLLMServer
+
+
+def _config(**overrides) -> MockLLMConfig:
+    return MockLLMConfig(**{"latency_ms": 0.0, "per_image_ms": 0.0, "latency_distribution": "fixed", **overrides})
+
+
+class MockLLMServerTests(unittest.TestCase):
+    def _start(self, **overrides) -> MockLLMServer:
+        server = MockLLMServer(_config(**overrides))
+        server.start()
+        self.addCleanup(server.stop)
+        return server
+
+    def _client(self, server: MockLLMServer) -> LLMClient:
+        return LLMClient(server.endpoint, "key", "model", retry_backoff_seconds=0.01)
+
+    def test_answers_follow_requested_schema(self) -> None:
+        server = self._start()
+
+        async def run():
+            llm = self._client(server)
+            try:
+                return await asyncio.gather(
+                    llm.query_description_open(["aW1hZ2U=", "aW1hZ2U="]),
+                    llm.query_description_closed("aW1hZ2U=", ["person", "car"]),
+                )
+            finally:
+                await llm.close()
+
+        description, keywords = asyncio.run(run())
+        self.assertEqual(description, {"description": "mock description"})
+        self.assertEqual(keywords, {"keywords": ["person"]})
+        stats = server.stats()
+        self.assertEqual((stats["requests"], stats["ok"], stats["images"]), (2, 2, 3))
+
+    def test_error_rate_returns_server_errors(self) -> None:
+        server = self._start(error_rate=1.0)
+
+        async def run():
+            llm = self._client(server)
+            try:
+                await llm.query_description_open(["aW1hZ2U="])
+            finally:
+                await llm.close()
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+        self.assertEqual(server.stats()["errors"], 1)
+
+    def test_rate_limit_is_retried_by_client(self) -> None:
+        server = self._start(rate_limit_rps=20.0, rate_limit_burst=1)
+
+        async def run():
+            llm = self._client(server)
+            try:
+                for _ in range(3):
+                    await llm.query_description_open(["aW1hZ2U="])
+                return llm.stats()
+            finally:
+                await llm.close()
+
+        client_stats = asyncio.run(run())
+        self.assertGreaterEqual(server.stats()["rate_limited"], 1)
+        self.assertEqual(server.stats()["ok"], 3)
+        self.assertGreaterEqual(client_stats["throttled"], 1)
+
+    def test_max_concurrent_returns_503(self) -> None:
+        server = self._start(latency_ms=100.0, max_concurrent=1)
+
+        async def run():
+            llm = self._client(server)
+            llm.max_retries = 0
+            try:
+                return await asyncio.gather(
+                    *(llm.query_description_open(["aW1hZ2U="]) for _ in range(3)),
+                    return_exceptions=True,
+                )
+            finally:
+                await llm.close()
+
+        results = asyncio.run(run())
+        self.assertTrue(any(isinstance(result, RuntimeError) for result in results))
+        self.assertGreaterEqual(server.stats()["overloaded"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+"""
+LLM client flow-control tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att LLMClient backar vid 429/503 i stället för att skapa felstormar.
+
+Vad testet verifierar:
+- 429/503 försöks igen och sänker den adaptiva samtidighetsgränsen (AIMD).
+- Andra felstatusar försöks inte igen.
+- Lyckade anrop höjer gränsen additivt.
+- Token bucket väntar när burst är slut.
+
+Förutsättningar:
+- httpx (MockTransport, inget nätverk).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/analysis_tests/test_analysis_rate_limit.py -v
+"""
+
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from analysis.async_prisma import LLMClient
+from analysis.rate_limit import AdaptiveConcurrencyLimiter, TokenBucket
+
+
+def _ok_response() -> httpx.Response:
+    content = json.dumps({"description": "ok"})
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def _client_with(handler, **kwargs) -> LLMClient:
+    llm = LLMClient("http://llm.test/v1/chat/completions", "key", "model", retry_backoff_seconds=0.0, **kwargs)
+    llm.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return llm
+
+
+class LLMClientRetryTests(unittest.TestCase):
+    def test_throttled_requests_are_retried_and_lower_concurrency(self) -> None:
+        statuses = [429, 503, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            status = statuses.pop(0)
+            return _ok_response() if status == 200 else httpx.Response(status, headers={"Retry-After": "0"})
+
+        async def run():
+            llm = _client_with(handler, initial_concurrency=8)
+            llm.concurrency.cooldown_seconds = 0.0
+            result = await llm.query_description_open(["aW1n"])
+            await llm.close()
+            return result, llm.stats()
+
+        result, stats = asyncio.run(run())
+        self.assertEqual(result, {"description": "ok"})
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["throttled"], 2)
+        self.assertEqual(stats["succeeded"], 1)
+        self.assertEqual(stats["concurrency_limit"], 2)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_gives_up_after_max_retries(self) -> None:
+        async def run():
+            llm = _client_with(lambda request: httpx.Response(429), max_retries=2)
+            try:
+                with self.assertRaises(RuntimeError):
+                    await llm.query_description_open(["aW1n"])
+            finally:
+                await llm.close()
+            return llm.stats()
+
+        stats = asyncio.run(run())
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["failed"], 1)
+
+    def test_client_errors_are_not_retried(self) -> None:
+        async def run():
+            llm = _client_with(lambda request: httpx.Response(400, text="bad request"))
+            try:
+                with self.assertRaises(RuntimeError):
+                    await llm.query_description_open(["aW1n"])
+            finally:
+                await llm.close()
+            return llm.stats()
+
+        stats = asyncio.run(run())
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["retries"], 0)
+
+
+class FlowControlPrimitiveTests(unittest.TestCase):
+    def test_aimd_increases_additively_and_caps_concurrency(self) -> None:
+        async def run():
+            limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=3)
+            limiter.on_success()
+            limiter.on_success()
+            self.assertEqual(limiter.limit, 2)  # +1/limit per success: 2.5, 2.9
+            limiter.on_success()
+            self.assertEqual(limiter.limit, 3)
+
+            active = 0
+            peak = 0
+
+            async def worker():
+                nonlocal active, peak
+                async with limiter:
+                    active += 1
+                    peak = max(peak, active)
+                    await asyncio.sleep(0.01)
+                    active -= 1
+
+            await asyncio.gather(*(worker() for _ in range(10)))
+            return peak
+
+        self.assertEqual(asyncio.run(run()), 3)
+
+    def test_token_bucket_waits_when_burst_is_spent(self) -> None:
+        async def run():
+            bucket = TokenBucket(rate=100.0, burst=2)
+            waits = [await bucket.acquire() for _ in range(3)]
+            return waits, bucket.waits
+
+        waits, count = asyncio.run(run())
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertGreater(waits[2], 0.0)
+        self.assertEqual(count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+"""
+Perceptual response cache tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att nästan identiska bilder (statisk scen) får ett cachat svar i stället för ett nytt LLM-anrop.
+
+Vad testet verifierar:
+- dHash ger litet avstånd för lätt brusiga kopior och stort för olika bilder.
+- CachedLLMClient svarar från cachen vid träff och anropar klienten vid miss, även för bundle-anrop (combined).
+- Poster går ut efter TTL och cachen kan sparas till och läsas från disk.
+- CachedLLMClient sparar cachefilen i executorn, inte på event-loopen.
+
+Förutsättningar:
+- opencv-python och numpy.
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/analysis_tests/test_analysis_response_cache.py -v
+"""
+
+import asyncio
+import base64
+import os
+import tempfile
+import threading
+import unittest
+
+try:
+    import cv2
+    import numpy as np
+
+    from analysis.response_cache import CachedLLMClient, PerceptualResponseCache, dhash
+
+    HAVE_CV2 = hasattr(cv2, "imencode")
+except ImportError:  # pragma: no cover - optional in thin test envs
+    HAVE_CV2 = False
+
+
+def _scene(seed: int, noise: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    # Mjuk gradient + block så att hashen har struktur, plus valfritt sensorbrus.
+    image = np.tile(np.linspace(0, 255, 320, dtype=np.float32), (180, 1))
+    for _ in range(4):
+        x, y = rng.integers(0, 280), rng.integers(0, 140)
+        image[y:y + 40, x:x + 40] = rng.integers(0, 255)
+    if noise:
+        image = image + np.random.default_rng(seed + 1000).normal(0, noise, image.shape)
+    gray = np.clip(image, 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode(".jpg", cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    assert ok
+    return encoded.tobytes()
+
+
+def _b64(image: bytes) -> str:
+    return base64.b64encode(image).decode("ascii")
+
+
+class _CountingClient:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def query_description_open(self, base64images, image_mime="image/jpeg"):
+        self.calls += 1
+        return {"description": f"call {self.calls}"}
+
+    async def query_description_bundle(self, groups, image_mime="image/jpeg"):
+        self.calls += 1
+        return {name: {"description": f"call {self.calls}"} for name in groups}
+
+
+@unittest.skipUnless(HAVE_CV2, "opencv-python is required")
+class PerceptualResponseCacheTests(unittest.TestCase):
+    def test_dhash_distance_small_for_noisy_copy(self) -> None:
+        base = dhash(_scene(1))
+        noisy = dhash(_scene(1, noise=3))
+        other = dhash(_scene(2))
+        self.assertLessEqual((base ^ noisy).bit_count(), 6)
+        self.assertGreater((base ^ other).bit_count(), 6)
+
+    def test_cached_client_serves_similar_images_from_cache(self) -> None:
+        client = _CountingClient()
+        cached = CachedLLMClient(client, PerceptualResponseCache(threshold=6))
+
+        async def run():
+            first = await cached.query_description_open([_b64(_scene(1))])
+            again = await cached.query_description_open([_b64(_scene(1, noise=3))])
+            other = await cached.query_description_open([_b64(_scene(2))])
+            return first, again, other
+
+        first, again, other = asyncio.run(run())
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(cached.cache.stats()["hits"], 1)
+
+    def test_cached_client_caches_bundles(self) -> None:
+        client = _CountingClient()
+        cached = CachedLLMClient(client, PerceptualResponseCache(threshold=6))
+        scene, noisy, other = _b64(_scene(1)), _b64(_scene(1, noise=3)), _b64(_scene(2))
+
+        async def run():
+            first = await cached.query_description_bundle({"full_frame": [scene], "selection_1": [scene, other]})
+            again = await cached.query_description_bundle({"full_frame": [noisy], "selection_1": [noisy, other]})
+            regrouped = await cached.query_description_bundle({"full_frame": [scene, other], "selection_1": [scene]})
+            return first, again, regrouped
+
+        first, again, regrouped = asyncio.run(run())
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, regrouped)
+        self.assertEqual(client.calls, 2)
+
+    def test_entries_expire_after_ttl(self) -> None:
+        now = [1000.0]
+        cache = PerceptualResponseCache(ttl_seconds=10, time_fn=lambda: now[0])
+        cache.put("description_open", [0b1010], {"description": "x"})
+        self.assertIsNotNone(cache.get("description_open", [0b1011]))
+        now[0] += 11
+        self.assertIsNone(cache.get("description_open", [0b1010]))
+        self.assertEqual(cache.stats()["expired"], 1)
+
+    def test_persists_to_disk(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = PerceptualResponseCache(path=path, persist_every=1)
+            cache.put("description_open", [12345], {"description": "saved"})
+
+            reloaded = PerceptualResponseCache(path=path)
+            self.assertEqual(reloaded.get("description_open", [12345]), {"description": "saved"})
+            self.assertIsNone(reloaded.get("description_closed", [12345]))
+
+    def test_cached_client_saves_in_executor(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.json")
+            cache = PerceptualResponseCache(path=path, persist_every=1)
+            save_threads = []
+            original_save = cache.save
+
+            def _save():
+                save_threads.append(threading.current_thread())
+                original_save()
+
+            cache.save = _save
+            cached = CachedLLMClient(_CountingClient(), cache)
+
+            async def run():
+                await cached.query_description_open([_b64(_scene(1))])
+                return threading.current_thread()
+
+            loop_thread = asyncio.run(run())
+            self.assertEqual(len(save_threads), 1)
+            self.assertIsNot(save_threads[0], loop_thread)
+            self.assertTrue(os.path.exists(path))
+            self.assertTrue(cache.put("description_open", [1], {"description": "later"}, save=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
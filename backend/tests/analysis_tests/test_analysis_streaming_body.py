@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+"""
+Streaming request body tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att en strömmad body är exakt samma JSON som den vanliga, så att streaming_upload inte ändrar vad servern ser.
+
+Vad testet verifierar:
+- StreamingJsonBody ger samma JSON som json.dumps och rätt content_length.
+- Råa bytes base64-kodas i bitar och ger samma resultat som base64-strängar.
+- En saknad placeholder ger ValueError.
+- LLMClient med streaming_upload=True skickar samma JSON med Content-Length, även vid retry.
+
+Förutsättningar:
+- httpx (MockTransport, inget nätverk).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/analysis_tests/test_analysis_streaming_body.py -v
+"""
+
+import asyncio
+import base64
+import json
+import os
+import unittest
+
+import httpx
+
+from analysis.async_prisma import LLMClient
+from analysis.streaming_body import RAW_CHUNK_BYTES, StreamingJsonBody, image_placeholder
+
+
+def _body(urls):
+    return {"messages": [{"content": [{"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{u}"}} for u in urls]}]}
+
+
+class StreamingJsonBodyTests(unittest.TestCase):
+    def test_streamed_body_matches_plain_json(self) -> None:
+        raw = [os.urandom(RAW_CHUNK_BYTES * 2 + 5), os.urandom(10)]
+        b64 = [base64.b64encode(image).decode("ascii") for image in raw]
+        template = _body([image_placeholder(i) for i in range(2)])
+
+        from_strings = StreamingJsonBody(template, b64)
+        from_bytes = StreamingJsonBody(template, raw)
+
+        self.assertEqual(json.loads(from_strings.to_bytes()), _body(b64))
+        self.assertEqual(from_bytes.to_bytes(), from_strings.to_bytes())
+        self.assertEqual(from_bytes.content_length, len(from_bytes.to_bytes()))
+        self.assertGreater(len(list(from_bytes.iter_chunks())), 4)
+
+    def test_missing_placeholder_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            StreamingJsonBody(_body([image_placeholder(0)]), ["a", "b"])
+
+
+class StreamingUploadClientTests(unittest.TestCase):
+    def _run(self, handler, images):
+        async def run():
+            llm = LLMClient("http://llm.test/v1/chat/completions", "key", "model", streaming_upload=True, retry_backoff_seconds=0.0)
+            llm.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                return await llm.query_description_open(images)
+            finally:
+                await llm.close()
+
+        return asyncio.run(run())
+
+    def test_client_sends_same_json_with_content_length(self) -> None:
+        raw = os.urandom(1000)
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append((request.headers, request.read()))
+            answer = {"description": "ok"}
+            return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps(answer)}}]})
+
+        result = self._run(handler, [raw, base64.b64encode(raw).decode("ascii")])
+
+        self.assertEqual(result, {"description": "ok"})
+        headers, content = requests[0]
+        self.assertEqual(int(headers["Content-Length"]), len(content))
+        self.assertNotIn("Transfer-Encoding", headers)
+        urls = [p["image_url"]["url"] for p in json.loads(content)["messages"][0]["content"] if p["type"] == "image_url"]
+        self.assertEqual(urls, [f"data:image/jpeg;base64,{base64.b64encode(raw).decode('ascii')}"] * 2)
+
+    def test_retry_resends_full_body(self) -> None:
+        bodies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            bodies.append(request.read())
+            if len(bodies) == 1:
+                return httpx.Response(503)
+            return httpx.Response(200, json={"choices": [{"message": {"content": json.dumps({"description": "ok"})}}]})
+
+        self._run(handler, [os.urandom(RAW_CHUNK_BYTES + 1)])
+
+        self.assertEqual(len(bodies), 2)
+        self.assertEqual(bodies[0], bodies[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+"""
+Analysis queue tests (backpressure + load shedding).
+
+Kopplat till krav:
+- F01 "Systemet ska kunna ta emot metadata-strömmar via (HTTP/MQTT) i JSON-format enligt Axis-kameror."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att analyskön i Camera är begränsad och att överlast hanteras enligt vald policy.
+
+Vad testet verifierar:
+- drop_oldest släpper äldsta väntande event.
+- drop_shortest_track släpper kortaste tracken, även det nya eventet, och analyserar längsta tracken först.
+- coalesce_by_track_id ersätter väntande event för samma track.
+- För gamla event släpps innan analys och räknare för processed/dropped stämmer.
+- Handlers som returnerar en Future räknas som pågående tills futuren är klar.
+- shutdown() släpper väntande event och väntar bara in pågående.
+
+Förutsättningar:
+- Inga externa beroenden.
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_analysis_queue.py -v
+"""
+
+import concurrent.futures
+import threading
+import unittest
+
+from ingestion.analysis_queue import AnalysisQueue
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.handled: list[str] = []
+
+    def __call__(self, name: str) -> None:
+        self.handled.append(name)
+
+
+def _drain(queue: AnalysisQueue, handler: _Recorder) -> list[str]:
+    # Köer utan workers: kör kvarvarande jobb synkront i testtråden.
+    while True:
+        with queue._cond:
+            queue._closed = True
+        item = queue._next_item()
+        if item is None:
+            return handler.handled
+        handler(*item.args)
+
+
+class AnalysisQueueTests(unittest.TestCase):
+    def test_drop_oldest_when_full(self) -> None:
+        handler = _Recorder()
+        queue = AnalysisQueue(handler, max_size=2, workers=0, policy="drop_oldest")
+        for name in ("a", "b", "c"):
+            queue.submit(name)
+
+        self.assertEqual(queue.stats()["dropped"], 1)
+        self.assertEqual(_drain(queue, handler), ["b", "c"])
+
+    def test_drop_shortest_track_rejects_incoming_when_shortest(self) -> None:
+        handler = _Recorder()
+        queue = AnalysisQueue(handler, max_size=2, workers=0, policy="drop_shortest_track")
+        self.assertTrue(queue.submit("long", duration=5.0))
+        self.assertTrue(queue.submit("short", duration=1.0))
+        self.assertFalse(queue.submit("tiny", duration=0.5))
+        self.assertTrue(queue.submit("medium", duration=2.0))
+
+        self.assertEqual(queue.stats()["dropped"], 2)
+        self.assertEqual(_drain(queue, handler), ["long", "medium"])
+
+    def test_drop_shortest_track_processes_longest_first(self) -> None:
+        handler = _Recorder()
+        queue = AnalysisQueue(handler, max_size=5, workers=0, policy="drop_shortest_track")
+        for name, duration in (("short", 1.0), ("long", 5.0), ("medium", 2.0), ("long-2", 5.0)):
+            queue.submit(name, duration=duration)
+
+        self.assertEqual(_drain(queue, handler), ["long", "long-2", "medium", "short"])
+
+    def test_coalesce_by_track_id_replaces_pending_event(self) -> None:
+        handler = _Recorder()
+        queue = AnalysisQueue(handler, max_size=5, workers=0, policy="coalesce_by_track_id")
+        queue.submit("t1-v1", track_id="t1")
+        queue.submit("t2-v1", track_id="t2")
+        queue.submit("t1-v2", track_id="t1")
+
+        stats = queue.stats()
+        self.assertEqual(stats["queued"], 2)
+        self.assertEqual(stats["coalesced"], 1)
+        self.assertEqual(_drain(queue, handler), ["t1-v2", "t2-v1"])
+
+    def test_expired_events_are_dropped_before_processing(self) -> None:
+        now = [0.0]
+        handler = _Recorder()
+        queue = AnalysisQueue(handler, workers=0, max_age_seconds=10.0, monotonic_fn=lambda: now[0])
+        queue.submit("stale")
+        now[0] = 11.0
+        queue.submit("fresh")
+
+        self.assertEqual(_drain(queue, handler), ["fresh"])
+        self.assertEqual(queue.stats()["expired"], 1)
+
+    def test_workers_process_and_count(self) -> None:
+        done = threading.Event()
+        handled: list[int] = []
+
+        def handler(value: int) -> None:
+            handled.append(value)
+            if value == 0:
+                raise RuntimeError("boom")
+            if len(handled) == 3:
+                done.set()
+
+        queue = AnalysisQueue(handler, workers=2)
+        for value in range(3):
+            queue.submit(value)
+        self.assertTrue(done.wait(timeout=2.0))
+        queue.shutdown(wait=True)
+
+        stats = queue.stats()
+        self.assertEqual(stats["processed"], 2)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["queued"], 0)
+
+    def test_future_result_keeps_event_in_flight_until_done(self) -> None:
+        futures: list[concurrent.futures.Future] = []
+        dispatched = threading.Event()
+
+        def handler(value: int) -> concurrent.futures.Future:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            futures.append(future)
+            if len(futures) == 2:
+                dispatched.set()
+            return future
+
+        queue = AnalysisQueue(handler, workers=1)
+        queue.submit(1)
+        queue.submit(2)
+        self.assertTrue(dispatched.wait(timeout=2.0))
+        queue.shutdown(wait=True)
+        self.assertEqual(queue.stats()["in_flight"], 2)
+
+        futures[0].set_result(None)
+        futures[1].set_exception(RuntimeError("boom"))
+
+        stats = queue.stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["processed"], 1)
+        self.assertEqual(stats["failed"], 1)
+
+    def test_shutdown_drops_pending_and_waits_for_in_flight(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+        handled: list[int] = []
+
+        def handler(value: int) -> None:
+            started.set()
+            release.wait(timeout=2.0)
+            handled.append(value)
+
+        queue = AnalysisQueue(handler, max_size=10, workers=1)
+        for value in range(5):
+            queue.submit(value)
+        self.assertTrue(started.wait(timeout=2.0))
+
+        stopper = threading.Thread(target=queue.shutdown, kwargs={"wait": True})
+        stopper.start()
+        # Släpp handlern först när shutdown har tömt kön.
+        for _ in range(200):
+            if queue.stats()["queued"] == 0:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        stopper.join(timeout=2.0)
+
+        self.assertFalse(stopper.is_alive())
+        self.assertEqual(handled, [0])
+        stats = queue.stats()
+        self.assertEqual((stats["queued"], stats["dropped"], stats["processed"]), (0, 4, 1))
+        self.assertFalse(queue.submit(5))
+
+    def test_invalid_policy_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            AnalysisQueue(lambda: None, workers=0, policy="drop_newest")
+
+
+if __name__ == "__main__":
+    unittest.main()
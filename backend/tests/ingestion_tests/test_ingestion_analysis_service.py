@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+"""
+Shared analysis service tests.
+
+Kopplat till krav:
+- F07 "Systemet ska kunna skicka en JPEG-bild till Prisma API och ta emot en textbaserad beskrivning i JSON-format."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att flera kameror kan dela en event loop, en CPU-pool och en global gräns för samtidiga analyser.
+
+Vad testet verifierar:
+- Den globala gränsen gäller över alla registrerade kameror.
+- Räknare per kamera och totalt stämmer, även för misslyckade analyser.
+- close() stänger en asynkron analysclient på tjänstens loop.
+
+Förutsättningar:
+- Inga externa beroenden.
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_analysis_service.py -v
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from ingestion.analysis_service import AnalysisService
+
+
+class _ClosableClient:
+    def __init__(self) -> None:
+        self.closed_on = None
+
+    async def close(self) -> None:
+        self.closed_on = asyncio.get_running_loop()
+
+
+class AnalysisServiceTests(unittest.TestCase):
+    def test_global_concurrency_limit_spans_cameras(self) -> None:
+        service = AnalysisService(concurrency=2, cpu_workers=1)
+        self.addCleanup(service.close)
+        service.register("cam-1")
+        service.register("cam-2")
+
+        release = threading.Event()
+        running = []
+
+        async def job(name: str) -> str:
+            running.append(name)
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+            return name
+
+        first = service.submit("cam-1", job("a"))
+        second = service.submit("cam-2", job("b"))
+
+        third_submitted = threading.Event()
+        holder = []
+
+        def submit_third() -> None:
+            holder.append(service.submit("cam-1", job("c")))
+            third_submitted.set()
+
+        threading.Thread(target=submit_third, daemon=True).start()
+        # Tredje jobbet ska vänta på en ledig plats.
+        self.assertFalse(third_submitted.wait(timeout=0.2))
+        stats = service.stats()
+        self.assertEqual(stats["cameras"], 2)
+        self.assertEqual(stats["in_flight"], 2)
+        self.assertEqual(stats["in_flight_by_camera"], {"cam-1": 1, "cam-2": 1})
+
+        release.set()
+        self.assertEqual(first.result(timeout=2.0), "a")
+        self.assertEqual(second.result(timeout=2.0), "b")
+        self.assertTrue(third_submitted.wait(timeout=2.0))
+        self.assertEqual(holder[0].result(timeout=2.0), "c")
+        self.assertTrue(service.wait_idle(timeout=2.0))
+        self.assertEqual(service.stats()["completed"], 3)
+
+    def test_failed_analysis_is_counted_and_releases_slot(self) -> None:
+        service = AnalysisService(concurrency=1, cpu_workers=1)
+        self.addCleanup(service.close)
+
+        async def boom() -> None:
+            await service.run_blocking(time.sleep, 0)
+            raise RuntimeError("boom")
+
+        async def ok() -> int:
+            return await service.run_blocking(sum, [1, 2, 3])
+
+        with self.assertRaises(RuntimeError):
+            service.submit("cam-1", boom()).result(timeout=2.0)
+        self.assertEqual(service.submit("cam-1", ok()).result(timeout=2.0), 6)
+
+        stats = service.stats()
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+
+    def test_close_closes_async_client_on_service_loop(self) -> None:
+        client = _ClosableClient()
+        service = AnalysisService(client)
+        loop = service.loop
+        service.close()
+
+        self.assertIs(client.closed_on, loop)
+        with self.assertRaises(RuntimeError):
+            service.register("cam-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+"""
+Arena hot buffer tests.
+
+Kopplat till krav:
+- F08 "Logik för att hämta högupplösta bildrutor från videoströmmen som matchar tidpunkten för objektets snapshot."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att den förallokerade ArenaFrameRingBuffer beter sig som FrameRingBuffer.
+
+Vad testet verifierar:
+- Trimning på max_frames och max_bytes, även när arenan slår runt.
+- search_frame och range returnerar rätt frames med korrekt innehåll.
+
+Förutsättningar:
+- numpy.
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_arena_hot_buffer.py -v
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from ingestion.buffers.arena_hot_buffer import ArenaFrameRingBuffer
+from ingestion.buffers.rtsp_hot_buffer import BufferedFrame
+
+T0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+
+
+def _frame(i: int, size: int = 4) -> BufferedFrame:
+    return BufferedFrame(
+        timestamp=T0 + timedelta(milliseconds=200 * i),
+        jpeg_bytes=bytes([i % 256]) * size,
+        width=10 + i,
+        height=20 + i,
+    )
+
+
+class ArenaFrameRingBufferTests(unittest.TestCase):
+    def test_respects_max_frames(self) -> None:
+        buf = ArenaFrameRingBuffer(max_frames=3, max_bytes=10_000)
+        for i in range(5):
+            buf.append(_frame(i))
+
+        self.assertEqual(buf.stats()["frames"], 3)
+        self.assertEqual(buf.stats()["bytes"], 12)
+        self.assertEqual([f.jpeg_bytes.tobytes() for f in buf.range(T0, T0 + timedelta(days=1))],
+                         [bytes([2]) * 4, bytes([3]) * 4, bytes([4]) * 4])
+
+    def test_wraparound_evicts_only_overwritten_frames(self) -> None:
+        buf = ArenaFrameRingBuffer(max_frames=100, max_bytes=10)
+        for i in range(6):
+            buf.append(_frame(i, size=3))
+
+        frames = buf.range(T0, T0 + timedelta(days=1))
+        self.assertEqual([f.jpeg_bytes.tobytes() for f in frames], [bytes([3]) * 3, bytes([4]) * 3, bytes([5]) * 3])
+        self.assertEqual(buf.stats()["bytes"], 9)
+
+    def test_search_frame_returns_nearest_with_metadata(self) -> None:
+        buf = ArenaFrameRingBuffer(max_frames=10, max_bytes=10_000)
+        for i in range(5):
+            buf.append(_frame(i))
+
+        hit = buf.search_frame(T0 + timedelta(milliseconds=390))
+        self.assertIsNotNone(hit)
+        assert hit is not None
+        self.assertEqual(hit.timestamp, T0 + timedelta(milliseconds=400))
+        self.assertEqual((hit.width, hit.height), (12, 22))
+        self.assertEqual(hit.to_buffered_frame(), _frame(2))
+        self.assertEqual(buf.search_frame(T0 - timedelta(seconds=5)).jpeg_bytes.tobytes(), bytes([0]) * 4)
+
+    def test_oversized_frame_is_dropped(self) -> None:
+        buf = ArenaFrameRingBuffer(max_frames=10, max_bytes=5)
+        buf.append(_frame(0, size=6))
+        self.assertEqual(buf.stats()["frames"], 0)
+        self.assertIsNone(buf.search_frame(T0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+"""
+Frame table and exact seek tests.
+
+Kopplat till krav:
+- F08 "Logik för att hämta högupplösta bildrutor från videoströmmen som matchar tidpunkten för objektets snapshot."
+
+Testnivå:
+- Integrationstest (riktig mp4 från ffmpeg, avkodning med OpenCV)
+
+Varför testet finns:
+- Bilden för en snapshot hämtas ur inspelningen med FrameTable + read_frame_at. Med variabel bildtakt ger sökning via
+  medel-fps (CAP_PROP_POS_FRAMES) fel frame, så rätt frame måste hittas via PTS och nyckelbilder ur mp4-filen.
+
+Vad testet verifierar:
+- FrameTable läst ur mp4 (stts/ctts/stss) har samma frames och PTS som en sekventiell avkodning, även med B-frames.
+- read_frame_at ger exakt rätt frame för varje PTS och mellan två frames, i en video med variabel bildtakt.
+- Avkodningen börjar vid närmaste nyckelbild (inte från filens början).
+- Hamnar sökningen efter målet backar read_frame_at en nyckelbild i taget, aldrig direkt till filens början.
+- SegmentIndex bygger tabellen en gång, sparar den och tar bort den med segmentet.
+
+Förutsättningar:
+- imageio-ffmpeg med libx264 (testet hoppas över annars).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar (eller skippas om ffmpeg saknas).
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_frame_table.py -v
+"""
+
+import subprocess
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from ingestion.storage import frame_table
+from ingestion.storage.frame_table import FrameTable, read_frame_at, read_frame_table, try_read_frame_table
+from ingestion.storage.segment_index import SegmentIndex
+
+WIDTH, HEIGHT, SOURCE_FRAMES, GOP = 64, 48, 60, 12
+
+
+def _brightness_index(frame: np.ndarray) -> int:
+    # Källframe n har ljusstyrka 4 * n.
+    return round(float(frame.mean()) / 4)
+
+
+def _make_vfr_video(path: Path) -> None:
+    import imageio_ffmpeg
+
+    frames = b"".join(np.full((HEIGHT, WIDTH, 3), 4 * i, np.uint8).tobytes() for i in range(SOURCE_FRAMES))
+    # Frames 10-25 tas bort och tidsstämplarna behålls: ett hål på 1,6 s, alltså variabel bildtakt.
+    subprocess.run(
+        [
+            imageio_ffmpeg.get_ffmpeg_exe(),
+            "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{WIDTH}x{HEIGHT}", "-r", "10", "-i", "-",
+            "-vf", "select='not(between(n\\,10\\,25))'", "-fps_mode", "vfr",
+            "-c:v", "libx264", "-g", str(GOP), "-bf", "2", "-crf", "10", "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            str(path),
+        ],
+        input=frames,
+        check=True,
+        capture_output=True,
+    )
+
+
+class FrameTableTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.video = Path(cls._tmp.name) / "vfr.mp4"
+        try:
+            _make_vfr_video(cls.video)
+        except (ImportError, OSError, subprocess.CalledProcessError) as exc:
+            cls._tmp.cleanup()
+            raise unittest.SkipTest(f"ffmpeg with libx264 not available: {exc!r}")
+
+        # Facit: sekventiell avkodning.
+        cls.truth = []
+        cap = cv2.VideoCapture(str(cls.video))
+        while cap.grab():
+            position_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+            ok, frame = cap.retrieve()
+            cls.truth.append((position_ms, _brightness_index(frame)))
+        cap.release()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._tmp.cleanup()
+
+    def test_table_matches_sequential_decode(self) -> None:
+        table = read_frame_table(str(self.video))
+
+        self.assertEqual(table.frame_count, len(self.truth))
+        self.assertEqual(table.keyframes[0], 0)
+        self.assertGreater(len(table.keyframes), 1)
+        for index, (position_ms, _) in enumerate(self.truth):
+            self.assertAlmostEqual(table.seconds(index) * 1000, position_ms, delta=1.0)
+        self.assertEqual(FrameTable.from_bytes(table.to_bytes()), table)
+
+    def test_read_frame_at_is_exact_with_variable_frame_rate(self) -> None:
+        table = read_frame_table(str(self.video))
+
+        for index, (_, expected) in enumerate(self.truth):
+            for offset in (table.seconds(index), table.seconds(index) + 0.05):
+                stats = {}
+                frame = read_frame_at(str(self.video), offset, table, stats)
+                self.assertEqual(_brightness_index(frame), expected, f"frame {index} at {offset:.2f}s")
+                self.assertEqual(stats["decoded"], index - table.keyframe_for(index) + 1)
+
+    def test_segment_index_stores_frame_table(self) -> None:
+        with SegmentIndex(Path(self._tmp.name) / "segments.sqlite") as index:
+            start = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+            index.add_segment("1", str(self.video), start, start + timedelta(seconds=6))
+
+            self.assertIsNone(index.frame_table("1", str(self.video), compute=False))
+            table = index.frame_table("1", str(self.video))
+            self.assertEqual(index.frame_table("1", str(self.video), compute=False), table)
+
+            index.remove_segment("1", str(self.video))
+            self.assertIsNone(index.frame_table("1", str(self.video), compute=False))
+
+    def test_unreadable_file_gives_no_table(self) -> None:
+        not_mp4 = Path(self._tmp.name) / "not.mp4"
+        not_mp4.write_bytes(b"\x00" * 64)
+
+        self.assertIsNone(try_read_frame_table(str(not_mp4)))
+        self.assertIsNone(try_read_frame_table(str(Path(self._tmp.name) / "missing.mp4")))
+
+    def test_read_frame_at_without_table_counts_decoded(self) -> None:
+        stats = {}
+        frame = read_frame_at(str(self.video), 0.0, None, stats)
+
+        self.assertIsNotNone(frame)
+        self.assertEqual(stats["decoded"], 1)
+
+
+class _OvershootingCapture:
+    """Fejkad VideoCapture med 10 fps där sökningar från 3 s hamnar en GOP för sent."""
+
+    def __init__(self, path: str) -> None:
+        self.seeks = []
+        self.position = -1
+        _OvershootingCapture.last = self
+
+    def set(self, prop: int, value: float) -> bool:
+        self.seeks.append(int(value))
+        index = int(value)
+        if index >= 30:
+            index += GOP
+        self.position = index - 1
+        return True
+
+    def grab(self) -> bool:
+        if self.position + 1 >= SOURCE_FRAMES:
+            return False
+        self.position += 1
+        return True
+
+    def get(self, prop: int) -> float:
+        return self.position * 100.0
+
+    def retrieve(self):
+        return True, np.full((HEIGHT, WIDTH, 3), 4 * self.position, np.uint8)
+
+    def release(self) -> None:
+        return None
+
+
+class FrameSeekOvershootTests(unittest.TestCase):
+    def test_overshoot_steps_back_one_keyframe(self) -> None:
+        table = FrameTable(
+            timescale=1000,
+            pts=tuple(100 * i for i in range(SOURCE_FRAMES)),
+            keyframes=tuple(range(0, SOURCE_FRAMES, GOP)),
+        )
+        stats = {}
+        with patch.object(frame_table.cv2, "VideoCapture", _OvershootingCapture):
+            frame = read_frame_at("fake.mp4", 4.0, table, stats)
+
+        self.assertEqual(_brightness_index(frame), 40)
+        # Nyckelbild 36 hamnar på 48 (efter målet), nyckelbild 24 hamnar rätt.
+        self.assertEqual(_OvershootingCapture.last.seeks, [36, 24])
+        self.assertEqual(stats["decoded"], 1 + (40 - 24 + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,11 +14,14 @@ Varför testet finns:
 - Verifiera att on_message i live-flödet parser MQTT JSON och triggar ingest-logik.
 - Verifiera robust hantering av trasig/tom JSON utan krasch.
 - Verifiera att frame- och bytes-gränser i RTSP-hotbuffer följs.
+- Verifiera att den asynkrona analyskedjan kör hela flödet på en event loop.
+- Verifiera att analysläget "combined" gör ett LLM-anrop per event.
 
 Vad testet verifierar:
 - Giltig payload -> analysanrop sker, save_analysis anropas och MQTT-event buffras.
 - Ogiltig/tom payload -> ingen analys/save och ingen krasch.
 - Ringbuffer respekterar max_frames och max_bytes.
+- _dispatch_message schemalägger _process_message på analystjänstens event loop: fyra LLM-anrop och en save.
 
 Förutsättningar:
 - Inga externa beroenden krävs under testkörning (stubbar används vid behov).
@@ -35,12 +38,13 @@ cd GR8/backend
 python3 -m pytest tests/ingestion_tests/test_ingestion_live_camera.py -v
 """
 
+import asyncio
 import importlib.util
 import json
 import sys
 import types
 import unittest
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 
 def _module_missing(name: str) -> bool:
@@ -113,6 +117,7 @@ def _ensure_stub_modules() -> None:
 _ensure_stub_modules()
 
 import ingestion.camera as camera_module  # noqa: E402
+from ingestion.analysis_service import AnalysisService  # noqa: E402
 from ingestion.camera import Camera  # noqa: E402
 from ingestion.buffers.rtsp_hot_buffer import BufferedFrame, FrameRingBuffer  # noqa: E402
 
@@ -141,6 +146,10 @@ class _SpyAnalysisClient:
         )
         return {"description": "stub-description", "keywords": ["stub-keyword"]}
 
+    async def query_description_bundle(self, groups, image_mime: str = "image/jpeg") -> dict:
+        self.calls.append({"groups": groups, "image_mime": image_mime})
+        return {name: {"description": f"{name}-description"} for name in groups}
+
     # Keep backward compatibility in the test double in case older code paths are exercised.
     def query_description_closed(
         self,
@@ -201,6 +210,8 @@ class CameraOnMessageTests(unittest.TestCase):
         from ingestion.buffers.mqtt_event_buffer import MqttEventRingBuffer
         cam.mqtt_buffer = MqttEventRingBuffer(max_events=100, max_bytes=100_000)
         cam.analysis_client = _SpyAnalysisClient()
+        cam.analysis_mode = "separate"
+        cam._image_encoder = None
         return cam
 
     def test_extract_event_timestamp_prefers_start_time(self) -> None:
@@ -224,6 +235,73 @@ class CameraOnMessageTests(unittest.TestCase):
 
         self.assertEqual(len(cam.analysis_client.calls), 0)
         self.assertEqual(len(self.saved), 0)
+        self.assertEqual(cam.mqtt_buffer_stats()["events"], 0)
+
+    def test_on_message_buffers_event_with_receive_time_and_raw_size(self) -> None:
+        cam = self._make_camera()
+        submitted = []
+        cam._analysis_queue = types.SimpleNamespace(submit=lambda *args, **kwargs: submitted.append((args, kwargs)))
+        raw = json.dumps({"id": "track-1", "start_time": "2026-03-24T12:00:00Z"}).encode("utf-8")
+
+        before = datetime.now(timezone.utc)
+        cam.on_message(None, None, _Msg(raw))
+
+        self.assertEqual(cam.mqtt_buffer_stats()["events"], 1)
+        self.assertEqual(cam.mqtt_buffer_stats()["bytes"], len(raw))
+        event = cam.get_mqtt_event_at(datetime.now(timezone.utc))
+        self.assertIsNotNone(event)
+        assert event is not None
+        self.assertEqual(event.payload["id"], "track-1")
+        self.assertGreaterEqual(event.timestamp, before)
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual(submitted[0][1]["track_id"], "track-1")
+
+    def test_dispatch_runs_async_pipeline_on_event_loop(self) -> None:
+        cam = self._make_camera()
+        cam.analysis_timeout_seconds = 5.0
+        cam.analysis_service = AnalysisService(concurrency=2, cpu_workers=2)
+        self.addCleanup(cam.analysis_service.close)
+
+        received_at = datetime.now(timezone.utc)
+        cam.frame_buffer.append(
+            BufferedFrame(timestamp=received_at - timedelta(seconds=2), jpeg_bytes=b"frame", width=10, height=10)
+        )
+        data = {
+            "start_time": "2026-03-24T12:00:00Z",
+            "end_time": "2026-03-24T12:00:02Z",
+            "image": {"data": "snapshot-b64"},
+        }
+
+        future = cam._dispatch_message(received_at, data)
+        future.result(timeout=5.0)
+
+        self.assertEqual(len(cam.analysis_client.calls), 4)
+        self.assertEqual(cam.analysis_client.calls[0]["image_b64"], ["snapshot-b64"])
+        self.assertEqual(len(self.saved), 1)
+        self.assertEqual(self.saved[0]["snapshot_image_base64"], "snapshot-b64")
+        stats = cam.analysis_service.stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["completed"], 1)
+
+    def test_combined_mode_sends_one_request_per_event(self) -> None:
+        cam = self._make_camera()
+        cam.analysis_mode = "combined"
+
+        responses = asyncio.run(
+            cam._run_analysis(
+                snapshot_b64="snap",
+                full_frame_b64="full",
+                selection_1_images=["full", "a"],
+                selection_2_images=["full"],
+            )
+        )
+
+        self.assertEqual(len(cam.analysis_client.calls), 1)
+        self.assertEqual(cam.analysis_client.calls[0]["groups"]["selection_1"], ["full", "a"])
+        self.assertEqual(
+            [r["description"] for r in responses],
+            ["snapshot-description", "full_frame-description", "selection_1-description", "selection_2-description"],
+        )
 
 
 class FrameRingBufferTests(unittest.TestCase):
@@ -259,6 +337,42 @@ class FrameRingBufferTests(unittest.TestCase):
         self.assertEqual(stats["frames"], 1)
         self.assertEqual(stats["bytes"], 3)
 
+    def test_range_returns_frames_inside_window_after_wraparound(self) -> None:
+        buf = FrameRingBuffer(max_frames=4, max_bytes=10_000)
+        t0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+        for i in range(7):
+            buf.append(
+                BufferedFrame(
+                    timestamp=t0 + timedelta(seconds=i),
+                    jpeg_bytes=bytes([i]),
+                    width=10,
+                    height=10,
+                )
+            )
+
+        frames = buf.range(t0 + timedelta(seconds=2), t0 + timedelta(seconds=5))
+        self.assertEqual([f.jpeg_bytes for f in frames], [bytes([3]), bytes([4]), bytes([5])])
+        self.assertEqual(buf.range(t0 + timedelta(seconds=5), t0), [])
+
+    def test_search_frame_returns_nearest_after_wraparound(self) -> None:
+        buf = FrameRingBuffer(max_frames=4, max_bytes=10_000)
+        t0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+        for i in range(6):
+            buf.append(
+                BufferedFrame(
+                    timestamp=t0 + timedelta(seconds=i),
+                    jpeg_bytes=bytes([i]),
+                    width=10,
+                    height=10,
+                )
+            )
+
+        self.assertEqual(buf.search_frame(t0).jpeg_bytes, bytes([2]))
+        self.assertEqual(buf.search_frame(t0 + timedelta(seconds=3.4)).jpeg_bytes, bytes([3]))
+        self.assertEqual(buf.search_frame(t0 + timedelta(seconds=3.6)).jpeg_bytes, bytes([4]))
+        self.assertEqual(buf.search_frame(t0 + timedelta(seconds=4)).jpeg_bytes, bytes([4]))
+        self.assertEqual(buf.search_frame(t0 + timedelta(seconds=60)).jpeg_bytes, bytes([5]))
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -112,6 +112,23 @@ class MqttEventRingBufferTests(unittest.TestCase):
         miss = buf.search_event(t0 + timedelta(seconds=5), tolerance_ms=100)
         self.assertIsNone(miss)
 
+    def test_trims_on_stored_raw_size_and_searches_after_wraparound(self) -> None:
+        buf = MqttEventRingBuffer(max_events=3, max_bytes=250)
+        t0 = datetime.now(timezone.utc)
+        for i in range(5):
+            buf.append(
+                BufferedMqttEvent(
+                    timestamp=t0 + timedelta(milliseconds=100 * i),
+                    payload={"id": str(i)},
+                    size_bytes=100,
+                )
+            )
+
+        self.assertEqual(buf.stats()["events"], 2)
+        self.assertEqual(buf.stats()["bytes"], 200)
+        self.assertEqual(buf.search_event(t0).payload["id"], "3")
+        self.assertEqual(buf.search_event(t0 + timedelta(milliseconds=360)).payload["id"], "4")
+
 
 class CameraContextMatchingTests(unittest.TestCase):
     def _make_camera(self) -> Camera:
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+"""
+PTS camera clock tests.
+
+Kopplat till krav:
+- F04 "Systemet ska synkronisera inkommande metadata med tillhörande bildrutor baserat på tidstämplar."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- GStreamerHotBuffer sätter kameratiden på varje frame via dess PTS. Om uppslaget är fel hamnar frames på fel plats
+  i hot buffern och matchas mot fel MQTT-event.
+
+Vad testet verifierar:
+- Exakt PTS ger ankarets kameratid, även när frames mellan ankarna har släppts.
+- PTS mellan ankare räknas från närmaste ankare plus PTS-skillnaden.
+- PTS som går bakåt (ny session) startar om klockan.
+- Antalet ankare hålls begränsat.
+
+Förutsättningar:
+- Inga (ingen GStreamer behövs).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_pts_clock.py -v
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from ingestion.buffers.pts_clock import PtsCameraClock
+
+T0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+FRAME_NS = 33_333_333
+
+
+class PtsCameraClockTests(unittest.TestCase):
+    def test_exact_lookup_is_independent_of_dropped_frames(self) -> None:
+        clock = PtsCameraClock()
+        # Kamerans NTP-tid och PTS behöver inte ha samma nollpunkt, bara samma takt.
+        for i in range(30):
+            clock.add(1_000_000_000 + i * FRAME_NS, T0 + timedelta(microseconds=i * 33_333))
+
+        # Bara var sjätte frame når appsink (rate gate), i godtycklig ordning.
+        for i in (24, 0, 6, 18, 12):
+            self.assertEqual(clock.camera_time(1_000_000_000 + i * FRAME_NS), T0 + timedelta(microseconds=i * 33_333))
+        self.assertEqual(clock.stats()["clock_exact"], 5)
+
+    def test_lookup_between_anchors_uses_nearest(self) -> None:
+        clock = PtsCameraClock()
+        clock.add(0, T0)
+        clock.add(1_000_000_000, T0 + timedelta(seconds=1, milliseconds=5))
+
+        self.assertEqual(clock.camera_time(200_000_000), T0 + timedelta(milliseconds=200))
+        self.assertEqual(clock.camera_time(900_000_000), T0 + timedelta(milliseconds=905))
+        self.assertEqual(clock.camera_time(1_500_000_000), T0 + timedelta(milliseconds=1505))
+
+    def test_backwards_pts_resets_and_duplicates_are_ignored(self) -> None:
+        clock = PtsCameraClock()
+        self.assertIsNone(clock.camera_time(0))
+        clock.add(5_000_000_000, T0)
+        clock.add(5_000_000_000, T0 + timedelta(seconds=3))
+        self.assertEqual(clock.camera_time(5_000_000_000), T0)
+
+        clock.add(0, T0 + timedelta(seconds=60))
+        self.assertEqual(clock.camera_time(0), T0 + timedelta(seconds=60))
+        self.assertEqual(clock.stats()["clock_resets"], 1)
+        self.assertEqual(clock.stats()["clock_anchors"], 1)
+
+    def test_anchor_count_is_bounded(self) -> None:
+        clock = PtsCameraClock(max_anchors=10)
+        for i in range(1000):
+            clock.add(i * FRAME_NS, T0 + timedelta(microseconds=i * 33_333))
+
+        self.assertLess(clock.stats()["clock_anchors"], 20)
+        self.assertEqual(clock.camera_time(999 * FRAME_NS), T0 + timedelta(microseconds=999 * 33_333))
+
+
+if __name__ == "__main__":
+    unittest.main()
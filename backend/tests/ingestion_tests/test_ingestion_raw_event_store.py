@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+"""
+Buffered RawEventStore tests.
+
+Kopplat till krav:
+- F01 "Systemet ska kunna ta emot metadata-strömmar via (HTTP/MQTT) i JSON-format enligt Axis-kameror."
+- F03 "Systemet ska kunna hantera inspelad data på samma sätt som live-data."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- RawEventStore ligger på ingest-vägen för varje MQTT-event. Den buffrar rader och skriver till en öppen fil i stället
+  för att öppna och stänga filen per event, så det måste gå att lita på att inget tappas och att filerna går att spela upp.
+
+Vad testet verifierar:
+- Rader buffras tills storleksgränsen, tidsgränsen, flush() eller close() skriver dem.
+- Misslyckas en skrivning ligger raderna kvar i bufferten och felet räknas i flush_failures.
+- Filen roteras vid max_file_bytes och roterade filer packas med gzip/zstd.
+- Alla filer (roterade och aktiv) går att läsa med iter_replay_events och ger alla events i ordning.
+- Flera trådar kan skriva samtidigt utan att rader blandas ihop.
+- En store som släpps utan close() hålls inte vid liv (atexit, flush-tråd) och skriver ut sin buffert.
+
+Förutsättningar:
+- Inga (zstd-testet hoppas över om zstandard saknas).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_raw_event_store.py -v
+"""
+
+import gc
+import json
+import tempfile
+import threading
+import time
+import unittest
+import weakref
+from datetime import datetime, timezone
+from pathlib import Path
+
+from ingestion.source.replay_reader import RawEvent, iter_replay_events
+from ingestion.storage import raw_event_store
+from ingestion.storage.raw_event_store import RawEventStore
+
+
+def _raw_event(i: int) -> RawEvent:
+    return RawEvent(raw={"id": f"track-{i}", "channel_id": 1, "note": "å" * (i % 5)}, received_at=datetime.now(timezone.utc), source="live")
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+class RawEventStoreTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def _store(self, **kwargs) -> RawEventStore:
+        store = RawEventStore(str(self.dir), **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def _lines(self, path: Path) -> list:
+        if not path.exists():
+            return []
+        return [json.loads(line)["raw"]["id"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+    def _all_ids(self) -> list:
+        # Roterade filer (tidsstämpel i namnet) först, sedan den aktiva filen.
+        files = sorted(p for p in self.dir.iterdir() if p.name.startswith("raw_events-")) + [self.dir / "raw_events.jsonl"]
+        return [ev.raw["raw"]["id"] for path in files if path.exists() for ev in iter_replay_events(path)]
+
+    def test_lines_are_buffered_until_flush_or_close(self) -> None:
+        store = self._store(flush_interval_seconds=None)
+        for i in range(3):
+            store.append(_raw_event(i))
+        self.assertEqual(self._lines(store.file), [])
+        self.assertEqual(store.stats()["pending_events"], 3)
+
+        store.flush()
+        self.assertEqual(self._lines(store.file), ["track-0", "track-1", "track-2"])
+
+        store.append(_raw_event(3))
+        store.close()
+        self.assertEqual(self._lines(store.file), ["track-0", "track-1", "track-2", "track-3"])
+        with self.assertRaises(RuntimeError):
+            store.append(_raw_event(4))
+
+    def test_failed_flush_keeps_lines_and_counts_failure(self) -> None:
+        store = self._store(flush_bytes=1, flush_interval_seconds=None)
+        target = store.file
+        store.file = self.dir / "missing" / "raw_events.jsonl"
+
+        for i in range(2):
+            with self.assertRaises(OSError):
+                store.append(_raw_event(i))
+        self.assertEqual(store.stats()["flush_failures"], 2)
+        self.assertEqual(store.stats()["pending_events"], 2)
+
+        store.file = target
+        store.flush()
+        self.assertEqual(self._lines(store.file), ["track-0", "track-1"])
+        self.assertEqual(store.stats()["pending_events"], 0)
+
+    def test_size_threshold_flushes(self) -> None:
+        line_bytes = len(RawEventStore.to_line(_raw_event(0))) + 1
+        store = self._store(flush_bytes=line_bytes * 10, flush_interval_seconds=None)
+
+        for i in range(9):
+            store.append(_raw_event(i))
+        self.assertEqual(store.stats()["flushes"], 0)
+        store.append(_raw_event(9))
+
+        self.assertEqual(store.stats()["flushes"], 1)
+        self.assertEqual(len(self._lines(store.file)), 10)
+
+    def test_interval_flushes_in_background(self) -> None:
+        store = self._store(flush_interval_seconds=0.05)
+        store.append(_raw_event(0))
+
+        _wait_for(lambda: self._lines(store.file) == ["track-0"])
+        store.append(_raw_event(1))
+        _wait_for(lambda: self._lines(store.file) == ["track-0", "track-1"])
+
+    def test_rotation_with_gzip_keeps_all_events(self) -> None:
+        store = self._store(flush_bytes=1, flush_interval_seconds=None, max_file_bytes=2000, compress="gzip")
+        for i in range(100):
+            store.append(_raw_event(i))
+        store.close()
+
+        rotated = sorted(p.name for p in self.dir.iterdir() if p.name.startswith("raw_events-"))
+        self.assertGreater(len(rotated), 2)
+        self.assertTrue(all(name.endswith(".jsonl.gz") for name in rotated))
+        self.assertEqual(store.stats()["compressed_files"], len(rotated))
+        self.assertEqual(self._all_ids(), [f"track-{i}" for i in range(100)])
+
+    def test_rotation_with_zstd(self) -> None:
+        if raw_event_store.zstandard is None:
+            self.skipTest("zstandard not installed")
+        store = self._store(flush_bytes=1, flush_interval_seconds=None, max_file_bytes=2000, compress="zstd")
+        for i in range(50):
+            store.append(_raw_event(i))
+        store.close()
+
+        self.assertTrue(any(p.name.endswith(".jsonl.zst") for p in self.dir.iterdir()))
+        self.assertEqual(self._all_ids(), [f"track-{i}" for i in range(50)])
+
+    def test_concurrent_writers(self) -> None:
+        store = self._store(flush_bytes=4096, flush_interval_seconds=0.01)
+
+        def _writer(offset: int) -> None:
+            for i in range(500):
+                store.append(_raw_event(offset + i))
+
+        threads = [threading.Thread(target=_writer, args=(n * 1000,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        store.close()
+
+        ids = self._lines(store.file)
+        self.assertEqual(sorted(ids), sorted(f"track-{n * 1000 + i}" for n in range(4) for i in range(500)))
+        for n in range(4):
+            own = [i for i in ids if int(i.split("-")[1]) // 1000 == n]
+            self.assertEqual(own, [f"track-{n * 1000 + i}" for i in range(500)])
+
+    def test_unclosed_store_is_collected_and_flushed(self) -> None:
+        store = RawEventStore(str(self.dir), flush_interval_seconds=60.0)
+        store.append(_raw_event(0))
+        thread = store._thread
+        path = store.file
+        ref = weakref.ref(store)
+
+        del store
+        gc.collect()
+
+        self.assertIsNone(ref())
+        self.assertEqual(self._lines(path), ["track-0"])
+        thread.join(timeout=2.0)
+        self.assertFalse(thread.is_alive())
+
+    def test_unknown_compression_is_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            RawEventStore(str(self.dir), compress="lz4")
+
+
+if __name__ == "__main__":
+    unittest.main()
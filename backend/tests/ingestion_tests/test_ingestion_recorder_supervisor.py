@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+"""
+Recorder supervisor tests.
+
+Kopplat till krav:
+- F03 "Systemet ska kunna hantera inspelad data på samma sätt som live-data."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Kraschar eller hänger ffmpeg-inspelningen blir det hål i inspelningarna utan att något syns. RecorderSupervisor ska
+  upptäcka det, starta om med backoff och räkna glappen, så att det går att se i statistiken.
+
+Vad testet verifierar:
+- En avslutad process och en process som slutat leverera segment startas om, med växande backoff.
+- Backoffen nollställs när ett segment blir klart igen.
+- Glapp och fördröjning räknas från tiden mellan färdiga segment.
+- stderr hålls begränsat i minnet och loggfilen roteras.
+- En riktig underprocess (python) läses via pipes och on_segment får filnamn och segmentlängd.
+
+Förutsättningar:
+- Inga (ffmpeg ersätts av fejkade processer och en kort python-process).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_recorder_supervisor.py -v
+"""
+
+import queue
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from ingestion.recorder_supervisor import RecorderSupervisor
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Pipe:
+    def __init__(self) -> None:
+        self._lines: queue.Queue = queue.Queue()
+
+    def write(self, line: str) -> None:
+        self._lines.put(line + "\n")
+
+    def close(self) -> None:
+        self._lines.put(None)
+
+    def __iter__(self):
+        return iter(self._lines.get, None)
+
+
+class _FakeProcess:
+    pid = 4242
+
+    def __init__(self) -> None:
+        self.stdout = _Pipe()
+        self.stderr = _Pipe()
+        self.returncode = None
+        self.terminated = False
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self) -> None:
+        self.terminated = True
+        self.exit(-15)
+
+    def kill(self) -> None:
+        self.exit(-9)
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    def exit(self, code: int) -> None:
+        self.returncode = code
+        self.stdout.close()
+        self.stderr.close()
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
+
+
+class RecorderSupervisorTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = _Clock()
+        self.processes: list[_FakeProcess] = []
+
+    def _factory(self) -> _FakeProcess:
+        process = _FakeProcess()
+        self.processes.append(process)
+        return process
+
+    def _supervisor(self, **kwargs) -> RecorderSupervisor:
+        supervisor = RecorderSupervisor(
+            "1",
+            self._factory,
+            segment_seconds=10,
+            poll_interval=3600,
+            clock=self.clock,
+            **kwargs,
+        )
+        supervisor.start()
+        self.addCleanup(supervisor.stop)
+        return supervisor
+
+    def _segment(self, supervisor: RecorderSupervisor, name: str) -> None:
+        before = supervisor.stats()["segments"]
+        self.processes[-1].stdout.write(f"{name},0.000000,10.000000")
+        _wait_for(lambda: supervisor.stats()["segments"] == before + 1)
+
+    def test_restarts_exited_process_with_backoff(self) -> None:
+        supervisor = self._supervisor(restart_backoff_seconds=1.0)
+
+        self.processes[-1].exit(1)
+        supervisor.poll()
+        self.assertIsNone(supervisor.process)
+        supervisor.poll()
+        self.assertEqual(len(self.processes), 1)
+
+        self.clock.now += 1.0
+        supervisor.poll()
+        self.assertEqual(len(self.processes), 2)
+
+        self.processes[-1].exit(1)
+        supervisor.poll()
+        self.clock.now += 1.5
+        supervisor.poll()
+        self.assertEqual(len(self.processes), 2)
+        self.clock.now += 0.5
+        supervisor.poll()
+        self.assertEqual(len(self.processes), 3)
+
+        stats = supervisor.stats()
+        self.assertEqual((stats["exits"], stats["restarts"], stats["consecutive_failures"]), (2, 2, 2))
+
+        self._segment(supervisor, "D2026-03-24-T12-00-00.mp4")
+        self.assertEqual(supervisor.stats()["consecutive_failures"], 0)
+
+    def test_stalled_process_is_terminated_and_restarted(self) -> None:
+        supervisor = self._supervisor(restart_backoff_seconds=0.0)
+        self.clock.now += 10
+        self._segment(supervisor, "a.mp4")
+
+        self.clock.now += 30
+        supervisor.poll()
+        self.assertEqual(len(self.processes), 1)
+
+        self.clock.now += 1
+        supervisor.poll()
+        self.assertTrue(self.processes[0].terminated)
+        supervisor.poll()
+        self.assertEqual(len(self.processes), 2)
+        self.assertEqual(supervisor.stats()["stalls"], 1)
+
+    def test_gap_and_lag_counters(self) -> None:
+        supervisor = self._supervisor()
+        self.clock.now += 10
+        self._segment(supervisor, "a.mp4")
+        self.clock.now += 11
+        self._segment(supervisor, "b.mp4")
+        self.clock.now += 25
+        self._segment(supervisor, "c.mp4")
+        self.clock.now += 14
+
+        stats = supervisor.stats()
+        self.assertEqual(stats["segments"], 3)
+        self.assertEqual(stats["last_segment"], "c.mp4")
+        self.assertEqual(stats["gaps"], 1)
+        self.assertAlmostEqual(stats["gap_seconds"], 15.0)
+        self.assertAlmostEqual(stats["last_segment_age_seconds"], 14.0)
+        self.assertAlmostEqual(stats["recording_lag_seconds"], 4.0)
+
+    def test_stderr_is_bounded_and_logged(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        log_path = Path(tmp.name) / "logs" / "recorder-1.log"
+        supervisor = self._supervisor(stderr_max_lines=3, stderr_log_path=log_path, stderr_log_max_bytes=200)
+
+        for i in range(10):
+            self.processes[-1].stderr.write(f"[rtsp] warning {i}")
+        _wait_for(lambda: supervisor.stats()["stderr_lines"] == 10)
+
+        self.assertEqual(supervisor.stderr_tail(), ["[rtsp] warning 7", "[rtsp] warning 8", "[rtsp] warning 9"])
+        self.assertTrue(Path(f"{log_path}.1").exists())
+        self.assertLess(log_path.stat().st_size, 200)
+        self.assertIn("warning 9", log_path.read_text())
+
+    def test_start_failure_is_retried(self) -> None:
+        attempts = []
+
+        def _failing_factory():
+            attempts.append(1)
+            raise FileNotFoundError("ffmpeg")
+
+        supervisor = RecorderSupervisor("1", _failing_factory, restart_backoff_seconds=2.0, poll_interval=3600, clock=self.clock)
+        supervisor.start()
+        self.addCleanup(supervisor.stop)
+        supervisor.poll()
+        self.clock.now += 2.0
+        supervisor.poll()
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(supervisor.stats()["start_failures"], 2)
+
+    def test_reads_real_subprocess_pipes(self) -> None:
+        script = "import sys; print('seg-0.mp4,10.0,19.5', flush=True); print('warn', file=sys.stderr, flush=True)"
+        closed = []
+
+        def _factory():
+            return subprocess.Popen(
+                [sys.executable, "-c", script],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+
+        supervisor = RecorderSupervisor("1", _factory, poll_interval=3600, on_segment=lambda *args: closed.append(args))
+        supervisor.start()
+        self.addCleanup(supervisor.stop)
+
+        _wait_for(lambda: closed and supervisor.stats()["stderr_lines"] == 1, timeout=10.0)
+        self.assertEqual(supervisor.stats()["last_segment"], "seg-0.mp4")
+        self.assertEqual(supervisor.stderr_tail(), ["warn"])
+        self.assertEqual(closed, [("seg-0.mp4", 9.5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
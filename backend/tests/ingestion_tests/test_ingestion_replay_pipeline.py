@@ -19,6 +19,8 @@ Vad testet verifierar:
 - run_replay skapar och skickar InternalEvent för giltig object-track payload.
 - Replay-körning ger stabilt resultat över flera körningar.
 - Ogiltig/tom payload räknas inte som ett lyckat event.
+- run_replay_batches (processpool och i samma process) ger samma händelser i samma ordning som run_replay,
+  levererade som listor via on_internal_batch, och samma rader i raw_store.
 
 Förutsättningar:
 - Inga externa beroenden krävs.
@@ -28,7 +30,7 @@ Vad man ska titta efter i terminalen:
 2. Event-count och callback-count stämmer enligt assertions.
 
 Vad man ska titta efter i filsystemet / systemet:
-- Inga filer behöver skapas för detta test.
+- Batchtestet skriver raw_events.jsonl i en temporär katalog.
 
 För att köra testet:
 cd GR8/backend
@@ -41,6 +43,17 @@ import unittest
 from pathlib import Path
 
 from ingestion.ingestion_service import IngestionService
+from ingestion.storage.raw_event_store import RawEventStore
+
+
+def _track(i: int) -> dict:
+    return {
+        "id": f"track-{i}",
+        "channel_id": 1 + i % 3,
+        "start_time": f"2026-02-09T03:44:{i % 60:02d}.382068Z",
+        "classes": [{"type": "Human", "score": 0.9}],
+        "path": [{"timestamp": f"2026-02-09T03:44:{i % 60:02d}.382068Z"}],
+    }
 
 
 class ReplayPipelineTests(unittest.TestCase):
@@ -104,6 +117,44 @@ class ReplayPipelineTests(unittest.TestCase):
         self.assertEqual(len(collected_events), 2)
         self.assertTrue(all(ev.track_id == "track-ok" for ev in collected_events))
 
+    def test_run_replay_batches_matches_sequential_replay(self) -> None:
+        rows = []
+        for i in range(250):
+            rows.append(_track(i))
+            if i % 40 == 0:
+                rows.append({})
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        replay_path = Path(tmp.name) / "capture.jsonl"
+        replay_path.write_text("".join(json.dumps(row) + "\n" for row in rows), encoding="utf-8")
+
+        def _run(name: str, **batch_options):
+            store = RawEventStore(str(Path(tmp.name) / name))
+            batches = []
+            if batch_options:
+                svc = IngestionService(raw_store=store, on_internal_batch=batches.append)
+                count = svc.run_replay_batches(str(replay_path), **batch_options)
+            else:
+                svc = IngestionService(raw_store=store, on_internal_event=lambda event: batches.append([event]))
+                count = svc.run_replay(str(replay_path))
+            events = [event for batch in batches for event in batch]
+            stored = [json.loads(line) for line in store.file.read_text(encoding="utf-8").splitlines()]
+            return count, batches, events, [(row["replay_seq"], row["raw"]) for row in stored]
+
+        expected_count, _, expected_events, expected_stored = _run("sequential")
+        self.assertEqual(expected_count, 250)
+
+        for workers in (0, 2):
+            count, batches, events, stored = _run(f"batch-{workers}", batch_size=64, workers=workers)
+            self.assertEqual(count, expected_count)
+            # 257 rader i batcher om 64 -> fem anrop, ett per batch.
+            self.assertEqual(len(batches), 5)
+            self.assertEqual(
+                [(event.track_id, event.camera_id, event.timestamp, event.payload) for event in events],
+                [(event.track_id, event.camera_id, event.timestamp, event.payload) for event in expected_events],
+            )
+            self.assertEqual(stored, expected_stored)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+"""
+Streaming replay reader tests.
+
+Kopplat till krav:
+- F03 "Systemet ska kunna hantera inspelad data på samma sätt som live-data."
+- F06 "Systemet ska kunna köras på inspelad data. Det inspelade scenariot ska kunna köras flera gånger."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Inspelad MQTT-data kan vara flera GB. iter_replay_events får inte läsa in hela filen innan första händelsen,
+  och det ska gå att starta mitt i en inspelning (byte-offset eller tidpunkt) och läsa komprimerade filer.
+
+Vad testet verifierar:
+- JSONL, JSON-array, formaterat JSON-objekt och gzip/zstd ger samma händelser.
+- En array tolkas element för element: händelser före ett trasigt slut kommer ut innan felet.
+- start_offset fortsätter från replay_offset och justeras till nästa radstart.
+- start_time hittar första händelsen med binärsökning (okomprimerat) och genom att läsa framåt (gzip).
+- En trasig JSONL-rad hoppas över utan att replayn avbryts, även när det är första raden.
+
+Förutsättningar:
+- Inga (zstd-testet hoppas över om zstandard saknas).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_replay_reader.py -v
+"""
+
+import gzip
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ingestion.source import replay_reader
+from ingestion.source.replay_reader import iter_replay_events
+
+BASE = datetime(2026, 3, 31, 12, 0, tzinfo=timezone.utc)
+
+
+def _event(i: int) -> dict:
+    ts = (BASE + timedelta(seconds=i)).isoformat().replace("+00:00", "Z")
+    return {"id": f"track-{i}", "channel_id": 1, "start_time": ts, "classes": [{"type": "Human", "score": 0.9}]}
+
+
+class ReplayReaderTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.events = [_event(i) for i in range(5)]
+
+    def _write(self, name: str, data: bytes) -> Path:
+        path = self.dir / name
+        path.write_bytes(data)
+        return path
+
+    def _jsonl(self, events) -> bytes:
+        return "".join(json.dumps(e) + "\n" for e in events).encode("utf-8")
+
+    def _ids(self, path: Path, **kwargs) -> list:
+        return [ev.raw["id"] for ev in iter_replay_events(path, **kwargs)]
+
+    def test_formats_give_same_events(self) -> None:
+        expected = [e["id"] for e in self.events]
+        paths = [
+            self._write("a.jsonl", self._jsonl(self.events)),
+            self._write("b.json", json.dumps(self.events, indent=2).encode("utf-8")),
+            self._write("c.jsonl.gz", gzip.compress(self._jsonl(self.events))),
+            self._write("d.json.gz", gzip.compress(json.dumps(self.events).encode("utf-8"))),
+        ]
+        for path in paths:
+            self.assertEqual(self._ids(path), expected, path.name)
+
+        single = self._write("e.json", json.dumps(self.events[0], indent=2).encode("utf-8"))
+        self.assertEqual(self._ids(single), ["track-0"])
+
+    def test_zstd_input(self) -> None:
+        if replay_reader.zstandard is None:
+            self.skipTest("zstandard not installed")
+        data = replay_reader.zstandard.ZstdCompressor().compress(self._jsonl(self.events))
+        path = self._write("a.jsonl.zst", data)
+
+        self.assertEqual(self._ids(path), [e["id"] for e in self.events])
+
+    def test_invalid_first_jsonl_line_is_skipped(self) -> None:
+        data = b'{"id": broken\n\n' + self._jsonl(self.events)
+        path = self._write("a.jsonl", data)
+
+        events = list(iter_replay_events(path))
+        self.assertEqual([ev.raw["id"] for ev in events], [e["id"] for e in self.events])
+        self.assertEqual(events[0].replay_offset, data.index(b'{"id": "track-0"'))
+        self.assertEqual(self._ids(self._write("b.jsonl", b'{"id": broken\n')), [])
+
+    def test_array_is_parsed_incrementally(self) -> None:
+        # Stora element över blockgränsen, och ett avklippt slut.
+        big = [dict(e, blob="x" * 100_000) for e in self.events]
+        path = self._write("big.json", json.dumps(big).encode("utf-8")[:-5000])
+
+        seen = []
+        with self.assertRaises(ValueError):
+            for ev in iter_replay_events(path):
+                seen.append(ev.raw["id"])
+        self.assertEqual(seen, [e["id"] for e in self.events[:4]])
+
+    def test_resume_from_offset(self) -> None:
+        path = self._write("a.jsonl", self._jsonl(self.events))
+        offsets = [ev.replay_offset for ev in iter_replay_events(path)]
+
+        self.assertEqual(self._ids(path, start_offset=offsets[2]), ["track-2", "track-3", "track-4"])
+        # Mitt i rad 2 -> börjar på rad 3.
+        self.assertEqual(self._ids(path, start_offset=offsets[2] + 3), ["track-3", "track-4"])
+        resumed = next(iter_replay_events(path, start_offset=offsets[3]))
+        self.assertEqual((resumed.replay_offset, resumed.replay_seq), (offsets[3], 1))
+
+    def test_seek_to_timestamp(self) -> None:
+        events = [_event(i) for i in range(5000)]
+        target = BASE + timedelta(seconds=3210, milliseconds=500)
+        expected = [e["id"] for e in events[3211:]]
+
+        plain = self._write("big.jsonl", self._jsonl(events))
+        self.assertGreater(plain.stat().st_size, 4 * replay_reader._BISECT_MIN_SPAN)
+        self.assertEqual(self._ids(plain, start_time=target), expected)
+
+        compressed = self._write("big.jsonl.gz", gzip.compress(self._jsonl(events)))
+        self.assertEqual(self._ids(compressed, start_time=target), expected)
+
+        array = self._write("big.json", json.dumps(events).encode("utf-8"))
+        self.assertEqual(self._ids(array, start_time=target), expected)
+
+        self.assertEqual(self._ids(plain, start_time=BASE - timedelta(hours=1)), [e["id"] for e in events])
+        self.assertEqual(self._ids(plain, start_time=BASE + timedelta(hours=2)), [])
+
+    def test_invalid_jsonl_line_is_skipped(self) -> None:
+        data = self._jsonl(self.events[:2]) + b'{"id": broken\n' + self._jsonl(self.events[2:])
+        path = self._write("a.jsonl", data)
+
+        self.assertEqual(self._ids(path), [e["id"] for e in self.events])
+
+
+if __name__ == "__main__":
+    unittest.main()
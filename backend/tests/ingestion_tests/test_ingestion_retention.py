@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+"""
+Recording retention tests.
+
+Kopplat till krav:
+- F08 "Logik för att hämta högupplösta bildrutor från videoströmmen som matchar tidpunkten för objektets snapshot."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- RecordingRetention raderar och slår ihop inspelningar. Blir indexet fel efter det pekar bilduppslag på filer som
+  inte finns eller på fel tidpunkt, och fel segment kan raderas (t.ex. filen som spelas in just nu).
+
+Vad testet verifierar:
+- Åldersgräns och bytebudget raderar äldsta segmenten först och rör aldrig segment inom active guard.
+- Kompaktering slår ihop sammanhängande segment per timme, delar vid glapp och uppslag pekar på den nya filen.
+- Misslyckad kompaktering lämnar segmenten och indexet orörda.
+- Rader vars fil försvunnit tas bort ur indexet.
+- Bytebudgeten räknar med filens storlek på disk, även när indexet har en gammal size_bytes.
+
+Förutsättningar:
+- Inga (kompaktering sker med en fejkad compactor som slår ihop bytes, ingen ffmpeg).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_retention.py -v
+"""
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ingestion.storage.retention import RecordingRetention, RetentionPolicy
+from ingestion.storage.segment_index import SegmentIndex
+
+T0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+
+
+def _concat(inputs: list[str], output: str) -> None:
+    data = b"".join(Path(path).read_bytes() for path in inputs)
+    Path(output).write_bytes(data)
+
+
+def _failing_concat(inputs: list[str], output: str) -> None:
+    raise RuntimeError("ffmpeg failed")
+
+
+class RecordingRetentionTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name) / "recordings"
+        self.camera_dir = self.root / "1"
+        self.camera_dir.mkdir(parents=True)
+        self.index = SegmentIndex(Path(self._tmp.name) / "segments.sqlite")
+        self.addCleanup(self.index.close)
+
+    def _add(self, number: int, start: datetime, seconds: float = 10.0, size: int = 100) -> str:
+        path = self.camera_dir / f"segment-{number:05d}.mp4"
+        path.write_bytes(bytes([number % 256]) * size)
+        self.index.add_segment("1", str(path), start, start + timedelta(seconds=seconds), size)
+        return str(path)
+
+    def _retention(self, policy: RetentionPolicy, compactor=_concat) -> RecordingRetention:
+        return RecordingRetention(
+            {"1": policy},
+            index=self.index,
+            recordings_root=self.root,
+            compactor=compactor,
+            active_guard_seconds=30.0,
+        )
+
+    def test_age_limit_and_byte_budget(self) -> None:
+        paths = [self._add(i, T0 + timedelta(seconds=10 * i)) for i in range(10)]
+        now = T0 + timedelta(seconds=100)
+
+        result = self._retention(RetentionPolicy(max_age_seconds=75, max_bytes=400)).run_once(now)["1"]
+
+        # Slut före 25 s -> utgångna; sedan bytebudget, men inte segmenten som slutade inom 30 s (70 s och senare).
+        self.assertEqual(result["expired"], 2)
+        self.assertEqual(result["evicted_bytes"], 4)
+        self.assertEqual(result["segments"], 4)
+        self.assertEqual(result["freed_bytes"], 600)
+        self.assertEqual([s.path for s in self.index.segments("1")], paths[6:])
+        self.assertFalse(Path(paths[0]).exists())
+        self.assertTrue(Path(paths[6]).exists())
+
+    def test_byte_budget_uses_size_on_disk(self) -> None:
+        # Indexerad medan filen växte: indexet säger 100 bytes, filen är 1000.
+        paths = [self._add(i, T0 + timedelta(seconds=10 * i)) for i in range(3)]
+        Path(paths[0]).write_bytes(b"x" * 1000)
+
+        result = self._retention(RetentionPolicy(max_bytes=500)).run_once(T0 + timedelta(hours=1))["1"]
+
+        self.assertEqual(result["evicted_bytes"], 1)
+        self.assertEqual(result["freed_bytes"], 1000)
+        self.assertEqual(result["bytes"], 200)
+        self.assertEqual([s.path for s in self.index.segments("1")], paths[1:])
+
+    def test_max_segments(self) -> None:
+        paths = [self._add(i, T0 + timedelta(seconds=10 * i)) for i in range(5)]
+
+        result = self._retention(RetentionPolicy(max_segments=2)).run_once(T0 + timedelta(hours=1))["1"]
+
+        self.assertEqual(result["evicted_count"], 3)
+        self.assertEqual([s.path for s in self.index.segments("1")], paths[3:])
+
+    def test_compaction_merges_contiguous_segments_per_hour(self) -> None:
+        # Timme 12: två sammanhängande körningar med ett glapp emellan. Timme 13 är inte färdig.
+        for i in range(3):
+            self._add(i, T0 + timedelta(seconds=10 * i))
+        for i in range(3, 5):
+            self._add(i, T0 + timedelta(minutes=30, seconds=10 * i))
+        self._add(5, T0 + timedelta(hours=1))
+        self._add(6, T0 + timedelta(hours=1, seconds=10))
+        now = T0 + timedelta(hours=1, minutes=30)
+
+        result = self._retention(RetentionPolicy(compact_after_seconds=600)).run_once(now)["1"]
+
+        self.assertEqual(result["compacted_runs"], 2)
+        self.assertEqual(result["compacted_segments"], 5)
+        segments = self.index.segments("1")
+        self.assertEqual(len(segments), 4)
+        first = segments[0]
+        self.assertEqual(Path(first.path).parent, self.camera_dir / "2026-03-24")
+        self.assertEqual((first.start, first.end), (T0, T0 + timedelta(seconds=30)))
+        self.assertEqual(Path(first.path).read_bytes(), b"\x00" * 100 + b"\x01" * 100 + b"\x02" * 100)
+        self.assertEqual(first.size_bytes, 300)
+        self.assertEqual(self.index.locate("1", T0 + timedelta(seconds=25)).path, first.path)
+        self.assertEqual(sorted(p.name for p in self.camera_dir.glob("segment-*.mp4")), ["segment-00005.mp4", "segment-00006.mp4"])
+
+        # En andra körning har inget nytt att slå ihop.
+        self.assertEqual(self._retention(RetentionPolicy(compact_after_seconds=600)).run_once(now)["1"]["compacted_runs"], 0)
+
+    def test_failed_compaction_keeps_segments(self) -> None:
+        paths = [self._add(i, T0 + timedelta(seconds=10 * i)) for i in range(3)]
+
+        result = self._retention(RetentionPolicy(compact_after_seconds=0), _failing_concat).run_once(T0 + timedelta(hours=2))["1"]
+
+        self.assertEqual(result["compaction_failures"], 1)
+        self.assertEqual([s.path for s in self.index.segments("1")], paths)
+        self.assertTrue(all(Path(path).exists() for path in paths))
+
+    def test_missing_files_are_removed_from_index(self) -> None:
+        path = self._add(0, T0)
+        Path(path).unlink()
+
+        result = self._retention(RetentionPolicy()).run_once(T0 + timedelta(hours=1))["1"]
+
+        self.assertEqual(result["stale_rows"], 1)
+        self.assertEqual(self.index.segments("1"), [])
+
+    def test_compaction_requires_compactor(self) -> None:
+        with self.assertRaises(ValueError):
+            RecordingRetention({"1": RetentionPolicy(compact_after_seconds=60)}, index=self.index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+"""
+Segment index (GStreamer recording) tests.
+
+Kopplat till krav:
+- F04 "Systemet ska synkronisera inkommande metadata med tillhörande bildrutor baserat på tidstämplar."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- SegmentIndexWriter används av både GStreamerRecorder och den kombinerade pipelinen (tee). Indexet avgör vilken fil
+  och vilken kameratid en inspelad bild hör till, så raderna i SegmentIndex måste vara rätt även utan riktig GStreamer.
+
+Vad testet verifierar:
+- Kameratider räknas till det segment som är öppet; tider före första segmentet ignoreras.
+- En rad skrivs per stängt segment, med första och sista kameratid och rätt kamera.
+- close() skriver det sista öppna segmentet och en befintlig indexfil byggs på.
+
+Förutsättningar:
+- Inga (bus-meddelandena från splitmuxsink är fejkade).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_segment_index.py -v
+"""
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from ingestion.gstreamer_recorder import SegmentIndexWriter
+from ingestion.storage.segment_index import SegmentIndex
+
+
+class _Structure:
+    def __init__(self, name: str, location: str) -> None:
+        self._name = name
+        self._location = location
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_value(self, key: str) -> str:
+        assert key == "location"
+        return self._location
+
+
+class _Message:
+    def __init__(self, name: str, location: str) -> None:
+        self._structure = _Structure(name, location)
+
+    def get_structure(self) -> _Structure:
+        return self._structure
+
+
+T0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+
+
+class SegmentIndexWriterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.index_path = Path(self._tmp.name) / "segments.sqlite"
+
+    def _segments(self, camera_id: str = "1"):
+        with SegmentIndex(self.index_path) as index:
+            return index.segments(camera_id)
+
+    def test_rows_per_closed_segment(self) -> None:
+        index = SegmentIndexWriter(str(self.index_path), "1")
+        index.observe(T0 - timedelta(seconds=1))
+        index.on_element_message(_Message("splitmuxsink-fragment-opened", "segment-00000.mp4"))
+        index.observe(T0)
+        index.observe(T0 + timedelta(seconds=9))
+        index.on_element_message(_Message("splitmuxsink-fragment-closed", "segment-00000.mp4"))
+        index.on_element_message(_Message("splitmuxsink-fragment-opened", "segment-00001.mp4"))
+        index.observe(T0 + timedelta(seconds=10))
+        index.close()
+
+        segments = self._segments()
+        self.assertEqual([s.path for s in segments], ["segment-00000.mp4", "segment-00001.mp4"])
+        self.assertEqual((segments[0].start, segments[0].end), (T0, T0 + timedelta(seconds=9)))
+        self.assertEqual(segments[1].start, T0 + timedelta(seconds=10))
+        self.assertEqual(index.segments_written, 2)
+        self.assertEqual(self._segments("2"), [])
+
+    def test_existing_index_is_appended(self) -> None:
+        first = SegmentIndexWriter(str(self.index_path), "1")
+        first.on_element_message(_Message("splitmuxsink-fragment-opened", "segment-00001.mp4"))
+        first.observe(T0)
+        first.close()
+        index = SegmentIndexWriter(str(self.index_path), "1")
+        index.on_element_message(_Message("splitmuxsink-fragment-opened", "segment-00002.mp4"))
+        index.observe(T0 + timedelta(seconds=10))
+        index.on_element_message(_Message("splitmuxsink-fragment-closed", "segment-00002.mp4"))
+        index.close()
+        index.close()
+
+        self.assertEqual([s.path for s in self._segments()], ["segment-00001.mp4", "segment-00002.mp4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+"""
+Segment lookup (SegmentIndex) tests.
+
+Kopplat till krav:
+- F08 "Logik för att hämta högupplösta bildrutor från videoströmmen som matchar tidpunkten för objektets snapshot."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Alla bilder som hämtas ur inspelningar (database.image_from_timestamp) går via SegmentIndex.locate. Fel segment eller
+  fel offset ger en bild från fel tidpunkt, och ffmpeg-filer med lokal tid i namnet måste hamna rätt i UTC.
+
+Vad testet verifierar:
+- locate ger rätt fil och offset för en UTC-tid, även med tidszon i tidpunkten, och None i glapp mellan segment.
+- Kameror hålls isär.
+- sync_directory lägger till ffmpeg-segment (Stockholmstid i filnamnet) en gång och begränsar slutet till nästa start.
+- sync_after_miss läser katalogen bara för tider efter senaste segmentet, och högst en gång per intervall och kamera.
+- import_csv läser det äldre CSV-indexet.
+
+Förutsättningar:
+- Inga (filerna är tomma platshållare).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_segment_lookup.py -v
+"""
+
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+from ingestion.storage.segment_index import SegmentIndex
+
+T0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+STOCKHOLM = ZoneInfo("Europe/Stockholm")
+
+
+class SegmentIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name)
+        self.index = SegmentIndex(self.root / "segments.sqlite")
+        self.addCleanup(self.index.close)
+
+    def test_locate_returns_segment_and_offset(self) -> None:
+        for i in range(100):
+            start = T0 + timedelta(seconds=10 * i)
+            self.index.add_segment("1", f"segment-{i:05d}.mp4", start, start + timedelta(seconds=9.8))
+
+        location = self.index.locate("1", T0 + timedelta(seconds=425.5))
+        self.assertEqual(location.path, "segment-00042.mp4")
+        self.assertAlmostEqual(location.offset_seconds, 5.5)
+
+        location = self.index.locate("1", (T0 + timedelta(seconds=3)).astimezone(STOCKHOLM))
+        self.assertEqual(location.path, "segment-00000.mp4")
+        self.assertAlmostEqual(location.offset_seconds, 3.0)
+
+        self.assertIsNone(self.index.locate("1", T0 - timedelta(seconds=1)))
+        self.assertIsNone(self.index.locate("1", T0 + timedelta(seconds=1001)))
+        self.assertIsNone(self.index.locate("2", T0 + timedelta(seconds=5)))
+
+    def test_gap_between_segments_is_not_matched(self) -> None:
+        self.index.add_segment("1", "a.mp4", T0, T0 + timedelta(seconds=10))
+        self.index.add_segment("1", "b.mp4", T0 + timedelta(seconds=30), T0 + timedelta(seconds=40))
+
+        self.assertEqual(self.index.locate("1", T0 + timedelta(seconds=10.3)).path, "a.mp4")
+        self.assertIsNone(self.index.locate("1", T0 + timedelta(seconds=20)))
+        self.assertEqual(
+            [s.path for s in self.index.segments("1", start=T0 + timedelta(seconds=35))],
+            ["b.mp4"],
+        )
+
+    def test_naive_timestamps_are_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            self.index.locate("1", datetime(2026, 3, 24, 12, 0))
+
+    def test_sync_directory_indexes_ffmpeg_segments(self) -> None:
+        recordings = self.root / "recordings" / "1"
+        recordings.mkdir(parents=True)
+        for name in ("D2026-03-24-T13-00-00.mp4", "D2026-03-24-T13-00-04.mp4", "notes.txt"):
+            (recordings / name).write_bytes(b"x")
+
+        self.assertEqual(self.index.sync_directory("1", recordings, clip_seconds=10, tz=STOCKHOLM), 2)
+        self.assertEqual(self.index.sync_directory("1", recordings, clip_seconds=10, tz=STOCKHOLM), 0)
+
+        # 13:00 i Stockholm (CET) = 12:00 UTC.
+        first, second = self.index.segments("1")
+        self.assertEqual(first.start, T0)
+        self.assertEqual(first.end, T0 + timedelta(seconds=4))
+        self.assertEqual(second.end, T0 + timedelta(seconds=14))
+        self.assertEqual(self.index.locate("1", T0 + timedelta(seconds=6)).path, str(recordings / "D2026-03-24-T13-00-04.mp4"))
+
+    def test_sync_after_miss_only_scans_for_new_segments(self) -> None:
+        recordings = self.root / "recordings" / "1"
+        recordings.mkdir(parents=True)
+        (recordings / "D2026-03-24-T13-00-00.mp4").write_bytes(b"x")
+        self.index.sync_directory("1", recordings, clip_seconds=10, tz=STOCKHOLM)
+        self.assertEqual(self.index.latest_end("1"), T0 + timedelta(seconds=10))
+
+        # Nya filer syns inte för missar före senaste segmentets slut (glapp/raderat).
+        (recordings / "D2026-03-24-T13-00-10.mp4").write_bytes(b"x")
+        (recordings / "D2026-03-24-T13-00-20.mp4").write_bytes(b"x")
+
+        def sync(t: datetime, interval: float) -> int:
+            return self.index.sync_after_miss("1", t, recordings, clip_seconds=10, tz=STOCKHOLM, min_interval_seconds=interval)
+
+        self.assertEqual(sync(T0 - timedelta(hours=1), 0.0), 0)
+
+        # Efter slutet läses katalogen, men bara en gång per intervall.
+        self.assertEqual(sync(T0 + timedelta(seconds=15), 3600.0), 2)
+        (recordings / "D2026-03-24-T13-00-30.mp4").write_bytes(b"x")
+        self.assertEqual(sync(T0 + timedelta(seconds=35), 3600.0), 0)
+        self.assertEqual(sync(T0 + timedelta(seconds=35), 0.0), 1)
+        self.assertIsNone(self.index.latest_end("2"))
+
+    def test_import_csv(self) -> None:
+        csv_path = self.root / "index-1.csv"
+        csv_path.write_text(
+            "file_name,segment_start_camera_time,segment_end_camera_time\n"
+            f"segment-00000.mp4,{T0.isoformat()},{(T0 + timedelta(seconds=9)).isoformat()}\n"
+        )
+
+        self.assertEqual(self.index.import_csv("1", csv_path, self.root), 1)
+        self.assertEqual(self.index.locate("1", T0 + timedelta(seconds=2)).path, str(self.root / "segment-00000.mp4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
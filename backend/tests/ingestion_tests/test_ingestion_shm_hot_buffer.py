@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+"""
+Shared-memory hot buffer tests.
+
+Kopplat till krav:
+- F08 "Logik för att hämta högupplösta bildrutor från videoströmmen som matchar tidpunkten för objektets snapshot."
+
+Testnivå:
+- Enhetstest
+
+Varför testet finns:
+- Verifiera att en annan läsare (attach på camera_id) ser samma frames som writern.
+- Verifiera att seqlock-valideringen underkänner frames som hunnit skrivas över.
+
+Vad testet verifierar:
+- attach(camera_id) hittar writerns segment och search_frame/range ger rätt frames.
+- En SharedFrame blir ogiltig när writern evictar dess slot.
+- Läsare får inte skriva.
+- create() tar bara över ett befintligt namn när writer-processen i headern är död.
+
+Förutsättningar:
+- numpy och POSIX shared memory (/dev/shm).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_shm_hot_buffer.py -v
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from ingestion.buffers.rtsp_hot_buffer import BufferedFrame
+from ingestion.buffers import shm_hot_buffer
+from ingestion.buffers.shm_hot_buffer import SharedFrameRingBuffer, shared_hot_buffer_name
+
+T0 = datetime(2026, 3, 24, 12, 0, tzinfo=timezone.utc)
+
+
+def _frame(i: int, size: int = 8) -> BufferedFrame:
+    return BufferedFrame(
+        timestamp=T0 + timedelta(milliseconds=200 * i),
+        jpeg_bytes=bytes([i % 256]) * size,
+        width=640,
+        height=360,
+    )
+
+
+class SharedFrameRingBufferTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.camera_id = f"test-{os.getpid()}-{id(self)}"
+        self.writer = SharedFrameRingBuffer.create(self.camera_id, max_frames=4, max_bytes=1_000)
+        self.reader = SharedFrameRingBuffer.attach(self.camera_id)
+
+    def tearDown(self) -> None:
+        self.reader.close()
+        self.writer.close()
+
+    def test_reader_sees_writer_frames(self) -> None:
+        for i in range(6):
+            self.writer.append(_frame(i))
+
+        self.assertEqual(self.reader.stats()["frames"], 4)
+        hit = self.reader.search_frame(T0 + timedelta(milliseconds=610))
+        self.assertIsNotNone(hit)
+        assert hit is not None
+        self.assertEqual(hit.to_buffered_frame(), _frame(3))
+
+        frames = self.reader.range(T0 + timedelta(milliseconds=500), T0 + timedelta(seconds=1))
+        self.assertEqual([f.jpeg_bytes.tobytes()[0] for f in frames], [3, 4, 5])
+        del hit, frames
+
+    def test_frame_becomes_invalid_after_eviction(self) -> None:
+        self.writer.append(_frame(0))
+        frame = self.reader.search_frame(T0)
+        assert frame is not None
+        self.assertTrue(frame.is_valid())
+
+        for i in range(1, 6):
+            self.writer.append(_frame(i))
+
+        self.assertFalse(frame.is_valid())
+        self.assertIsNone(frame.to_buffered_frame())
+        del frame
+
+    def test_reader_cannot_write(self) -> None:
+        with self.assertRaises(RuntimeError):
+            self.reader.append(_frame(0))
+
+    def test_create_refuses_name_of_live_writer(self) -> None:
+        with self.assertRaises(FileExistsError):
+            SharedFrameRingBuffer.create(self.camera_id, max_frames=4, max_bytes=1_000)
+
+        self.writer.append(_frame(0))
+        self.assertEqual(self.reader.stats()["frames"], 1)
+
+
+class StaleSegmentTests(unittest.TestCase):
+    def test_create_reclaims_segment_of_dead_writer(self) -> None:
+        camera_id = f"test-stale-{os.getpid()}"
+        dead = subprocess.Popen([sys.executable, "-c", "pass"])
+        dead.wait()
+
+        writer = SharedFrameRingBuffer.create(camera_id, max_frames=4, max_bytes=1_000)
+        writer.append(_frame(0))
+        # Som om processen krashat: headern pekar på en död pid och segmentet ligger kvar.
+        writer._header[shm_hot_buffer._H_WRITER_PID] = dead.pid
+        shm_hot_buffer._created_here.discard(shared_hot_buffer_name(camera_id))
+
+        replacement = SharedFrameRingBuffer.create(camera_id, max_frames=4, max_bytes=1_000)
+        self.addCleanup(replacement.close)
+        self.assertEqual(replacement.stats()["frames"], 0)
+        self.assertEqual(int(replacement._header[shm_hot_buffer._H_WRITER_PID]), os.getpid())
+
+        writer._owner = False
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+"""
+Multi-camera supervisor tests.
+
+Kopplat till krav:
+- F01 "Systemet ska kunna ta emot metadata-strömmar via (HTTP/MQTT) i JSON-format enligt Axis-kameror."
+
+Testnivå:
+- Integrationstest (riktiga workerprocesser, fejkade kameror)
+
+Varför testet finns:
+- Verifiera att supervisorn kör kameror i egna processer, samlar deras statistik och startar om kraschade workers.
+
+Vad testet verifierar:
+- Kameralistan läses från JSON med defaults och extra Camera-argument.
+- Kameror fördelas på workers enligt cameras_per_worker / max_workers.
+- Statistik från alla workers aggregeras.
+- En worker som kraschar startas om.
+- Statistik från en worker som dött räknas inte in i summorna.
+
+Förutsättningar:
+- Inga externa beroenden (kamerorna är fejkade).
+
+Vad man ska titta efter i terminalen:
+1. Alla tester i filen passerar.
+
+För att köra testet:
+cd GR8/backend
+python3 -m pytest tests/ingestion_tests/test_ingestion_supervisor.py -v
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from ingestion.supervisor import CameraConfig, IngestionSupervisor, load_camera_configs, plan_worker_groups
+
+
+class _FakeCamera:
+    def __init__(self, config: CameraConfig) -> None:
+        self.frames = int(config.options.get("frames", 1))
+        self.exit_after_reports = config.options.get("exit_after_reports")
+        self.reports = 0
+
+    def hot_buffer_stats(self) -> dict:
+        if self.exit_after_reports is not None and self.reports >= self.exit_after_reports:
+            os._exit(3)
+        self.reports += 1
+        return {"frames": self.frames, "bytes": self.frames * 100, "max_frames": 10, "max_bytes": 1000}
+
+    def mqtt_buffer_stats(self) -> dict:
+        return {"events": 1, "bytes": 10, "max_events": 10, "max_bytes": 100}
+
+    def stop_recording(self) -> None:
+        return None
+
+
+def _fake_camera_factory(config: CameraConfig, analysis_service) -> _FakeCamera:
+    crash_marker = config.options.get("crash_once_marker")
+    if crash_marker and not Path(crash_marker).exists():
+        Path(crash_marker).write_text("crashed", encoding="utf-8")
+        raise RuntimeError("simulated camera crash")
+    return _FakeCamera(config)
+
+
+def _wait_for(predicate, timeout: float = 20.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class CameraConfigTests(unittest.TestCase):
+    def test_load_camera_configs_merges_defaults_and_options(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cameras.json"
+            path.write_text(
+                json.dumps(
+                    {
+                        "defaults": {"broker_host": "10.0.0.1", "hot_buffer_fps": 5},
+                        "cameras": [
+                            {"camera_id": 1, "rtsp_url": "rtsp://a/1"},
+                            {"camera_id": "2", "rtsp_url": "rtsp://a/2", "broker_port": 1884},
+                        ],
+                    }
+                ),
+                encoding="utf-8",
+            )
+            configs = load_camera_configs(path)
+
+        self.assertEqual([c.camera_id for c in configs], ["1", "2"])
+        self.assertEqual(configs[0].broker_host, "10.0.0.1")
+        self.assertEqual(configs[1].broker_port, 1884)
+        self.assertEqual(configs[0].options, {"hot_buffer_fps": 5})
+
+    def test_plan_worker_groups_respects_max_workers(self) -> None:
+        configs = [CameraConfig(camera_id=str(i), rtsp_url=f"rtsp://a/{i}") for i in range(5)]
+        self.assertEqual([len(g) for g in plan_worker_groups(configs, max_workers=2)], [3, 2])
+        self.assertEqual([len(g) for g in plan_worker_groups(configs, cameras_per_worker=1)], [1] * 5)
+
+
+class IngestionSupervisorTests(unittest.TestCase):
+    def test_aggregates_stats_and_restarts_crashed_worker(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            configs = [
+                CameraConfig(camera_id="1", rtsp_url="rtsp://a/1", options={"frames": 2}),
+                CameraConfig(
+                    camera_id="2",
+                    rtsp_url="rtsp://a/2",
+                    options={"frames": 3, "crash_once_marker": str(Path(tmp) / "crashed")},
+                ),
+            ]
+            supervisor = IngestionSupervisor(
+                configs,
+                cameras_per_worker=1,
+                stats_interval=0.05,
+                camera_factory=_fake_camera_factory,
+                restart_backoff_seconds=0.0,
+            )
+            self.addCleanup(supervisor.stop)
+            supervisor.start()
+
+            def _both_reporting() -> bool:
+                supervisor.poll()
+                return set(supervisor.aggregate_stats()["cameras"]) == {"1", "2"}
+
+            self.assertTrue(_wait_for(_both_reporting))
+            stats = supervisor.aggregate_stats()
+            self.assertEqual(stats["workers"], 2)
+            self.assertGreaterEqual(stats["restarts"], 1)
+            self.assertEqual(stats["totals"]["hot_buffer_frames"], 5)
+            self.assertEqual(stats["totals"]["mqtt_events"], 2)
+            self.assertNotEqual(stats["cameras"]["1"]["pid"], stats["cameras"]["2"]["pid"])
+
+    def test_dead_worker_stats_are_dropped(self) -> None:
+        configs = [
+            CameraConfig(camera_id="1", rtsp_url="rtsp://a/1", options={"frames": 2}),
+            # Rapporterar några gånger och dör sedan; startas inte om inom testet.
+            CameraConfig(camera_id="2", rtsp_url="rtsp://a/2", options={"frames": 3, "exit_after_reports": 3}),
+        ]
+        supervisor = IngestionSupervisor(
+            configs,
+            cameras_per_worker=1,
+            stats_interval=0.05,
+            camera_factory=_fake_camera_factory,
+            restart_backoff_seconds=60.0,
+        )
+        self.addCleanup(supervisor.stop)
+        supervisor.start()
+
+        def _second_died() -> bool:
+            supervisor.poll()
+            worker = next(w for w in supervisor._workers if w.configs[0].camera_id == "2")
+            return worker.last_exitcode is not None and "1" in supervisor.aggregate_stats()["cameras"]
+
+        self.assertTrue(_wait_for(_second_died))
+
+        stats = supervisor.aggregate_stats()
+        self.assertEqual(set(stats["cameras"]), {"1"})
+        self.assertEqual(stats["totals"]["hot_buffer_frames"], 2)
+        self.assertEqual(stats["workers_alive"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()